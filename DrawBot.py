@@ -14,6 +14,7 @@ from drawBot.ui.preferencesController import PreferencesController
 from drawBot.ui.debug import DebugWindowController
 
 import drawBot.drawBotDrawingTools
+from drawBot.context.tools.imageCache import imageCache
 from drawBot.misc import getDefault, stringToInt
 from drawBot.updater import Updater
 
@@ -122,7 +123,7 @@ class DrawBotAppDelegate(Foundation.NSObject):
         for document in AppKit.NSApp().orderedDocuments():
             document.testForExternalChanges()
         self.sheduleIconTimer()
-        drawBot.drawBotDrawingTools._chachedPixelColorBitmaps.clear()
+        imageCache.clear()
 
     def applicationShouldOpenUntitledFile_(self, sender):
         return getDefault("shouldOpenUntitledFile", True)
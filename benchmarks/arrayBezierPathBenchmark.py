@@ -0,0 +1,120 @@
+"""
+Compare geometry queries on the NSBezierPath backed BezierPath with the numpy backed ArrayBezierPath.
+
+The ArrayBezierPath part runs headless, the BezierPath part is skipped when AppKit is not available.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drawBot", "context", "tools"))
+
+from arrayBezierPath import ArrayBezierPath, transformPaths, boundsForPaths, controlPointBoundsForPaths
+
+from benchmarkTools import timeIt, seed, report
+
+
+def getPathClasses():
+    pathClasses = [("array", ArrayBezierPath)]
+    try:
+        from drawBot.context.baseContext import BezierPath
+    except ImportError:
+        print("AppKit is not available, skipping BezierPath")
+    else:
+        pathClasses.insert(0, ("nsBezierPath", BezierPath))
+    return pathClasses
+
+
+def build(pathClass, count):
+    seed()
+    path = pathClass()
+    for i in range(count):
+        x = random.random() * 1000
+        y = random.random() * 1000
+        path.moveTo((x, y))
+        path.lineTo((x + 10, y))
+        path.curveTo((x + 15, y + 5), (x + 15, y + 10), (x + 10, y + 15))
+        path.lineTo((x, y + 15))
+        path.closePath()
+    return path
+
+
+def run(counts=(1000, 10000, 100000)):
+    pathClasses = getPathClasses()
+    for count in counts:
+        for name, pathClass in pathClasses:
+            buildTime = timeIt(lambda: build(pathClass, count), repeat=1)
+            path = build(pathClass, count)
+            values = dict(
+                build=buildTime,
+                points=timeIt(lambda: path.points),
+                contours=timeIt(lambda: path.contours),
+                bounds=timeIt(lambda: path.bounds()),
+                transform=timeIt(lambda: path.transform((1, .1, .1, 1, 10, 10))),
+                pointInside=timeIt(lambda: path.pointInside((500, 500))),
+            )
+            report("bezierPath %s %s" % (name, count), **values)
+
+
+def buildCollection(pathClass, count):
+    seed()
+    paths = []
+    for i in range(count):
+        path = pathClass()
+        path.rect(random.random() * 1000, random.random() * 1000, 20, 20)
+        path.oval(random.random() * 1000, random.random() * 1000, 20, 20)
+        paths.append(path)
+    return paths
+
+
+def _roundBoxes(boxes):
+    return [box if box is None else tuple(round(value, 6) for value in box) for box in boxes]
+
+
+def checkCollections():
+    # the batched bounds must match the bounds of each path, for paths with different amounts of segments
+    # also after a batched transform
+    for name, pathClass in getPathClasses():
+        seed()
+        paths = []
+        for i in range(20):
+            path = pathClass()
+            for j in range(i % 4 + 1):
+                path.rect(random.random() * 1000, random.random() * 1000, 20, 20)
+            if i % 3:
+                path.oval(random.random() * 1000, random.random() * 1000, 20, 30)
+            paths.append(path)
+        paths.insert(5, pathClass())
+        for transformMatrix in (None, (1, .1, .1, 1, 10, 10)):
+            if transformMatrix is not None:
+                transformPaths(paths, transformMatrix)
+            assert _roundBoxes(boundsForPaths(paths)) == _roundBoxes([path.bounds() for path in paths]), name
+            assert _roundBoxes(controlPointBoundsForPaths(paths)) == _roundBoxes([path.controlPointBounds() for path in paths]), name
+
+
+def runCollections(counts=(1000, 10000)):
+    checkCollections()
+    transformMatrix = (1, .1, .1, 1, 10, 10)
+    pathClasses = getPathClasses()
+    for count in counts:
+        for name, pathClass in pathClasses:
+            paths = buildCollection(pathClass, count)
+
+            def each():
+                for path in paths:
+                    path.transform(transformMatrix)
+                    path.bounds()
+
+            def batched():
+                transformPaths(paths, transformMatrix)
+                boundsForPaths(paths)
+
+            report("pathCollection %s %s" % (name, count), each=timeIt(each), batched=timeIt(batched))
+
+
+if __name__ == "__main__":
+    run()
+    runCollections()
@@ -0,0 +1,127 @@
+"""
+Small helpers shared by the drawBot benchmarks.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import datetime
+from array import array
+
+
+def timeIt(callback, repeat=3, setup=None):
+    """
+    Run `callback` `repeat` times and return the fastest time in seconds.
+    Optionally a `setup` callback is called before each run, its result is passed to `callback`.
+    """
+    best = None
+    for i in range(repeat):
+        args = ()
+        if setup is not None:
+            args = (setup(), )
+        start = time.time()
+        callback(*args)
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+def deepSizeOf(obj, seen=None):
+    """
+    Return the approximated amount of bytes used by `obj` and all python objects it contains.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deepSizeOf(key, seen)
+            size += deepSizeOf(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deepSizeOf(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += deepSizeOf(obj.__dict__, seen)
+    return size
+
+
+class NullContext(object):
+
+    """
+    A context ignoring all drawing calls, to time the replay of the instructions only.
+    """
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        pass
+
+
+def seed(value=1234):
+    """
+    Reset the random generator to a fixed seed, so runs are reproducible.
+    """
+    random.seed(value)
+
+
+def report(name, **values):
+    """
+    Print a single benchmark result line.
+    """
+    items = ["%s=%s" % (key, _formatValue(value)) for key, value in sorted(values.items())]
+    print("%-40s %s" % (name, "  ".join(items)))
+
+
+def _formatValue(value):
+    if isinstance(value, float):
+        return "%.4f" % value
+    return "%s" % value
+
+
+def environment():
+    """
+    Return a dict describing the machine and the drawBot version the benchmarks run on.
+    """
+    settingsPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drawBot", "drawBotSettings.py")
+    settings = {}
+    with open(settingsPath) as f:
+        exec(f.read(), settings)
+    return dict(
+        date=datetime.datetime.now().isoformat(),
+        drawBotVersion=settings["__version__"],
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        machine=platform.machine(),
+    )
+
+
+def writeResults(path, results):
+    """
+    Write the environment and a list of results to a json file.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    data = dict(environment=environment(), results=results)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def readResults(path):
+    """
+    Read the results from a json file written by `writeResults`.
+    """
+    with open(path) as f:
+        return json.load(f)["results"]
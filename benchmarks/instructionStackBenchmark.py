@@ -0,0 +1,54 @@
+"""
+Compare the default list of tuples instruction layout with the compact array backed layout.
+
+Records `rect`, `oval` and path instructions into a drawing tool and replays them.
+"""
+
+from __future__ import print_function
+
+import random
+
+from drawBot.drawBotDrawingTools import DrawBotDrawingTool
+from drawBot.compactInstructions import CompactInstructionSet
+
+from benchmarkTools import timeIt, deepSizeOf, seed, report, NullContext
+
+
+def record(drawingTool, count):
+    seed()
+    drawingTool.newDrawing()
+    drawingTool.newPage(1000, 1000)
+    for i in range(count):
+        x = random.random() * 1000
+        y = random.random() * 1000
+        choice = i % 4
+        if choice == 0:
+            drawingTool.rect(x, y, 10, 10)
+        elif choice == 1:
+            drawingTool.oval(x, y, 10, 10)
+        elif choice == 2:
+            drawingTool.newPath()
+            drawingTool.moveTo((x, y))
+        else:
+            drawingTool.lineTo((x, y))
+            drawingTool.closePath()
+    return drawingTool
+
+
+def replay(drawingTool):
+    drawingTool._drawInContext(NullContext())
+
+
+def run(counts=(10000, 100000, 1000000)):
+    for count in counts:
+        for name, instructionSetClass in [("list", list), ("compact", CompactInstructionSet)]:
+            drawingTool = DrawBotDrawingTool()
+            drawingTool._instructionSetClass = instructionSetClass
+            recordTime = timeIt(lambda: record(drawingTool, count), repeat=1)
+            replayTime = timeIt(lambda: replay(drawingTool), repeat=1)
+            size = deepSizeOf(drawingTool._instructionsStack)
+            report("instructions %s %s" % (name, count), record=recordTime, replay=replayTime, megabytes=size / 1024. / 1024)
+
+
+if __name__ == "__main__":
+    run()
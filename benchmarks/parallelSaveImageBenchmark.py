@@ -0,0 +1,43 @@
+"""
+Compare a serial and a parallel `saveImage` of the same drawing to pdf, svg, png and gif.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+import drawBot
+
+from benchmarkTools import timeIt, seed, report
+
+
+def draw(pageCount, shapeCount):
+    seed()
+    drawBot.newDrawing()
+    for i in range(pageCount):
+        drawBot.newPage(500, 500)
+        for j in range(shapeCount):
+            drawBot.fill(random.random(), random.random(), random.random(), .5)
+            drawBot.oval(random.random() * 500, random.random() * 500, 40, 40)
+        drawBot.fill(0)
+        drawBot.fontSize(40)
+        drawBot.text("page %s" % (i + 1), (20, 20))
+
+
+def run(sizes=((1, 1000), (10, 1000), (20, 5000))):
+    root = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(root, "benchmark.%s" % ext) for ext in ("pdf", "svg", "png", "gif")]
+        for pageCount, shapeCount in sizes:
+            draw(pageCount, shapeCount)
+            serialTime = timeIt(lambda: drawBot.saveImage(paths), repeat=1)
+            parallelTime = timeIt(lambda: drawBot.saveImage(paths, parallel=True), repeat=1)
+            report("saveImage 4 formats %s pages %s shapes" % (pageCount, shapeCount), serial=serialTime, parallel=parallelTime, speedup=serialTime / parallelTime)
+        drawBot.endDrawing()
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    run()
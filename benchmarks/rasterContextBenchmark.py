@@ -0,0 +1,71 @@
+"""
+Compare rasterizing pages through an in-memory pdf with drawing directly into a bitmap (ImageContext, a RasterContext).
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+import AppKit
+import Quartz
+
+import drawBot
+from drawBot.drawBotDrawingTools import _drawBotDrawingTool
+from drawBot.context.pdfContext import PDFContext
+from drawBot.context.imageContext import ImageContext
+
+from benchmarkTools import timeIt, seed, report
+
+
+def draw(pageCount, shapeCount):
+    seed()
+    drawBot.newDrawing()
+    for i in range(pageCount):
+        drawBot.newPage(500, 500)
+        for j in range(shapeCount):
+            drawBot.fill(random.random(), random.random(), random.random(), .5)
+            drawBot.rect(random.random() * 500, random.random() * 500, 20, 20)
+
+
+def writePDFPages(data, path):
+    # the pdf route: each page of the pdf is rendered through a NSImage, a tiff and a bitmap
+    fileName, fileExt = os.path.splitext(path)
+    pdfDocument = Quartz.PDFDocument.alloc().initWithData_(data)
+    for index in range(pdfDocument.pageCount()):
+        page = pdfDocument.pageAtIndex_(index)
+        image = AppKit.NSImage.alloc().initWithData_(page.dataRepresentation())
+        imageRep = AppKit.NSBitmapImageRep.imageRepWithData_(image.TIFFRepresentation())
+        imageData = imageRep.representationUsingType_properties_(AppKit.NSPNGFileType, None)
+        imageData.writeToFile_atomically_("%s_%s%s" % (fileName, index + 1, fileExt), True)
+
+
+def run(sizes=((10, 100), (100, 100), (100, 1000))):
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, "frame.png")
+        for pageCount, shapeCount in sizes:
+            draw(pageCount, shapeCount)
+
+            def exportPDF():
+                context = PDFContext()
+                _drawBotDrawingTool._drawInContext(context)
+                context._closeContext()
+                writePDFPages(context._pdfData, path)
+
+            def exportRaster():
+                context = ImageContext()
+                context.prepareSaveImage(path, True)
+                _drawBotDrawingTool._drawInContext(context)
+                context.saveImage(path, True)
+
+            pdfTime = timeIt(exportPDF, repeat=1)
+            rasterTime = timeIt(exportRaster, repeat=1)
+            report("raster %s frames %s shapes" % (pageCount, shapeCount), pdfPerFrame=pdfTime / pageCount, rasterPerFrame=rasterTime / pageCount)
+        drawBot.endDrawing()
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,611 @@
+"""
+Run the drawBot benchmark suite and write the results to a json file.
+
+    python runBenchmarks.py [--output results.json] [--compare previous.json] [--quick] [--only name ...]
+
+Each benchmark runs with a fixed random seed for several sizes and reports the fastest of a few runs.
+Benchmarks requiring a backend that is not available on the machine (AppKit, QTKit, numpy, booleanOperations, ...)
+are reported as skipped, failing benchmarks are reported with their error.
+
+The json file has an `environment` dict and a list of `results`, each result has:
+`name`, `size`, `status` (`ok`, `skipped` or `error`), `seconds`, `repeat` and a `message`.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import traceback
+
+from benchmarkTools import timeIt, seed, report, NullContext, writeResults, readResults
+
+# benchmark the drawBot in this repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+_benchmarks = []
+
+
+def benchmark(name, sizes, repeat=3):
+    """
+    Register a benchmark.
+
+    The decorated function is called with a size and returns a callback to time,
+    or a `(setup, callback)` tuple where the result of `setup` is passed to the callback.
+    Imports of optional backends should happen inside the function, an `ImportError` skips the benchmark.
+    """
+    def wrapper(func):
+        _benchmarks.append((name, sizes, repeat, func))
+        return func
+    return wrapper
+
+
+# helpers
+
+
+_syllables = ["lo", "rem", "ip", "sum", "do", "lor", "sit", "a", "met", "con", "sec", "te", "tur", "ad", "pis", "cing", "e", "lit"]
+
+
+def words(count):
+    seed()
+    return " ".join(["".join(random.choice(_syllables) for i in range(random.randint(1, 5))) for j in range(count)])
+
+
+def drawShapes(pageCount, shapeCount):
+    import drawBot
+    seed()
+    drawBot.newDrawing()
+    for i in range(pageCount):
+        drawBot.newPage(500, 500)
+        for j in range(shapeCount):
+            drawBot.fill(random.random(), random.random(), random.random(), .5)
+            if j % 2:
+                drawBot.oval(random.random() * 500, random.random() * 500, 40, 40)
+            else:
+                drawBot.rect(random.random() * 500, random.random() * 500, 40, 40)
+        drawBot.fill(0)
+        drawBot.fontSize(40)
+        drawBot.text("page %s" % (i + 1), (20, 20))
+
+
+_fontFileCandidates = [
+    "/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+]
+
+
+def fontFilePath():
+    for path in _fontFileCandidates:
+        if os.path.exists(path):
+            return path
+    raise ImportError("no font file found")
+
+
+def importFromTools(moduleName):
+    toolsFolder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drawBot", "context", "tools")
+    if toolsFolder not in sys.path:
+        sys.path.insert(0, toolsFolder)
+    return __import__(moduleName)
+
+
+_tempFolder = None
+
+
+def tempPath(fileName):
+    global _tempFolder
+    if _tempFolder is None:
+        _tempFolder = tempfile.mkdtemp()
+    return os.path.join(_tempFolder, fileName)
+
+
+# instructions
+
+
+@benchmark("record", sizes=[1000, 10000, 100000], repeat=1)
+def recordBenchmark(size):
+    from drawBot.drawBotDrawingTools import DrawBotDrawingTool
+    drawingTool = DrawBotDrawingTool()
+
+    def callback():
+        seed()
+        drawingTool.newDrawing()
+        drawingTool.newPage(1000, 1000)
+        for i in range(size):
+            drawingTool.fill(random.random(), 0, 0)
+            drawingTool.rect(random.random() * 1000, random.random() * 1000, 10, 10)
+    return callback
+
+
+@benchmark("replay", sizes=[1000, 10000, 100000])
+def replayBenchmark(size):
+    from drawBot.drawBotDrawingTools import DrawBotDrawingTool
+    drawingTool = DrawBotDrawingTool()
+    seed()
+    drawingTool.newPage(1000, 1000)
+    for i in range(size):
+        drawingTool.fill(random.random(), 0, 0)
+        drawingTool.rect(random.random() * 1000, random.random() * 1000, 10, 10)
+    return lambda: drawingTool._drawInContext(NullContext())
+
+
+# contexts
+
+
+def saveImageBenchmark(ext):
+    def func(size):
+        import drawBot
+        from drawBot.context import getContextForFileExt
+        if getContextForFileExt(ext) is None:
+            raise ImportError("no context for '%s'" % ext)
+        pageCount, shapeCount = size
+        drawShapes(pageCount, shapeCount)
+        path = tempPath("benchmark.%s" % ext)
+        return lambda: drawBot.saveImage(path, multipage=True)
+    return func
+
+
+for _ext in ["pdf", "svg", "png", "gif", "mov"]:
+    benchmark("saveImage %s" % _ext, sizes=[(1, 100), (10, 100), (10, 1000)], repeat=1)(saveImageBenchmark(_ext))
+
+
+@benchmark("saveImage pdf png with images", sizes=[1, 10, 50], repeat=1)
+def saveImageWithImagesBenchmark(size):
+    # draw `size` photo sized images and save to several formats, each image is decoded once
+    import drawBot
+    from drawBot.drawBotDrawingTools import imageCache
+    imagePaths = []
+    for i in range(size):
+        imagePath = tempPath("image%s.png" % i)
+        seed()
+        drawBot.newDrawing()
+        drawBot.newPage(1000, 1000)
+        for j in range(100):
+            drawBot.fill(random.random(), random.random(), random.random())
+            drawBot.oval(random.random() * 1000, random.random() * 1000, 100, 100)
+        drawBot.saveImage(imagePath)
+        imagePaths.append(imagePath)
+    drawBot.newDrawing()
+    for imagePath in imagePaths:
+        drawBot.newPage(1000, 1000)
+        drawBot.image(imagePath, (0, 0))
+    paths = [tempPath("images.pdf"), tempPath("images.png")]
+
+    def callback():
+        imageCache.clear()
+        drawBot.saveImage(paths, multipage=True)
+    return callback
+
+
+# text
+
+
+@benchmark("textBox", sizes=[100, 1000, 10000])
+def textBoxBenchmark(size):
+    import drawBot
+    txt = words(size)
+
+    def callback():
+        drawBot.newDrawing()
+        drawBot.newPage(1000, 1000)
+        drawBot.fontSize(10)
+        drawBot.textBox(txt, (10, 10, 300, 980))
+    return callback
+
+
+@benchmark("textSize", sizes=[100, 1000, 10000])
+def textSizeBenchmark(size):
+    import drawBot
+    txt = words(size)
+
+    def callback():
+        drawBot.newDrawing()
+        drawBot.fontSize(10)
+        drawBot.textSize(txt, width=300)
+    return callback
+
+
+def checkTextFlowRanges():
+    # the ranges returned by textFlow must be the ranges the contexts draw in each box
+    import drawBot
+    from drawBot.context.baseContext import BaseContext
+
+    class TextBoxRangesContext(BaseContext):
+
+        def __init__(self):
+            super(TextBoxRangesContext, self).__init__()
+            self.ranges = []
+
+        def _textBox(self, txt, box, align, location=0):
+            visibleRange = self._getTextLayout(txt, box, align, location=location).visibleRange
+            self.ranges.append((visibleRange.location, visibleRange.length))
+
+    indented = drawBot.FormattedString()
+    for paragraph in words(2000).split(" do "):
+        indented.append(paragraph + "\n", fontSize=12, firstLineIndent=40, paragraphTopSpacing=20)
+    for txt, align in ((words(2000), "justified"), (indented, None)):
+        drawBot.newDrawing()
+        drawBot.fontSize(12)
+        boxes = [(10, 10, 300, 200)] * 20
+        ranges = drawBot.textFlow(txt, boxes, align)
+        context = TextBoxRangesContext()
+        drawBot._drawBotDrawingTool._drawInContext(context)
+        assert context.ranges == ranges, (align, context.ranges, ranges)
+
+
+def textFlowBenchmark(useTextFlow):
+    # flow a long text over `size` pages
+    def func(size):
+        import drawBot
+        if useTextFlow:
+            checkTextFlowRanges()
+        txt = words(size * 500)
+        box = (10, 10, 480, 480)
+
+        def pages():
+            while True:
+                drawBot.newPage(500, 500)
+                yield box
+
+        def callback():
+            drawBot.newDrawing()
+            drawBot.fontSize(10)
+            if useTextFlow:
+                drawBot.textFlow(txt, pages())
+            else:
+                overflow = txt
+                while overflow:
+                    drawBot.newPage(500, 500)
+                    overflow = drawBot.textBox(overflow, box)
+        return callback
+    return func
+
+
+benchmark("textBox overflow pages", sizes=[10, 100, 300], repeat=1)(textFlowBenchmark(False))
+benchmark("textFlow pages", sizes=[10, 100, 300], repeat=1)(textFlowBenchmark(True))
+
+
+def labels(count):
+    seed()
+    return ["".join(random.choice(_syllables) for i in range(random.randint(1, 6))) for j in range(count)]
+
+
+@benchmark("textSize labels", sizes=[10000, 100000], repeat=1)
+def textSizeLabelsBenchmark(size):
+    # a textSize call for each label
+    import drawBot
+    texts = labels(size)
+
+    def callback():
+        drawBot.newDrawing()
+        drawBot.fontSize(10)
+        for txt in texts:
+            drawBot.textSize(txt)
+    return callback
+
+
+@benchmark("textSizes labels", sizes=[10000, 100000], repeat=1)
+def textSizesLabelsBenchmark(size):
+    # a single textSizes call for all labels
+    import drawBot
+    texts = labels(size)
+
+    def callback():
+        drawBot.newDrawing()
+        drawBot.fontSize(10)
+        drawBot.textSizes(texts)
+    return callback
+
+
+@benchmark("formattedString append", sizes=[1000, 10000, 100000], repeat=1)
+def formattedStringAppendBenchmark(size):
+    # many short runs sharing a few fonts, paragraph settings and colors
+    import drawBot
+    seed()
+    runs = []
+    for i in range(size):
+        runs.append(dict(
+            font=random.choice(["Helvetica", "Times-Roman", "Courier"]),
+            fontSize=random.choice([8, 10, 12]),
+            fill=random.choice([(0, 0, 0), (1, 0, 0), (0, 0, 1)]),
+            lineHeight=random.choice([None, 14]),
+            openTypeFeatures=random.choice([dict(), dict(smcp=True)]),
+        ))
+
+    def callback():
+        txt = drawBot.FormattedString()
+        for attributes in runs:
+            txt.append("run ", **attributes)
+    return callback
+
+
+@benchmark("hyphenation", sizes=[10, 100, 1000], repeat=1)
+def hyphenationBenchmark(size):
+    # a single paragraph of about `size` lines in a narrow column
+    import CoreText
+    from drawBot.context.baseContext import BaseContext
+    context = BaseContext()
+    context.fontSize(10)
+    attrString = context.attributedString(words(size * 5))
+    path = CoreText.CGPathCreateMutable()
+    CoreText.CGPathAddRect(path, None, CoreText.CGRectMake(0, 0, 150, size * 15))
+    return lambda: context.hyphenateAttributedString(attrString, path)
+
+
+@benchmark("headless layoutText", sizes=[1000, 10000, 100000], repeat=1)
+def headlessLayoutTextBenchmark(size):
+    # a long document of `size` words laid out with fontTools
+    headlessText = importFromTools("headlessText")
+    path = fontFilePath()
+    txt = words(size)
+
+    def callback():
+        headlessText.clearFontCache()
+        headlessText.layoutText([(txt, dict(font=path, fontSize=10))], (0, 0, 300, 10000000))
+    return callback
+
+
+@benchmark("headless textBox", sizes=[100, 1000, 5000], repeat=1)
+def headlessTextBoxBenchmark(size):
+    ArrayBezierPath = importFromTools("arrayBezierPath").ArrayBezierPath
+    path = fontFilePath()
+    txt = words(size)
+
+    def callback():
+        bezierPath = ArrayBezierPath()
+        bezierPath.textBox(txt, (0, 0, 500, 100000), font=path, fontSize=10)
+        bezierPath.bounds()
+    return callback
+
+
+@benchmark("fontCatalog fontsSupportingCharacters", sizes=[100, 1000, 10000], repeat=1)
+def fontCatalogBenchmark(size):
+    # pick fonts by coverage for many labels, the catalog index is built in the setup
+    FontCatalog = importFromTools("fontCatalog").FontCatalog
+    texts = labels(size)
+
+    def setup():
+        catalog = FontCatalog(indexPath=tempPath("fontCatalog.json"))
+        catalog.update()
+        return catalog
+
+    def callback(catalog):
+        for txt in texts:
+            catalog.fontsSupportingCharacters(txt)
+    return setup, callback
+
+
+# bezier paths
+
+
+def randomOvals(pathClass, count):
+    seed()
+    path = pathClass()
+    for i in range(count):
+        path.oval(random.random() * 1000, random.random() * 1000, 50, 50)
+    return path
+
+
+@benchmark("bezierPath textBox", sizes=[100, 1000, 5000], repeat=1)
+def bezierPathTextBoxBenchmark(size):
+    from drawBot.context.baseContext import BezierPath
+    txt = words(size)
+
+    def callback():
+        path = BezierPath()
+        path.textBox(txt, (0, 0, 500, 100000), fontSize=10)
+    return callback
+
+
+@benchmark("booleanOperations removeOverlap", sizes=[10, 100, 500], repeat=1)
+def removeOverlapBenchmark(size):
+    import booleanOperations
+    from drawBot.context.baseContext import BezierPath
+    return lambda: randomOvals(BezierPath, size).removeOverlap()
+
+
+@benchmark("booleanOperations difference", sizes=[10, 100, 500], repeat=1)
+def differenceBenchmark(size):
+    import booleanOperations
+    from drawBot.context.baseContext import BezierPath
+    path = randomOvals(BezierPath, size)
+    other = BezierPath()
+    other.rect(250, 250, 500, 500)
+    return lambda: path.difference(other)
+
+
+@benchmark("arrayBezierPath bounds", sizes=[1000, 10000, 100000])
+def arrayBezierPathBenchmark(size):
+    ArrayBezierPath = importFromTools("arrayBezierPath").ArrayBezierPath
+    path = randomOvals(ArrayBezierPath, size)
+
+    def callback():
+        path.translate(1, 1)
+        path.bounds()
+    return callback
+
+
+# image objects
+
+
+@benchmark("imageObject filters", sizes=[100, 500, 1000])
+def imageObjectBenchmark(size):
+    import drawBot
+
+    def setup():
+        seed()
+        im = drawBot.ImageObject()
+        with im:
+            drawBot.size(size, size)
+            for i in range(100):
+                drawBot.fill(random.random(), random.random(), random.random())
+                drawBot.rect(random.random() * size, random.random() * size, size * .1, size * .1)
+        return im
+
+    def callback(im):
+        im.gaussianBlur(radius=5)
+        im.colorControls(saturation=1.5, contrast=1.2)
+        im.sepiaTone(intensity=.5)
+        im.zoomBlur(center=(size * .5, size * .5), amount=10)
+        # force core image to render
+        im._nsImage().TIFFRepresentation()
+    return setup, callback
+
+
+@benchmark("imageObject filter chain", sizes=[10, 50, 200], repeat=1)
+def imageObjectFilterChainBenchmark(size):
+    # add one filter at a time and ask the size after each step
+    import drawBot
+
+    def setup():
+        im = drawBot.ImageObject()
+        im.checkerboardGenerator(size=(200, 200), width=10)
+        return im
+
+    def callback(im):
+        for i in range(size):
+            im.colorControls(saturation=1.01)
+            im.size()
+        im.copy().size()
+    return setup, callback
+
+
+@benchmark("imageObject toArray fromArray", sizes=[100, 500, 1000, 2000])
+def imageObjectArrayBenchmark(size):
+    import numpy
+    import drawBot
+
+    def setup():
+        im = drawBot.ImageObject()
+        im.checkerboardGenerator(size=(size, size), width=10)
+        return im
+
+    def callback(im):
+        array = im.toArray()
+        array[..., 0] = 255 - array[..., 0]
+        other = drawBot.ImageObject()
+        other.fromArray(array)
+        other.toArray(dtype="float32")
+    return setup, callback
+
+
+def pixelColorBenchmark(mode):
+    # sample a size x size grid of a 2000 x 2000 image
+    def func(size):
+        import drawBot
+        if mode != "single":
+            import numpy
+        path = tempPath("pixelColor.png")
+        if not os.path.exists(path):
+            seed()
+            drawBot.newDrawing()
+            drawBot.newPage(2000, 2000)
+            for i in range(1000):
+                drawBot.fill(random.random(), random.random(), random.random(), random.random())
+                drawBot.rect(random.random() * 2000, random.random() * 2000, 100, 100)
+            drawBot.saveImage(path)
+        step = max(1, 2000 // size)
+        coordinates = range(0, 2000, step)
+
+        def callback():
+            # clear the cached bitmaps to include decoding the image
+            drawBot.drawBotDrawingTools.imageCache.clear()
+            if mode == "single":
+                for x in coordinates:
+                    for y in coordinates:
+                        drawBot.imagePixelColor(path, (x, y))
+            elif mode == "points":
+                drawBot.imagePixelColors(path, [(x, y) for x in coordinates for y in coordinates])
+            else:
+                drawBot.imagePixelColorGrid(path, step)
+        return callback
+    return func
+
+
+benchmark("imagePixelColor", sizes=[100, 500], repeat=1)(pixelColorBenchmark("single"))
+benchmark("imagePixelColors", sizes=[100, 500, 2000], repeat=1)(pixelColorBenchmark("points"))
+benchmark("imagePixelColorGrid", sizes=[100, 500, 2000], repeat=1)(pixelColorBenchmark("grid"))
+
+
+# runner
+
+
+def runBenchmark(name, size, repeat, func):
+    result = dict(name=name, size=size, repeat=repeat, status="ok", seconds=None, message=None)
+    try:
+        callback = func(size)
+    except ImportError as e:
+        result["status"] = "skipped"
+        result["message"] = str(e)
+        return result
+    except Exception:
+        result["status"] = "error"
+        result["message"] = traceback.format_exc()
+        return result
+    setup = None
+    if isinstance(callback, tuple):
+        setup, callback = callback
+    try:
+        result["seconds"] = timeIt(callback, repeat=repeat, setup=setup)
+    except Exception:
+        result["status"] = "error"
+        result["message"] = traceback.format_exc()
+    return result
+
+
+def run(only=None, quick=False):
+    results = []
+    skipped = set()
+    try:
+        for name, sizes, repeat, func in _benchmarks:
+            if only and name not in only:
+                continue
+            if quick:
+                sizes = sizes[:1]
+            for size in sizes:
+                if name in skipped:
+                    continue
+                result = runBenchmark(name, size, repeat, func)
+                results.append(result)
+                if result["status"] == "skipped":
+                    skipped.add(name)
+                    report("%s" % name, skipped=result["message"])
+                elif result["status"] == "error":
+                    report("%s %s" % (name, size), error=result["message"].strip().splitlines()[-1])
+                else:
+                    report("%s %s" % (name, size), seconds=result["seconds"])
+    finally:
+        if _tempFolder is not None:
+            shutil.rmtree(_tempFolder)
+    return results
+
+
+def compare(results, previousResults):
+    previous = dict(((result["name"], repr(result["size"])), result) for result in previousResults)
+    for result in results:
+        other = previous.get((result["name"], repr(result["size"])))
+        if other is None or result["seconds"] is None or not other["seconds"]:
+            continue
+        report("%s %s" % (result["name"], result["size"]), seconds=result["seconds"], previous=other["seconds"], ratio=result["seconds"] / other["seconds"])
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run the drawBot benchmarks.")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "benchmarks.json"), help="Path of the json results file.")
+    parser.add_argument("--compare", default=None, help="Path of a previous json results file to compare with.")
+    parser.add_argument("--quick", action="store_true", help="Only run the smallest size of each benchmark.")
+    parser.add_argument("--only", nargs="*", default=None, help="Names of the benchmarks to run.")
+    args = parser.parse_args(args)
+    results = run(only=args.only, quick=args.quick)
+    writeResults(args.output, results)
+    if args.compare:
+        compare(results, readResults(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+A compact, array backed storage for the drawing instructions of a single page.
+
+A `CompactInstructionSet` behaves like the list of `(callback, args, kwargs)`
+tuples `DrawBotDrawingTool` records, but stores:
+
+* the callback name and the layout of the arguments as a small interned opcode,
+* int and float arguments packed in a typed array of doubles,
+* all other arguments (paths, formatted strings, images, ...) in a side table.
+
+Iterating over the set yields the same `(callback, args, kwargs)` tuples.
+"""
+
+from array import array
+
+
+# argument layout codes
+_FLOAT = "f"
+_INT = "i"
+_NONE = "n"
+_OBJECT = "o"
+
+# ints are stored as doubles, only ints that fit exactly are packed
+_MAXPACKEDINT = 2 ** 53
+
+# opcode table shared by all instruction sets
+# each opcode is: callback, argument layout, amount of numbers, amount of objects, has kwargs
+_opcodeTable = []
+_opcodeMap = {}
+
+
+def _getOpcode(callback, layout, hasKwargs):
+    key = callback, layout, hasKwargs
+    opcode = _opcodeMap.get(key)
+    if opcode is None:
+        numberCount = 0
+        objectCount = 0
+        for code in layout:
+            if code == _OBJECT:
+                objectCount += 1
+            elif code in (_FLOAT, _INT):
+                numberCount += 1
+            elif isinstance(code, tuple):
+                numberCount += sum(1 for item in code if item != _NONE)
+        if hasKwargs:
+            objectCount += 1
+        opcode = len(_opcodeTable)
+        _opcodeTable.append((callback, layout, numberCount, objectCount, hasKwargs))
+        _opcodeMap[key] = opcode
+    return opcode
+
+
+def _numberCode(value):
+    valueType = type(value)
+    if valueType is float:
+        return _FLOAT
+    if valueType is int and -_MAXPACKEDINT <= value <= _MAXPACKEDINT:
+        return _INT
+    if value is None:
+        return _NONE
+    return None
+
+
+def _encodeArguments(args, numbers, objects):
+    layout = []
+    for arg in args:
+        code = _numberCode(arg)
+        if code is not None:
+            if code != _NONE:
+                numbers.append(arg)
+            layout.append(code)
+        elif type(arg) is tuple and arg:
+            itemCodes = [_numberCode(item) for item in arg]
+            if None in itemCodes:
+                objects.append(arg)
+                layout.append(_OBJECT)
+            else:
+                numbers.extend(item for item in arg if item is not None)
+                layout.append(tuple(itemCodes))
+        else:
+            objects.append(arg)
+            layout.append(_OBJECT)
+    return tuple(layout)
+
+
+class CompactInstructionSet(object):
+
+    """
+    A list like container for `(callback, args, kwargs)` instructions.
+    """
+
+    def __init__(self, instructions=None):
+        self._opcodes = array("H")
+        self._numbers = array("d")
+        self._objects = []
+        if instructions is not None:
+            for instruction in instructions:
+                self.append(instruction)
+
+    def __repr__(self):
+        return "<CompactInstructionSet %s instructions>" % len(self)
+
+    def __len__(self):
+        return len(self._opcodes)
+
+    def _encode(self, instruction):
+        callback, args, kwargs = instruction
+        numbers = []
+        objects = []
+        layout = _encodeArguments(args, numbers, objects)
+        if kwargs:
+            objects.append(dict(kwargs))
+        opcode = _getOpcode(callback, layout, bool(kwargs))
+        if opcode > 0xFFFF and self._opcodes.typecode == "H":
+            self._opcodes = array("L", self._opcodes)
+        return opcode, numbers, objects
+
+    def append(self, instruction):
+        """
+        Append a `(callback, args, kwargs)` instruction.
+        """
+        opcode, numbers, objects = self._encode(instruction)
+        self._opcodes.append(opcode)
+        self._numbers.extend(numbers)
+        self._objects.extend(objects)
+
+    def insert(self, index, instruction):
+        """
+        Insert a `(callback, args, kwargs)` instruction before `index`.
+        """
+        if index < 0:
+            index = max(0, len(self) + index)
+        index = min(index, len(self))
+        opcode, numbers, objects = self._encode(instruction)
+        numberIndex = objectIndex = 0
+        for previous in self._opcodes[:index]:
+            _, _, numberCount, objectCount, _ = _opcodeTable[previous]
+            numberIndex += numberCount
+            objectIndex += objectCount
+        self._opcodes.insert(index, opcode)
+        self._numbers[numberIndex:numberIndex] = array("d", numbers)
+        self._objects[objectIndex:objectIndex] = objects
+
+    def __iter__(self):
+        numbers = self._numbers
+        objects = self._objects
+        numberIndex = objectIndex = 0
+        for opcode in self._opcodes:
+            callback, layout, _, _, hasKwargs = _opcodeTable[opcode]
+            args = []
+            for code in layout:
+                if code == _FLOAT:
+                    args.append(numbers[numberIndex])
+                    numberIndex += 1
+                elif code == _INT:
+                    args.append(int(numbers[numberIndex]))
+                    numberIndex += 1
+                elif code == _NONE:
+                    args.append(None)
+                elif code == _OBJECT:
+                    args.append(objects[objectIndex])
+                    objectIndex += 1
+                else:
+                    item = []
+                    for itemCode in code:
+                        if itemCode == _NONE:
+                            item.append(None)
+                        else:
+                            value = numbers[numberIndex]
+                            if itemCode == _INT:
+                                value = int(value)
+                            item.append(value)
+                            numberIndex += 1
+                    args.append(tuple(item))
+            kwargs = {}
+            if hasKwargs:
+                kwargs = dict(objects[objectIndex])
+                objectIndex += 1
+            yield callback, tuple(args), kwargs
@@ -4,6 +4,7 @@ from gifContext import GifContext
 from svgContext import SVGContext
 from movContext import MOVContext
 from printContext import PrintContext
+from rasterContext import RasterContext
 
 
 allContexts = (PDFContext, ImageContext, SVGContext, MOVContext, PrintContext, GifContext)
@@ -2,6 +2,7 @@ import AppKit
 import CoreText
 import Quartz
 
+import os
 import math
 
 from fontTools.pens.basePen import BasePen
@@ -10,6 +11,12 @@ from drawBot.misc import DrawBotError, cmyk2rgb, warnings
 
 from tools import openType
 from tools import variation
+from tools.bezierContour import BezierContour, contourSlices, copyContour
+from tools.lruCache import LRUCache
+from tools.incrementalTypesetter import IncrementalTypesetter
+from tools.fontRegistry import fontRegistry
+from tools.fontCatalog import fontCatalog
+from tools.textLayoutData import frameToData, fontFromData, clearFontCache
 
 
 _FALLBACKFONT = "LucidaGrande"
@@ -20,61 +27,6 @@ def _tryInstallFontFromFontName(fontName):
     return _drawBotDrawingTool._tryInstallFontFromFontName(fontName)
 
 
-class BezierContour(list):
-
-    """
-    A Bezier contour object.
-    """
-
-    def __init__(self, *args, **kwargs):
-        super(BezierContour, self).__init__(*args, **kwargs)
-        self.open = True
-
-    def __repr__(self):
-        return "<BezierContour>"
-
-    def _get_clockwise(self):
-        from fontTools.pens.areaPen import AreaPen
-        pen = AreaPen()
-        pen.endPath = pen.closePath
-        self.drawToPen(pen)
-        return pen.value < 0
-
-    clockwise = property(_get_clockwise, doc="A boolean representing if the contour has a clockwise direction.")
-
-    def drawToPointPen(self, pointPen):
-        pointPen.beginPath()
-        for i, segment in enumerate(self):
-            if len(segment) == 1:
-                segmentType = "line"
-                if i == 0 and self.open:
-                    segmentType = "move"
-                pointPen.addPoint(segment[0], segmentType=segmentType)
-            else:
-                pointPen.addPoint(segment[0])
-                pointPen.addPoint(segment[1])
-                pointPen.addPoint(segment[2], segmentType="curve")
-        pointPen.endPath()
-
-    def drawToPen(self, pen):
-        for i, segment in enumerate(self):
-            if i == 0:
-                pen.moveTo(*segment)
-            elif len(segment) == 1:
-                pen.lineTo(*segment)
-            else:
-                pen.curveTo(*segment)
-        if self.open:
-            pen.endPath()
-        else:
-            pen.closePath()
-
-    def _get_points(self):
-        return [point for segment in self for point in segment]
-
-    points = property(_get_points, doc="Return a list of all the points making up this contour, regardless of whether they are on curve or off curve.")
-
-
 class BezierPath(BasePen):
 
     """
@@ -89,16 +41,49 @@ class BezierPath(BasePen):
         AppKit.NSCurveToBezierPathElement: "curve"
     }
 
+    # shared by all bezier paths, glyph outlines are placed with a translation
+    _glyphOutlineCache = LRUCache(maxSize=2048)
+
     def __init__(self, path=None, glyphSet=None):
         if path is None:
             self._path = AppKit.NSBezierPath.bezierPath()
         else:
             self._path = path
+        self._cache = {}
+        self._cacheToken = None
         BasePen.__init__(self, glyphSet)
 
     def __repr__(self):
         return "<BezierPath>"
 
+    # cache support
+
+    def _pathChanged(self):
+        # clear all cached representations of the path
+        self._cache = {}
+
+    def _cachedValue(self, key, factory):
+        # return a cached representation of the path, `factory` is called with the path when missing
+        # the cache is also cleared when the nsBezierPath is replaced or appended directly
+        token = id(self._path), self._path.elementCount()
+        if token != self._cacheToken:
+            self._cache = {}
+            self._cacheToken = token
+        if key not in self._cache:
+            self._cache[key] = factory(self)
+        return self._cache[key]
+
+    def _getCachedValue(self, key):
+        # return a cached representation of the path or None, without creating it
+        if (id(self._path), self._path.elementCount()) != self._cacheToken:
+            return None
+        return self._cache.get(key)
+
+    def _setCachedValue(self, key, value):
+        # store a representation of the current path, like a transformed copy of a cached representation
+        self._cachedValue(key, lambda path: value)
+        self._cache[key] = value
+
     # pen support
 
     def _moveTo(self, pt):
@@ -106,12 +91,14 @@ class BezierPath(BasePen):
         Move to a point `x`, `y`.
         """
         self._path.moveToPoint_(pt)
+        self._pathChanged()
 
     def _lineTo(self, pt):
         """
         Line to a point `x`, `y`.
         """
         self._path.lineToPoint_(pt)
+        self._pathChanged()
 
     def _curveToOne(self, pt1, pt2, pt3):
         """
@@ -119,12 +106,14 @@ class BezierPath(BasePen):
         With given bezier handles `x1`, `y1` and `x2`, `y2`.
         """
         self._path.curveToPoint_controlPoint1_controlPoint2_(pt3, pt1, pt2)
+        self._pathChanged()
 
     def closePath(self):
         """
         Close the path.
         """
         self._path.closePath()
+        self._pathChanged()
 
     def beginPath(self, identifier=None):
         """
@@ -175,18 +164,21 @@ class BezierPath(BasePen):
         """
         self._path.appendBezierPathWithArcWithCenter_radius_startAngle_endAngle_clockwise_(
             center, radius, startAngle, endAngle, clockwise)
+        self._pathChanged()
 
     def arcTo(self, pt1, pt2, radius):
         """
         Arc from one point to an other point with a given `radius`.
         """
         self._path.appendBezierPathWithArcFromPoint_toPoint_radius_(pt1, pt2, radius)
+        self._pathChanged()
 
     def rect(self, x, y, w, h):
         """
         Add a rectangle at possition `x`, `y` with a size of `w`, `h`
         """
         self._path.appendBezierPathWithRect_(((x, y), (w, h)))
+        self._pathChanged()
 
     def oval(self, x, y, w, h):
         """
@@ -253,31 +245,41 @@ class BezierPath(BasePen):
         context.font(font, fontSize)
         context.hyphenation(hyphenation)
 
-        path, (x, y) = context._getPathForFrameSetter(box)
-        attributedString = context.attributedString(txt, align)
-
-        setter = CoreText.CTFramesetterCreateWithAttributedString(attributedString)
-        frame = CoreText.CTFramesetterCreateFrame(setter, (0, 0), path, None)
-        ctLines = CoreText.CTFrameGetLines(frame)
-        origins = CoreText.CTFrameGetLineOrigins(frame, (0, len(ctLines)), None)
-
-        for i, (originX, originY) in enumerate(origins):
-            ctLine = ctLines[i]
-            ctRuns = CoreText.CTLineGetGlyphRuns(ctLine)
-            for ctRun in ctRuns:
-                attributes = CoreText.CTRunGetAttributes(ctRun)
-                font = attributes.get(AppKit.NSFontAttributeName)
-                baselineShift = attributes.get(AppKit.NSBaselineOffsetAttributeName, 0)
-                glyphCount = CoreText.CTRunGetGlyphCount(ctRun)
-                for i in range(glyphCount):
-                    glyph = CoreText.CTRunGetGlyphs(ctRun, (i, 1), None)[0]
-                    ax, ay = CoreText.CTRunGetPositions(ctRun, (i, 1), None)[0]
+        layout = context._getTextLayout(txt, box, align).data
+        x, y = layout["origin"]
+
+        for line in layout["lines"]:
+            originX, originY = line["origin"]
+            for run in line["runs"]:
+                font = fontFromData(run["font"])
+                baselineShift = run["baselineShift"]
+                # the outline of a glyph depends on the font, size and variation instance
+                fontKey = run["font"]["name"], run["font"]["size"], tuple(tuple(item) for item in run["font"]["variations"])
+                for glyph, (ax, ay) in zip(run["glyphs"], run["positions"]):
                     if glyph:
-                        self._path.moveToPoint_((x + originX + ax, y + originY + ay + baselineShift))
-                        self._path.appendBezierPathWithGlyph_inFont_(glyph, font)
+                        outline = self._glyphOutline(fontKey, font, glyph)
+                        if outline is None:
+                            continue
+                        transform = AppKit.NSAffineTransform.transform()
+                        transform.translateXBy_yBy_(x + originX + ax, y + originY + ay + baselineShift)
+                        self._path.appendBezierPath_(transform.transformBezierPath_(outline))
+        self._pathChanged()
         self.optimizePath()
         return context.clippedText(txt, box, align)
 
+    def _glyphOutline(self, fontKey, font, glyph):
+        # return the outline of a glyph at the origin, or None when the glyph has no outline
+        key = fontKey, glyph
+        outline = self._glyphOutlineCache.get(key, False)
+        if outline is False:
+            outline = AppKit.NSBezierPath.bezierPath()
+            outline.moveToPoint_((0, 0))
+            outline.appendBezierPathWithGlyph_inFont_(glyph, font)
+            if outline.elementCount() <= 1:
+                outline = None
+            self._glyphOutlineCache[key] = outline
+        return outline
+
     def traceImage(self, path, threshold=.2, blur=None, invert=False, turd=2, tolerance=0.2, offset=None):
         """
         Convert a given image to a vector outline.
@@ -332,6 +334,7 @@ class BezierPath(BasePen):
         Set a nsBezierPath.
         """
         self._path = path
+        self._pathChanged()
 
     def pointInside(self, (x, y)):
         """
@@ -371,6 +374,7 @@ class BezierPath(BasePen):
                 elif instruction == AppKit.NSClosePathBezierPathElement:
                     optimizedPath.closePath()
             self._path = optimizedPath
+            self._pathChanged()
 
     def copy(self):
         """
@@ -378,6 +382,10 @@ class BezierPath(BasePen):
         """
         new = self.__class__()
         new._path = self._path.copy()
+        # a copy has the same cached representations
+        if self._cacheToken == (id(self._path), self._path.elementCount()):
+            new._cache = dict(self._cache)
+            new._cacheToken = id(new._path), new._path.elementCount()
         return new
 
     def reverse(self):
@@ -385,12 +393,14 @@ class BezierPath(BasePen):
         Reverse the path direction
         """
         self._path = self._path.bezierPathByReversingPath()
+        self._pathChanged()
 
     def appendPath(self, otherPath):
         """
         Append a path.
         """
         self._path.appendBezierPath_(otherPath.getNSBezierPath())
+        self._pathChanged()
 
     def __add__(self, otherPath):
         new = self.copy()
@@ -445,6 +455,7 @@ class BezierPath(BasePen):
         aT = AppKit.NSAffineTransform.transform()
         aT.setTransformStruct_(transformMatrix[:])
         self._path.transformUsingAffineTransform_(aT)
+        self._pathChanged()
 
     # boolean operations
 
@@ -550,18 +561,19 @@ class BezierPath(BasePen):
         self.setNSBezierPath(result.getNSBezierPath())
         return self
 
+    def _getPathData(self):
+        # walk over the nsBezierPath only once, until the path changes
+        return self._cachedValue("pathData", _pathDataForBezierPath)
+
     def _points(self, onCurve=True, offCurve=True):
-        points = []
         if not onCurve and not offCurve:
-            return points
-        for index in range(self._path.elementCount()):
-            instruction, pts = self._path.elementAtIndex_associatedPoints_(index)
-            if not onCurve:
-                pts = pts[:-1]
-            elif not offCurve:
-                pts = pts[-1:]
-            points.extend([(p.x, p.y) for p in pts])
-        return points
+            return []
+        points, segmentStarts, contours = self._getPathData()
+        if onCurve and offCurve:
+            return list(points)
+        if onCurve:
+            return list(self._cachedValue("onCurvePoints", _onCurvePointsForBezierPath))
+        return list(self._cachedValue("offCurvePoints", _offCurvePointsForBezierPath))
 
     def _get_points(self):
         return self._points()
@@ -579,26 +591,19 @@ class BezierPath(BasePen):
     offCurvePoints = property(_get_offCurvePoints, doc="Return a list of all off curve points.")
 
     def _get_contours(self):
-        contours = []
-        for index in range(self._path.elementCount()):
-            instruction, pts = self._path.elementAtIndex_associatedPoints_(index)
-            if instruction == AppKit.NSMoveToBezierPathElement:
-                contours.append(self.contourClass())
-            if instruction == AppKit.NSClosePathBezierPathElement:
-                contours[-1].open = False
-            if pts:
-                contours[-1].append([(p.x, p.y) for p in pts])
-        if len(contours) >= 2 and len(contours[-1]) == 1 and contours[-1][0] == contours[-2][0]:
-            contours.pop()
-        return contours
+        # the contour slices are cached, return copies so changing a contour does not change the path data
+        return [copyContour(contour, self.contourClass) for contour in self._getPathData()[2]]
 
     contours = property(_get_contours, doc="Return a list of contours with all point coordinates sorted in segments. A contour object has an `open` attribute.")
 
     def __len__(self):
-        return len(self.contours)
+        return len(self._getPathData()[2])
 
     def __getitem__(self, index):
-        return self.contours[index]
+        contours = self._getPathData()[2]
+        if isinstance(index, slice):
+            return [copyContour(contour, self.contourClass) for contour in contours[index]]
+        return copyContour(contours[index], self.contourClass)
 
     def __iter__(self):
         contours = self.contours
@@ -610,6 +615,40 @@ class BezierPath(BasePen):
             index += 1
 
 
+def _pathDataForBezierPath(bezierPath):
+    # return all points, the index of the first point of each segment and the contours as slices of those points
+    path = bezierPath.getNSBezierPath()
+    points = []
+    segmentStarts = []
+    contourRanges = []
+    for index in range(path.elementCount()):
+        instruction, pts = path.elementAtIndex_associatedPoints_(index)
+        if instruction == AppKit.NSMoveToBezierPathElement:
+            contourRanges.append([len(segmentStarts), len(segmentStarts), True])
+        if instruction == AppKit.NSClosePathBezierPathElement:
+            contourRanges[-1][2] = False
+        if pts:
+            segmentStarts.append(len(points))
+            points.extend([(p.x, p.y) for p in pts])
+            contourRanges[-1][1] = len(segmentStarts)
+    points = tuple(points)
+    segmentStarts.append(len(points))
+    return points, segmentStarts, contourSlices(points, segmentStarts, contourRanges)
+
+
+def _onCurvePointsForBezierPath(bezierPath):
+    points, segmentStarts, contours = bezierPath._getPathData()
+    return [points[end - 1] for end in segmentStarts[1:]]
+
+
+def _offCurvePointsForBezierPath(bezierPath):
+    points, segmentStarts, contours = bezierPath._getPathData()
+    offCurvePoints = []
+    for start, end in zip(segmentStarts, segmentStarts[1:]):
+        offCurvePoints.extend(points[start:end - 1])
+    return offCurvePoints
+
+
 class Color(object):
 
     colorSpace = AppKit.NSColorSpace.genericRGBColorSpace
@@ -738,6 +777,13 @@ class Gradient(object):
         return new
 
 
+def _hashableItems(value):
+    # return a dict as sorted tuple of items
+    if not value:
+        return None
+    return tuple(sorted(value.items()))
+
+
 class FormattedString(object):
 
     """
@@ -748,6 +794,11 @@ class FormattedString(object):
     _colorClass = Color
     _cmykColorClass = CMYKColor
 
+    # shared by all formatted strings, most text uses only a few different fonts, paragraph styles and colors
+    _fontCache = LRUCache(maxSize=256)
+    _paragraphStyleCache = LRUCache(maxSize=256)
+    _colorCache = LRUCache(maxSize=256)
+
     _textAlignMap = dict(
         center=AppKit.NSCenterTextAlignment,
         left=AppKit.NSLeftTextAlignment,
@@ -914,66 +965,30 @@ class FormattedString(object):
         if isinstance(txt, FormattedString):
             self._attributedString.appendAttributedString_(txt.getNSObject())
             return
+        txt = AppKit.NSAttributedString.alloc().initWithString_attributes_(txt, self._textAttributes())
+        self._attributedString.appendAttributedString_(txt)
+
+    def _textAttributes(self):
+        # return the attributes dict for text with the current settings
         attributes = {}
         if self._font:
-            font = AppKit.NSFont.fontWithName_size_(self._font, self._fontSize)
-            if font is None:
-                ff = self._fallbackFont
-                if ff is None:
-                    ff = _FALLBACKFONT
-                warnings.warn("font: '%s' is not installed, back to the fallback font: '%s'" % (self._font, ff))
-                font = AppKit.NSFont.fontWithName_size_(ff, self._fontSize)
-            coreTextfeatures = []
-            if self._openTypeFeatures:
-                existingOpenTypeFeatures = openType.getFeatureTagsForFontName(self._font)
-                # sort features by their on/off state
-                # set all disabled features first
-                orderedOpenTypeFeatures = sorted(self._openTypeFeatures.items(), key=lambda (k, v): v)
-                for featureTag, value in orderedOpenTypeFeatures:
-                    coreTextFeatureTag = featureTag
-                    if not value:
-                        coreTextFeatureTag = "%s_off" % featureTag
-                    if coreTextFeatureTag in openType.featureMap:
-                        if value and featureTag not in existingOpenTypeFeatures:
-                            # only warn when the feature is on and not existing for the current font
-                            warnings.warn("OpenType feature '%s' not available for '%s'" % (featureTag, self._font))
-                        feature = openType.featureMap[coreTextFeatureTag]
-                        coreTextfeatures.append(feature)
-                    else:
-                        warnings.warn("OpenType feature '%s' not available" % (featureTag))
-            coreTextFontVariations = dict()
-            if self._fontVariations:
-                existingAxes = variation.getVariationAxesForFontName(self._font)
-                for axis, value in self._fontVariations.items():
-                    if axis in existingAxes:
-                        existinsAxis = existingAxes[axis]
-                        # clip variation value within the min max value
-                        if value < existinsAxis["minValue"]:
-                            value = existinsAxis["minValue"]
-                        if value > existinsAxis["maxValue"]:
-                            value = existinsAxis["maxValue"]
-                        coreTextFontVariations[variation.convertVariationTagToInt(axis)] = value
-                    else:
-                        warnings.warn("variation axis '%s' not available for '%s'" % (axis, self._font))
-            fontAttributes = {}
-            if coreTextfeatures:
-                fontAttributes[CoreText.NSFontFeatureSettingsAttribute] = coreTextfeatures
-            if coreTextFontVariations:
-                fontAttributes[CoreText.NSFontVariationAttribute] = coreTextFontVariations
-            if self._fallbackFont:
-                fontAttributes[CoreText.NSFontCascadeListAttribute] = [AppKit.NSFontDescriptor.fontDescriptorWithName_size_(self._fallbackFont, self._fontSize)]
-            fontDescriptor = font.fontDescriptor()
-            fontDescriptor = fontDescriptor.fontDescriptorByAddingAttributes_(fontAttributes)
-            font = AppKit.NSFont.fontWithDescriptor_size_(fontDescriptor, self._fontSize)
+            key = self._font, self._fontSize, _hashableItems(self._openTypeFeatures), _hashableItems(self._fontVariations), self._fallbackFont
+            cached = self._fontCache.get(key)
+            if cached is None:
+                cached = self._fontCache[key] = self._makeNSFont()
+            font, messages = cached
+            # replay the warnings, as those could be reset in the meantime
+            for message in messages:
+                warnings.warn(message)
             attributes[AppKit.NSFontAttributeName] = font
         elif self._fontSize:
             font = AppKit.NSFont.fontWithName_size_(_FALLBACKFONT, self._fontSize)
             attributes[AppKit.NSFontAttributeName] = font
         if self._fill or self._cmykFill:
             if self._fill:
-                fillColor = self._colorClass.getColor(self._fill).getNSObject()
+                fillColor = self._getNSColor(self._colorClass, self._fill)
             elif self._cmykFill:
-                fillColor = self._cmykColorClass.getColor(self._cmykFill).getNSObject()
+                fillColor = self._getNSColor(self._cmykColorClass, self._cmykFill)
             attributes[AppKit.NSForegroundColorAttributeName] = fillColor
         else:
             # seems like the default foreground color is black
@@ -981,11 +996,85 @@ class FormattedString(object):
             attributes[AppKit.NSForegroundColorAttributeName] = AppKit.NSColor.clearColor()
         if self._stroke or self._cmykStroke:
             if self._stroke:
-                strokeColor = self._colorClass.getColor(self._stroke).getNSObject()
+                strokeColor = self._getNSColor(self._colorClass, self._stroke)
             elif self._cmykStroke:
-                strokeColor = self._cmykColorClass.getColor(self._cmykStroke).getNSObject()
+                strokeColor = self._getNSColor(self._cmykColorClass, self._cmykStroke)
             attributes[AppKit.NSStrokeColorAttributeName] = strokeColor
             attributes[AppKit.NSStrokeWidthAttributeName] = -abs(self._strokeWidth)
+        tabs = None
+        if self._tabs:
+            tabs = tuple(tuple(tab) for tab in self._tabs)
+        key = self._align, tabs, self._lineHeight, self._indent, self._tailIndent, self._firstLineIndent, self._paragraphTopSpacing, self._paragraphBottomSpacing
+        para = self._paragraphStyleCache.get(key)
+        if para is None:
+            para = self._paragraphStyleCache[key] = self._makeParagraphStyle()
+
+        if self._tracking:
+            attributes[AppKit.NSKernAttributeName] = self._tracking
+        if self._baselineShift is not None:
+            attributes[AppKit.NSBaselineOffsetAttributeName] = self._baselineShift
+        if self._underline in self._textUnderlineMap:
+            attributes[AppKit.NSUnderlineStyleAttributeName] = self._textUnderlineMap[self._underline]
+        if self._language:
+            attributes["NSLanguage"] = self._language
+        attributes[AppKit.NSParagraphStyleAttributeName] = para
+        return attributes
+
+    def _makeNSFont(self):
+        # return a font with all features and variations and a list of warning messages
+        messages = []
+        font = AppKit.NSFont.fontWithName_size_(self._font, self._fontSize)
+        if font is None:
+            ff = self._fallbackFont
+            if ff is None:
+                ff = _FALLBACKFONT
+            messages.append("font: '%s' is not installed, back to the fallback font: '%s'" % (self._font, ff))
+            font = AppKit.NSFont.fontWithName_size_(ff, self._fontSize)
+        coreTextfeatures = []
+        if self._openTypeFeatures:
+            existingOpenTypeFeatures = fontRegistry.featureTags(self._font)
+            # sort features by their on/off state
+            # set all disabled features first
+            orderedOpenTypeFeatures = sorted(self._openTypeFeatures.items(), key=lambda (k, v): v)
+            for featureTag, value in orderedOpenTypeFeatures:
+                coreTextFeatureTag = featureTag
+                if not value:
+                    coreTextFeatureTag = "%s_off" % featureTag
+                if coreTextFeatureTag in openType.featureMap:
+                    if value and featureTag not in existingOpenTypeFeatures:
+                        # only warn when the feature is on and not existing for the current font
+                        messages.append("OpenType feature '%s' not available for '%s'" % (featureTag, self._font))
+                    feature = openType.featureMap[coreTextFeatureTag]
+                    coreTextfeatures.append(feature)
+                else:
+                    messages.append("OpenType feature '%s' not available" % (featureTag))
+        coreTextFontVariations = dict()
+        if self._fontVariations:
+            existingAxes = fontRegistry.variationAxes(self._font)
+            for axis, value in self._fontVariations.items():
+                if axis in existingAxes:
+                    existinsAxis = existingAxes[axis]
+                    # clip variation value within the min max value
+                    if value < existinsAxis["minValue"]:
+                        value = existinsAxis["minValue"]
+                    if value > existinsAxis["maxValue"]:
+                        value = existinsAxis["maxValue"]
+                    coreTextFontVariations[variation.convertVariationTagToInt(axis)] = value
+                else:
+                    messages.append("variation axis '%s' not available for '%s'" % (axis, self._font))
+        fontAttributes = {}
+        if coreTextfeatures:
+            fontAttributes[CoreText.NSFontFeatureSettingsAttribute] = coreTextfeatures
+        if coreTextFontVariations:
+            fontAttributes[CoreText.NSFontVariationAttribute] = coreTextFontVariations
+        if self._fallbackFont:
+            fontAttributes[CoreText.NSFontCascadeListAttribute] = [AppKit.NSFontDescriptor.fontDescriptorWithName_size_(self._fallbackFont, self._fontSize)]
+        fontDescriptor = font.fontDescriptor()
+        fontDescriptor = fontDescriptor.fontDescriptorByAddingAttributes_(fontAttributes)
+        font = AppKit.NSFont.fontWithDescriptor_size_(fontDescriptor, self._fontSize)
+        return font, messages
+
+    def _makeParagraphStyle(self):
         para = AppKit.NSMutableParagraphStyle.alloc().init()
         if self._align:
             para.setAlignment_(self._textAlignMap[self._align])
@@ -1019,18 +1108,26 @@ class FormattedString(object):
             para.setParagraphSpacingBefore_(self._paragraphTopSpacing)
         if self._paragraphBottomSpacing is not None:
             para.setParagraphSpacing_(self._paragraphBottomSpacing)
+        # paragraph styles are shared between runs, return an immutable copy
+        return para.copy()
 
-        if self._tracking:
-            attributes[AppKit.NSKernAttributeName] = self._tracking
-        if self._baselineShift is not None:
-            attributes[AppKit.NSBaselineOffsetAttributeName] = self._baselineShift
-        if self._underline in self._textUnderlineMap:
-            attributes[AppKit.NSUnderlineStyleAttributeName] = self._textUnderlineMap[self._underline]
-        if self._language:
-            attributes["NSLanguage"] = self._language
-        attributes[AppKit.NSParagraphStyleAttributeName] = para
-        txt = AppKit.NSAttributedString.alloc().initWithString_attributes_(txt, attributes)
-        self._attributedString.appendAttributedString_(txt)
+    def _getNSColor(self, colorClass, color):
+        try:
+            key = colorClass, colorClass.colorSpace, tuple(color)
+            hash(key)
+        except TypeError:
+            return colorClass.getColor(color).getNSObject()
+        nsColor = self._colorCache.get(key)
+        if nsColor is None:
+            nsColor = self._colorCache[key] = colorClass.getColor(color).getNSObject()
+        return nsColor
+
+    @classmethod
+    def _clearCaches(cls):
+        # fonts and paragraph styles could change when fonts are installed or uninstalled
+        cls._fontCache.clear()
+        cls._paragraphStyleCache.clear()
+        cls._colorCache.clear()
 
     def __add__(self, txt):
         new = self.copy()
@@ -1248,7 +1345,7 @@ class FormattedString(object):
             fontName = _tryInstallFontFromFontName(fontName)
         else:
             fontName = self._font
-        return openType.getFeatureTagsForFontName(fontName)
+        return fontRegistry.featureTags(fontName)
 
     def fontVariations(self, *args, **axes):
         """
@@ -1269,7 +1366,7 @@ class FormattedString(object):
             fontName = _tryInstallFontFromFontName(fontName)
         else:
             fontName = self._font
-        return variation.getVariationAxesForFontName(fontName)
+        return fontRegistry.variationAxes(fontName)
 
     def tabs(self, *tabs):
         """
@@ -1533,6 +1630,72 @@ class FormattedString(object):
         self._fallbackFont = fallbackFont
 
 
+class TextLayout(object):
+
+    """
+    The lines, runs, origins and visible range of an attributed string laid out in a path.
+    The frame starts at `location` in the attributed string.
+    """
+
+    def __init__(self, attributedString, path, origin, sourceString=None, hyphenation=False, location=0):
+        self.attributedString = attributedString
+        self.path = path
+        self.origin = origin
+        self.location = location
+        # the text before hyphenation
+        if sourceString is None:
+            sourceString = attributedString.string()
+        self.sourceString = sourceString
+        self.hyphenation = hyphenation
+        setter = CoreText.CTFramesetterCreateWithAttributedString(attributedString)
+        self.frame = CoreText.CTFramesetterCreateFrame(setter, (location, 0), path, None)
+        self.lines = CoreText.CTFrameGetLines(self.frame)
+        self.origins = CoreText.CTFrameGetLineOrigins(self.frame, (0, len(self.lines)), None)
+        self.runs = [CoreText.CTLineGetGlyphRuns(ctLine) for ctLine in self.lines]
+        self.visibleRange = CoreText.CTFrameGetVisibleStringRange(self.frame)
+        self._data = None
+
+    def _get_data(self):
+        if self._data is None:
+            self._data = frameToData(self.attributedString, self.lines, self.origins, self.origin, self.visibleRange)
+        return self._data
+
+    data = property(_get_data, doc="The layout as plain python data, see `tools.textLayoutData`. Shared by all users of the layout, do not change it.")
+
+
+class TextFlow(object):
+
+    """
+    An attributed string flowing through consecutive frames, all laid out with a single framesetter.
+    Each frame starts where the visible range of the previous frame ended.
+    """
+
+    def __init__(self, attributedString):
+        self.attributedString = attributedString
+        self.location = 0
+        self._setter = CoreText.CTFramesetterCreateWithAttributedString(attributedString)
+
+    def isDone(self):
+        """
+        Return a bool indicating all text is laid out.
+        """
+        return self.location >= self.attributedString.length()
+
+    def layoutFrame(self, path):
+        """
+        Lay out the next frame in a path and return its visible string range as a `(location, length)` tuple.
+        """
+        frame = CoreText.CTFramesetterCreateFrame(self._setter, (self.location, 0), path, None)
+        visibleRange = CoreText.CTFrameGetVisibleStringRange(frame)
+        self.location = visibleRange.location + visibleRange.length
+        return visibleRange.location, visibleRange.length
+
+
+def _textLayoutKeyForBezierPath(bezierPath):
+    points, segmentStarts, contours = bezierPath._getPathData()
+    return tuple(points), tuple(segmentStarts), tuple(contour.open for contour in contours)
+
+
 class GraphicsState(object):
 
     _textClass = FormattedString
@@ -1612,6 +1775,12 @@ class BaseContext(object):
 
     fileExtensions = []
 
+    # shared by all contexts, so a text laid out while drawing is reused while exporting
+    textLayoutCache = LRUCache(maxSize=64)
+
+    # font files registered by installFont in this process, shared by all contexts, with the modification time
+    _installedFonts = dict()
+
     _lineJoinStylesMap = dict(
         miter=Quartz.kCGLineJoinMiter,
         round=Quartz.kCGLineJoinRound,
@@ -1698,7 +1867,7 @@ class BaseContext(object):
     def _transform(self, matrix):
         pass
 
-    def _textBox(self, txt, box, align):
+    def _textBox(self, txt, box, align, location=0):
         pass
 
     def _image(self, path, (x, y), alpha, pageNumber):
@@ -1710,6 +1879,9 @@ class BaseContext(object):
     def _reset(self, other=None):
         pass
 
+    def _prepareSaveImage(self, path, multipage):
+        pass
+
     def _saveImage(self, path, multipage):
         pass
 
@@ -1744,6 +1916,9 @@ class BaseContext(object):
         self.hasPage = True
         self._newPage(width, height)
 
+    def prepareSaveImage(self, path, multipage):
+        self._prepareSaveImage(path, multipage)
+
     def saveImage(self, path, multipage):
         if not self.hasPage:
             raise DrawBotError("can't save image when no page is set")
@@ -1994,17 +2169,17 @@ class BaseContext(object):
                     mutString.insertString_atIndex_(unichr(self._softHypen), hyphenIndex)
 
         # get the lines
-        lines = self._getTypesetterLinesWithPath(attrString, path)
-        # get all lines justified
-        justifiedLines = self._getTypesetterLinesWithPath(self._justifyAttributedString(attrString), path)
+        lines = IncrementalTypesetter(attrString, path)
+        # get all lines justified, the justified string gets the same edits
+        justifiedAttrString = self._justifyAttributedString(attrString)
+        justifiedMutString = justifiedAttrString.mutableString()
+        justifiedLines = IncrementalTypesetter(justifiedAttrString, path)
 
         # loop over all lines
         i = 0
-        while i < len(lines):
-            # get the current line
-            line = lines[i]
+        while lines.hasLine(i):
             # get the range in the text for the current line
-            rng = CoreText.CTLineGetStringRange(line)
+            rng = lines.lineRange(i)
             # get the substring from the range
             subString = attrString.attributedSubstringFromRange_(rng)
             # get the string
@@ -2013,7 +2188,7 @@ class BaseContext(object):
             if len(subStringText) and subStringText[-1] == unichr(self._softHypen):
                 # here we go
                 # get the justified line and get the max line width
-                maxLineWidth, a, d, l = CoreText.CTLineGetTypographicBounds(justifiedLines[i], None, None, None)
+                maxLineWidth = justifiedLines.lineWidth(i)
                 # get the last attributes
                 hyphenAttr, _ = subString.attributesAtIndex_effectiveRange_(0, None)
                 # create a hyphen string
@@ -2046,13 +2221,14 @@ class BaseContext(object):
                 if breakFound and len(breakString.string()) > 2 and breakString.string()[-1] == unichr(self._softHypen):
                     # if the break line ends with a soft hyphen
                     # add a hyphen
-                    attrString.replaceCharactersInRange_withString_((rng.location + lineBreak, 0), "-")
+                    attrString.replaceCharactersInRange_withString_((rng[0] + lineBreak, 0), "-")
+                    justifiedAttrString.replaceCharactersInRange_withString_((rng[0] + lineBreak, 0), "-")
                 # remove all soft hyphens for the range of that line
                 mutString.replaceOccurrencesOfString_withString_options_range_(unichr(self._softHypen), "", AppKit.NSLiteralSearch, rng)
-                # reset the lines, from the adjusted attribute string
-                lines = self._getTypesetterLinesWithPath(attrString, path)
-                # reset the justifed lines form the adjusted attributed string
-                justifiedLines = self._getTypesetterLinesWithPath(self._justifyAttributedString(attrString), path)
+                justifiedMutString.replaceOccurrencesOfString_withString_options_range_(unichr(self._softHypen), "", AppKit.NSLiteralSearch, rng)
+                # typeset the lines again, from the adjusted line onward
+                lines.edited(i)
+                justifiedLines.edited(i)
             # next line
             i += 1
         # remove all soft hyphen
@@ -2061,17 +2237,11 @@ class BaseContext(object):
         return attrString
 
     def clippedText(self, txt, box, align):
-        path, origin = self._getPathForFrameSetter(box)
-        attrString = self.attributedString(txt, align=align)
-        if self._state.hyphenation:
-            hyphenIndexes = [i for i, c in enumerate(attrString.string()) if c == "-"]
-            attrString = self.hyphenateAttributedString(attrString, path)
-        setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
-        box = CoreText.CTFramesetterCreateFrame(setter, (0, 0), path, None)
-        visibleRange = CoreText.CTFrameGetVisibleStringRange(box)
-        clip = visibleRange.length
-        if self._state.hyphenation:
-            subString = attrString.string()[:clip]
+        layout = self._getTextLayout(txt, box, align)
+        clip = layout.visibleRange.length
+        if layout.hyphenation:
+            hyphenIndexes = [i for i, c in enumerate(layout.sourceString) if c == "-"]
+            subString = layout.attributedString.string()[:clip]
             for i in hyphenIndexes:
                 if i < clip:
                     clip += 1
@@ -2080,6 +2250,31 @@ class BaseContext(object):
             clip -= subString.count("-")
         return txt[clip:]
 
+    def textFlow(self, txt, align):
+        return TextFlow(self.attributedString(txt, align=align).copy())
+
+    def _getTextLayout(self, txt, box, align, hyphenation=None, location=0):
+        # return a, possibly cached, text layout for a text in a box or bezierPath, starting at `location` in the text
+        # the key holds an immutable copy of the attributed string, which compares by content and attributes
+        if hyphenation is None:
+            hyphenation = self._state.hyphenation
+        hyphenation = bool(hyphenation)
+        attrString = self.attributedString(txt, align=align)
+        if isinstance(box, self._bezierPathClass):
+            boxKey = box._cachedValue("textLayoutKey", _textLayoutKeyForBezierPath)
+        else:
+            boxKey = tuple(box)
+        key = attrString.copy(), boxKey, hyphenation, location
+        layout = self.textLayoutCache.get(key)
+        if layout is None:
+            path, origin = self._getPathForFrameSetter(box)
+            sourceString = attrString.string()
+            if hyphenation:
+                attrString = self.hyphenateAttributedString(attrString, path)
+            layout = TextLayout(attrString, path, origin, sourceString, hyphenation, location)
+            self.textLayoutCache.set(key, layout)
+        return layout
+
     def _justifyAttributedString(self, attr):
         # create a justified copy of the attributed string
         attr = attr.mutableCopy()
@@ -2127,21 +2322,74 @@ class BaseContext(object):
             (w, h), _ = CoreText.CTFramesetterSuggestFrameSizeWithConstraints(setter, (0, 0), None, (width, height), None)
         return w, h
 
-    def textBox(self, txt, box, align="left"):
+    def textSizes(self, texts, align, width, height):
+        # build the text attributes once and measure each text with those
+        formattedString = self._state.text
+        formattedString.clear()
+        formattedString.append(u"", align=align)
+        attributes = formattedString._textAttributes()
+        if width is not None:
+            if height is None:
+                height = CoreText.CGFLOAT_MAX
+            path = None
+            if self._state.hyphenation:
+                path = CoreText.CGPathCreateMutable()
+                CoreText.CGPathAddRect(path, None, CoreText.CGRectMake(0, 0, width, height))
+        sizes = []
+        for txt in texts:
+            if isinstance(txt, FormattedString):
+                attrString = txt.getNSObject()
+            else:
+                attrString = AppKit.NSAttributedString.alloc().initWithString_attributes_(txt, attributes)
+            if width is None:
+                w, h = attrString.size()
+            else:
+                if path is not None:
+                    attrString = self.hyphenateAttributedString(attrString, path)
+                setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
+                (w, h), _ = CoreText.CTFramesetterSuggestFrameSizeWithConstraints(setter, (0, 0), None, (width, height), None)
+            sizes.append((w, h))
+        return sizes
+
+    def textBox(self, txt, box, align="left", location=0):
         self._state.path = None
-        self._textBox(txt, box, align)
+        self._textBox(txt, box, align, location)
 
     def image(self, path, (x, y), alpha, pageNumber):
         self._image(path, (x, y), alpha, pageNumber)
 
+    def _fontsChanged(self, path):
+        # a font with the same name could draw different glyphs
+        self.textLayoutCache.clear()
+        FormattedString._clearCaches()
+        BezierPath._glyphOutlineCache.clear()
+        clearFontCache()
+        fontRegistry.invalidateFontPath(path)
+
     def installFont(self, path):
+        # installFont is replayed by each context, a font file registered before in this process
+        # and not changed since does not change any font, keep all caches
+        key = os.path.abspath(path)
+        try:
+            modificationTime = os.path.getmtime(key)
+        except OSError:
+            modificationTime = None
+        if key in self._installedFonts:
+            if self._installedFonts[key] == modificationTime:
+                return True, None
+            self.uninstallFont(path)
+        self._fontsChanged(path)
         url = AppKit.NSURL.fileURLWithPath_(path)
         success, error = CoreText.CTFontManagerRegisterFontsForURL(url, CoreText.kCTFontManagerScopeProcess, None)
-        if not success:
+        if success:
+            self._installedFonts[key] = modificationTime
+        else:
             error = error.localizedDescription()
         return success, error
 
     def uninstallFont(self, path):
+        self._installedFonts.pop(os.path.abspath(path), None)
+        self._fontsChanged(path)
         url = AppKit.NSURL.fileURLWithPath_(path)
         success, error = CoreText.CTFontManagerUnregisterFontsForURL(url, CoreText.kCTFontManagerScopeProcess, None)
         if not success:
@@ -2149,19 +2397,13 @@ class BaseContext(object):
         return success, error
 
     def _fontNameForPath(self, path):
-        from fontTools.ttLib import TTFont, TTLibError
+        from fontTools.ttLib import TTLibError
         try:
-            font = TTFont(path, fontNumber=0)  # in case of .ttc, use the first font
-            psName = font["name"].getName(6, 1, 0)
-            if psName is None:
-                psName = font["name"].getName(6, 3, 1)
-            font.close()
+            psName = fontCatalog.fontNameForPath(path, fontNumber=0)  # in case of .ttc, use the first font
         except IOError:
             raise DrawBotError("Font '%s' does not exist." % path)
         except TTLibError:
             raise DrawBotError("Font '%s' is not a valid font." % path)
-        if psName is not None:
-            psName = psName.toUnicode()
         return psName
 
     def linkDestination(self, name, (x, y)):
@@ -1,9 +1,5 @@
 import objc
-import AppKit
-import Quartz
 
-import sys
-import os
 import tempfile
 
 from imageContext import ImageContext
@@ -14,7 +10,7 @@ from tools.gifTools import generateGif
 class GifContext(ImageContext):
 
     _saveImageFileTypes = {
-        "gif": AppKit.NSGIFFileType,
+        "gif": "com.compuserve.gif",
     }
 
     fileExtensions = _saveImageFileTypes.keys()
@@ -33,16 +29,19 @@ class GifContext(ImageContext):
         objc.super(GifContext, self)._newPage(width, height)
         self._delayData.append(self._delay)
 
-    def _writeDataToFile(self, data, path, multipage):
-        pdfDocument = Quartz.PDFDocument.alloc().initWithData_(data)
-        pageCount = pdfDocument.pageCount()
-        shouldBeAnimated = pageCount > 1
+    def _prepareSaveImage(self, path, multipage):
+        # all frames are needed for an animated gif
+        pass
+
+    def _saveImage(self, path, multipage):
+        images = self.pageImages()
+        shouldBeAnimated = len(images) > 1
 
         tempPath = path
         if shouldBeAnimated:
             tempPath = tempfile.mkstemp(suffix=".gif")[1]
 
-        inputPaths = objc.super(GifContext, self)._writeDataToFile(data, tempPath, shouldBeAnimated)
+        inputPaths = self._writeImagesToFile(images, tempPath, shouldBeAnimated)
 
         if shouldBeAnimated:
             generateGif(inputPaths, path, self._delayData)
@@ -1,15 +1,14 @@
 import objc
 import AppKit
 import QTKit
-import Quartz
 
 import os
 
 from drawBot.misc import DrawBotError
-from pdfContext import PDFContext
+from rasterContext import RasterContext
 
 
-class MOVContext(PDFContext):
+class MOVContext(RasterContext):
 
     fileExtensions = ["mov"]
 
@@ -32,25 +31,26 @@ class MOVContext(PDFContext):
         self.rect(0, 0, self.width, self.height)
         self.restore()
 
+    def _prepareSaveImage(self, path, multipage):
+        # all frames are needed for a movie
+        pass
+
     def _frameDuration(self, seconds):
         length = seconds * self._frameScale
         self._frameDurationData[-1] = length, self._frameScale
 
-    def _writeDataToFile(self, data, path, multipage):
+    def _saveImage(self, path, multipage):
         if os.path.exists(path):
             os.remove(path)
         movie, error = QTKit.QTMovie.alloc().initToWritableFile_error_(path, None)
         if error:
             raise DrawBotError("Could not create a quick time movie, %s" % error.localizedDescription())
 
-        pdfDocument = Quartz.PDFDocument.alloc().initWithData_(data)
-
-        for index in range(pdfDocument.pageCount()):
+        for index, cgImage in enumerate(self.pageImages()):
             pool = AppKit.NSAutoreleasePool.alloc().init()
             frameLength, frameScale = self._frameDurationData[index]
             duration = QTKit.QTMakeTime(frameLength, frameScale)
-            page = pdfDocument.pageAtIndex_(index)
-            image = AppKit.NSImage.alloc().initWithData_(page.dataRepresentation())
+            image = AppKit.NSImage.alloc().initWithCGImage_size_(cgImage, AppKit.NSZeroSize)
             movie.addImage_forDuration_withAttributes_(image, duration, self._saveMovieAttributes)
             del pool
         movie.updateMovieFile()
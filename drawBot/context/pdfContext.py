@@ -7,10 +7,10 @@ import Quartz
 
 import math
 
-from tools import gifTools
+from tools.imageSource import getImageSource
+from tools.textLayoutData import colorFromData, fontFromData
 
 from baseContext import BaseContext, FormattedString
-from drawBot.misc import DrawBotError, isPDF, isGIF
 
 
 osVersionCurrent = StrictVersion(platform.mac_ver()[0])
@@ -32,7 +32,6 @@ class PDFContext(BaseContext):
     def __init__(self):
         objc.super(PDFContext, self).__init__()
         self._hasContext = False
-        self._cachedImages = {}
 
     def _newPage(self, width, height):
         self.size(width, height)
@@ -138,31 +137,23 @@ class PDFContext(BaseContext):
             self._pdfPath(self._state.path)
             Quartz.CGContextClip(self._pdfContext)
 
-    def _textBox(self, txt, box, align):
-        path, (x, y) = self._getPathForFrameSetter(box)
-
+    def _textBox(self, txt, box, align, location=0):
         canDoGradients = True
-        attrString = self.attributedString(txt, align=align)
-        if self._state.hyphenation:
-            attrString = self.hyphenateAttributedString(attrString, path)
-
-        setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
-        frame = CoreText.CTFramesetterCreateFrame(setter, (0, 0), path, None)
-
-        ctLines = CoreText.CTFrameGetLines(frame)
-        origins = CoreText.CTFrameGetLineOrigins(frame, (0, len(ctLines)), None)
-        for i, (originX, originY) in enumerate(origins):
-            ctLine = ctLines[i]
-            bounds = CoreText.CTLineGetImageBounds(ctLine, self._pdfContext)
-            if bounds.size.width == 0:
+        layout = self._getTextLayout(txt, box, align, location=location).data
+        x, y = layout["origin"]
+
+        for line in layout["lines"]:
+            originX, originY = line["origin"]
+            bx, by, bw, bh = line["imageBounds"]
+            if bw == 0:
                 continue
-            ctRuns = CoreText.CTLineGetGlyphRuns(ctLine)
-            for ctRun in ctRuns:
-                attributes = CoreText.CTRunGetAttributes(ctRun)
-                fillColor = attributes.get(AppKit.NSForegroundColorAttributeName)
-                strokeColor = attributes.get(AppKit.NSStrokeColorAttributeName)
-                strokeWidth = attributes.get(AppKit.NSStrokeWidthAttributeName, self._state.strokeWidth)
-                baselineShift = attributes.get(AppKit.NSBaselineOffsetAttributeName, 0)
+            for run in line["runs"]:
+                fillColor = colorFromData(run["fill"])
+                strokeColor = colorFromData(run["stroke"])
+                strokeWidth = run["strokeWidth"]
+                if strokeWidth is None:
+                    strokeWidth = self._state.strokeWidth
+                baselineShift = run["baselineShift"]
                 self._save()
                 drawingMode = None
                 if self._state.shadow is not None:
@@ -175,14 +166,12 @@ class PDFContext(BaseContext):
                         self._state.fillColor = None
                         self._state.cmykColor = None
                         Quartz.CGContextSetTextDrawingMode(self._pdfContext, Quartz.kCGTextFill)
-                        Quartz.CGContextSetTextPosition(self._pdfContext, x+originX, y+originY+baselineShift)
-                        CoreText.CTRunDraw(ctRun, self._pdfContext, (0, 0))
+                        self._pdfGlyphRun(run, x+originX, y+originY+baselineShift)
                         self._restore()
                 if canDoGradients and self._state.gradient is not None:
                     self._save()
                     Quartz.CGContextSetTextDrawingMode(self._pdfContext, Quartz.kCGTextClip)
-                    Quartz.CGContextSetTextPosition(self._pdfContext, x+originX, y+originY+baselineShift)
-                    CoreText.CTRunDraw(ctRun, self._pdfContext, (0, 0))
+                    self._pdfGlyphRun(run, x+originX, y+originY+baselineShift)
                     self._pdfGradient(self._state.gradient)
                     self._restore()
                     drawingMode = None
@@ -208,61 +197,23 @@ class PDFContext(BaseContext):
                         # simple solution: draw it twice...
                         drawingMode = Quartz.kCGTextFill
                         Quartz.CGContextSetTextDrawingMode(self._pdfContext, drawingMode)
-                        Quartz.CGContextSetTextPosition(self._pdfContext, x+originX, y+originY+baselineShift)
-                        CoreText.CTRunDraw(ctRun, self._pdfContext, (0, 0))
+                        self._pdfGlyphRun(run, x+originX, y+originY+baselineShift)
                         drawingMode = Quartz.kCGTextStroke
 
                 if drawingMode is not None:
                     Quartz.CGContextSetTextDrawingMode(self._pdfContext, drawingMode)
-                    Quartz.CGContextSetTextPosition(self._pdfContext, x+originX, y+originY+baselineShift)
-                    CoreText.CTRunDraw(ctRun, self._pdfContext, (0, 0))
+                    self._pdfGlyphRun(run, x+originX, y+originY+baselineShift)
                 self._restore()
 
+    def _pdfGlyphRun(self, run, x, y):
+        font = fontFromData(run["font"])
+        glyphs = run["glyphs"]
+        positions = [(x + px, y + py) for px, py in run["positions"]]
+        Quartz.CGContextSetTextMatrix(self._pdfContext, Quartz.CGAffineTransformIdentity)
+        CoreText.CTFontDrawGlyphs(font, glyphs, positions, len(glyphs), self._pdfContext)
+
     def _getImageSource(self, key, pageNumber):
-        path = key
-        image = None
-        _isPDF = False
-        if isinstance(key, AppKit.NSImage):
-            image = key
-            key = id(key)
-        if pageNumber is not None:
-            key = "%s-%s" % (key, pageNumber)
-        if key not in self._cachedImages:
-            if image is None:
-                if path.startswith("http"):
-                    url = AppKit.NSURL.URLWithString_(path)
-                else:
-                    url = AppKit.NSURL.fileURLWithPath_(path)
-                _isPDF, _ = isPDF(url)
-                _isGIF, _ = isGIF(url)
-                if _isPDF:
-                    pdf = Quartz.CGPDFDocumentCreateWithURL(url)
-                    if pdf is not None:
-                        if pageNumber is None:
-                            pageNumber = Quartz.CGPDFDocumentGetNumberOfPages(pdf)
-                        self._cachedImages[key] = _isPDF, Quartz.CGPDFDocumentGetPage(pdf, pageNumber)
-                    else:
-                        raise DrawBotError("No pdf found at %s" % key)
-                elif _isGIF:
-                    if pageNumber is None:
-                        pageNumber = gifTools.gifFrameCount(url)
-                    image = gifTools.gifFrameAtIndex(url, pageNumber-1)
-                    data = image.TIFFRepresentation()
-                    source = Quartz.CGImageSourceCreateWithData(data, {})
-                    if source is not None:
-                        self._cachedImages[key] = False, Quartz.CGImageSourceCreateImageAtIndex(source, 0, None)
-                    else:
-                        raise DrawBotError("No image found at frame %s in %s" % (pageNumber, key))
-                else:
-                    image = AppKit.NSImage.alloc().initByReferencingURL_(url)
-            if image and not _isPDF:
-                data = image.TIFFRepresentation()
-                source = Quartz.CGImageSourceCreateWithData(data, {})
-                if source is not None:
-                    self._cachedImages[key] = _isPDF, Quartz.CGImageSourceCreateImageAtIndex(source, 0, None)
-                else:
-                    raise DrawBotError("No image found at %s" % key)
-        return self._cachedImages[key]
+        return getImageSource(key, pageNumber)
 
     def _image(self, path, (x, y), alpha, pageNumber):
         self._save()
@@ -26,8 +26,8 @@ class PrintContext(BaseContext):
     def _transform(self, matrix):
         print "transform", matrix
 
-    def _textBox(self, txt, (x, y, w, h), align):
-        print "textBox", txt, (x, y, w, h), align
+    def _textBox(self, txt, (x, y, w, h), align, location=0):
+        print "textBox", txt, (x, y, w, h), align, location
 
     def _image(self, path, (x, y), alpha, pageNumber):
         print "image", path, x, y, alpha, pageNumber
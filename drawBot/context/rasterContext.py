@@ -0,0 +1,155 @@
+import objc
+import AppKit
+import Quartz
+
+import os
+import math
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from pdfContext import PDFContext
+from drawBot.misc import DrawBotError
+
+
+class RasterContext(PDFContext):
+
+    """
+    A context drawing each page directly into a bitmap.
+
+    Optionally a `pixelSize` as a tuple `(width, height)` can be provided, each page will be scaled to fit those pixel dimensions,
+    keeping the proportions of the page and centered in the bitmap.
+    Otherwise the pixel dimensions are the page size multiplied by `scale`, alternatively a `dpi` can be set (72 dpi is a scale of 1).
+
+    Optionally `antialias` can be turned off.
+    """
+
+    # not a default context for any file extension
+    fileExtensions = []
+
+    _saveImageFileTypes = {
+        "jpg": "public.jpeg",
+        "jpeg": "public.jpeg",
+        "tiff": "public.tiff",
+        "tif": "public.tiff",
+        "png": "public.png",
+        "bmp": "com.microsoft.bmp",
+        "gif": "com.compuserve.gif",
+    }
+
+    # the amount of threads used to encode the pages of a multipage export
+    # `None` will use the amount of available cpu's
+    rasterWorkers = None
+
+    def __init__(self, pixelSize=None, scale=1, dpi=None, antialias=True):
+        objc.super(RasterContext, self).__init__()
+        if dpi is not None:
+            scale = dpi / 72.
+        self._pixelSize = pixelSize
+        self._scale = scale
+        self._antialias = antialias
+        self._pageImages = []
+        self._onlyLastPage = False
+
+    def _newPage(self, width, height):
+        if self._hasContext:
+            self._closeContext()
+            self.reset()
+        self.size(width, height)
+        if self._pixelSize is not None:
+            pixelWidth, pixelHeight = self._pixelSize
+            scale = min(pixelWidth / float(self.width), pixelHeight / float(self.height))
+            offsetX = (pixelWidth - self.width * scale) * .5
+            offsetY = (pixelHeight - self.height * scale) * .5
+        else:
+            pixelWidth = int(round(self.width * self._scale))
+            pixelHeight = int(round(self.height * self._scale))
+            scale = self._scale
+            offsetX = offsetY = 0
+        colorSpace = self._colorClass.colorSpace().CGColorSpace()
+        self._pdfContext = Quartz.CGBitmapContextCreate(None, pixelWidth, pixelHeight, 8, 0, colorSpace, Quartz.kCGImageAlphaPremultipliedLast)
+        if self._pdfContext is None:
+            raise DrawBotError("Could not create a bitmap of %s by %s pixels" % (pixelWidth, pixelHeight))
+        Quartz.CGContextSetAllowsAntialiasing(self._pdfContext, self._antialias)
+        Quartz.CGContextSetShouldAntialias(self._pdfContext, self._antialias)
+        Quartz.CGContextTranslateCTM(self._pdfContext, offsetX, offsetY)
+        Quartz.CGContextScaleCTM(self._pdfContext, scale, scale)
+        self._hasContext = True
+
+    def _closeContext(self):
+        if self._onlyLastPage:
+            # a single page export only needs the last page
+            del self._pageImages[:]
+        self._pageImages.append(Quartz.CGBitmapContextCreateImage(self._pdfContext))
+        self._pdfContext = None
+        self._hasContext = False
+
+    def pageImages(self):
+        """
+        Return a list of CGImage objects, one for each page.
+        """
+        if self._hasContext:
+            self._closeContext()
+        return list(self._pageImages)
+
+    def _prepareSaveImage(self, path, multipage):
+        self._onlyLastPage = not multipage
+
+    def _saveImage(self, path, multipage):
+        self._writeImagesToFile(self.pageImages(), path, multipage)
+
+    def _writeImagesToFile(self, images, path, multipage):
+        # write the last or all images, return the written paths
+        if multipage is None:
+            multipage = False
+        fileName, fileExt = os.path.splitext(path)
+        ext = fileExt[1:].lower()
+        if ext not in self._saveImageFileTypes:
+            raise DrawBotError("Could not save a bitmap as: '%s'" % ext)
+        firstPage = 0
+        if not multipage:
+            firstPage = len(images) - 1
+        outputPaths = []
+        for index in range(firstPage, len(images)):
+            pathAdd = ""
+            if multipage:
+                pathAdd = "_%s" % (index + 1)
+            outputPaths.append((images[index], fileName + pathAdd + fileExt))
+
+        workers = self.rasterWorkers
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        workers = max(1, min(workers, len(outputPaths)))
+        if workers == 1:
+            self._writeImages(outputPaths, ext)
+        else:
+            # split the pages in a range for each worker
+            chunkSize = int(math.ceil(len(outputPaths) / float(workers)))
+            chunks = [outputPaths[i:i + chunkSize] for i in range(0, len(outputPaths), chunkSize)]
+            pool = ThreadPool(workers)
+            try:
+                pool.map(lambda chunk: self._writeImages(chunk, ext), chunks)
+            finally:
+                pool.close()
+                pool.join()
+        return [imagePath for image, imagePath in outputPaths]
+
+    def _writeImages(self, outputPaths, ext):
+        for image, imagePath in outputPaths:
+            pool = AppKit.NSAutoreleasePool.alloc().init()
+            url = AppKit.NSURL.fileURLWithPath_(imagePath)
+            destination = Quartz.CGImageDestinationCreateWithURL(url, self._saveImageFileTypes[ext], 1, None)
+            if destination is None:
+                raise DrawBotError("Could not save an image at: '%s'" % imagePath)
+            Quartz.CGImageDestinationAddImage(destination, image, None)
+            Quartz.CGImageDestinationFinalize(destination)
+            del destination
+            del pool
+
+    def _printImage(self, pdf=None):
+        raise DrawBotError("A raster context can not be printed")
+
+    def _linkDestination(self, name, (x, y)):
+        pass
+
+    def _linkRect(self, name, (x, y, w, h)):
+        pass
@@ -1,8 +1,8 @@
 import objc
 import AppKit
-import CoreText
 
 import os
+import gzip
 # import base64
 import random
 import uuid
@@ -11,12 +11,58 @@ from fontTools.misc.xmlWriter import XMLWriter
 
 from fontTools.misc.transform import Transform
 
-from tools.openType import getFeatureTagsForFontAttributes
+from tools.openType import getFeatureTagsForFeatures
+from tools.textLayoutData import colorFromData
 from baseContext import BaseContext, GraphicsState, Shadow, Color, FormattedString, Gradient
 
 from drawBot.misc import warnings, formatNumber
 
 
+def _openSVGFile(path):
+    # a .svgz is a gzipped svg
+    # set the modification time to 0 to get the same result for the same svg data
+    if os.path.splitext(path)[1].lower() == ".svgz":
+        return gzip.GzipFile(path, "wb", mtime=0)
+    return open(path, "wb")
+
+
+# svg path data number formatting
+
+
+def _svgNumber(value):
+    # format a number with max 2 decimals, without trailing zeros and without a leading zero
+    text = ("%.2f" % value).rstrip("0").rstrip(".")
+    if text[0] == "-":
+        if text == "-0":
+            return "0"
+        if text.startswith("-0."):
+            return "-" + text[2:]
+    elif text.startswith("0."):
+        return text[1:]
+    return text
+
+
+def _svgNumbers(*values):
+    return [_svgNumber(value) for value in values]
+
+
+def _svgJoinNumbers(numbers):
+    # a minus sign is a valid separator
+    data = []
+    for number in numbers:
+        if data and number[0] != "-":
+            data.append(",")
+        data.append(number)
+    return "".join(data)
+
+
+def _svgShortest(relative, absolute):
+    # return the shortest (command, numbers), prefer relative
+    if len(_svgJoinNumbers(absolute[1])) < len(_svgJoinNumbers(relative[1])):
+        return absolute
+    return relative
+
+
 # simple file object
 
 
@@ -32,7 +78,7 @@ class SVGFile(object):
 
     def writeToFile(self, path):
         data = self.read()
-        f = open(path, "w")
+        f = _openSVGFile(path)
         f.write(data)
         f.close()
 
@@ -43,6 +89,21 @@ class SVGFile(object):
         pass
 
 
+# streaming file object, writing directly to a file
+
+
+class SVGStreamFile(object):
+
+    def __init__(self, path):
+        self._file = _openSVGFile(path)
+
+    def write(self, value):
+        self._file.write(value)
+
+    def close(self):
+        self._file.close()
+
+
 # subclass some object to add some svg api
 
 
@@ -212,6 +273,7 @@ class SVGContext(BaseContext):
     _gradientClass = SVGGradient
 
     _svgFileClass = SVGFile
+    _svgStreamFileClass = SVGStreamFile
 
     _svgTagArguments = {
         "version": "1.1",
@@ -231,11 +293,18 @@ class SVGContext(BaseContext):
     }
 
     indentation = " "
-    fileExtensions = ["svg"]
+    fileExtensions = ["svg", "svgz"]
+
+    # write each page directly to the destination file while drawing
+    # instead of keeping all pages in memory until the svg is saved
+    # a single page svg only keeps the current page in memory and writes it when saved
+    streaming = False
 
     def __init__(self):
         objc.super(SVGContext, self).__init__()
         self._pages = []
+        self._streamDestination = None
+        self._streamPageCount = 0
 
     # not supported in a svg context
 
@@ -278,13 +347,24 @@ class SVGContext(BaseContext):
     def _reset(self, other=None):
         self._embeddedFonts = set()
 
+    def _prepareSaveImage(self, path, multipage):
+        if self.streaming:
+            self._streamDestination = path, multipage
+
     def _newPage(self, width, height):
         if hasattr(self, "_svgContext"):
             self._svgContext.endtag("svg")
+            self._svgData.close()
         self.reset()
         self.size(width, height)
-        self._svgData = self._svgFileClass()
-        self._pages.append(self._svgData)
+        if self._isStreamingPages():
+            self._svgData = self._svgStreamFileClass(self._streamPagePath())
+        else:
+            if self._streamDestination is not None:
+                # only the last page is saved
+                del self._pages[:]
+            self._svgData = self._svgFileClass()
+            self._pages.append(self._svgData)
         self._svgContext = XMLWriter(self._svgData, encoding="utf-8", indentwhite=self.indentation)
         self._svgContext.width = self.width
         self._svgContext.height = self.height
@@ -292,10 +372,24 @@ class SVGContext(BaseContext):
         self._svgContext.newline()
         self._state.transformMatrix = self._state.transformMatrix.scale(1, -1).translate(0, -self.height)
 
+    def _isStreamingPages(self):
+        # each page of a multipage svg is written to its own file while drawing
+        return self._streamDestination is not None and bool(self._streamDestination[1])
+
+    def _streamPagePath(self):
+        path, multipage = self._streamDestination
+        self._streamPageCount += 1
+        fileName, fileExt = os.path.splitext(path)
+        return "%s_%s%s" % (fileName, self._streamPageCount, fileExt)
+
     def _saveImage(self, path, multipage):
         if multipage is None:
             multipage = False
         self._svgContext.endtag("svg")
+        if self._isStreamingPages():
+            # all pages are already written
+            self._svgData.close()
+            return
         fileName, fileExt = os.path.splitext(path)
         firstPage = 0
         pageCount = len(self._pages)
@@ -343,17 +437,12 @@ class SVGContext(BaseContext):
         self._svgContext.newline()
         self._state.clipPathID = uniqueID
 
-    def _textBox(self, txt, box, align):
-        path, (x, y) = self._getPathForFrameSetter(box)
+    def _textBox(self, txt, box, align, location=0):
         canDoGradients = True
         if align == "justified":
             warnings.warn("justified text is not supported in a svg context")
-        attrString = self.attributedString(txt, align=align)
-        if self._state.hyphenation:
-            attrString = self.hyphenateAttributedString(attrString, path)
-        txt = attrString.string()
-        setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
-        box = CoreText.CTFramesetterCreateFrame(setter, (0, 0), path, None)
+        layout = self._getTextLayout(txt, box, align, location=location).data
+        x, y = layout["origin"]
 
         self._svgBeginClipPath()
         defaultData = self._svgDrawingAttributes()
@@ -367,27 +456,21 @@ class SVGContext(BaseContext):
         self._svgContext.begintag("text", **data)
         self._svgContext.newline()
 
-        ctLines = CoreText.CTFrameGetLines(box)
-        origins = CoreText.CTFrameGetLineOrigins(box, (0, len(ctLines)), None)
-        for i, (originX, originY) in enumerate(origins):
-            ctLine = ctLines[i]
-            # bounds = CoreText.CTLineGetImageBounds(ctLine, self._pdfContext)
-            # if bounds.size.width == 0:
+        for line in layout["lines"]:
+            originX, originY = line["origin"]
+            # bx, by, bw, bh = line["imageBounds"]
+            # if bw == 0:
             #     continue
-            ctRuns = CoreText.CTLineGetGlyphRuns(ctLine)
-            for ctRun in ctRuns:
-                stringRange = CoreText.CTRunGetStringRange(ctRun)
-                attributes = CoreText.CTRunGetAttributes(ctRun)
-                font = attributes.get(AppKit.NSFontAttributeName)
-                fontAttributes = font.fontDescriptor().fontAttributes()
-                fillColor = attributes.get(AppKit.NSForegroundColorAttributeName)
-                strokeColor = attributes.get(AppKit.NSStrokeColorAttributeName)
-                strokeWidth = attributes.get(AppKit.NSStrokeWidthAttributeName, self._state.strokeWidth)
-                baselineShift = attributes.get(AppKit.NSBaselineOffsetAttributeName, 0)
-                openTypeFeatures = fontAttributes.get(CoreText.NSFontFeatureSettingsAttribute)
-
-                fontName = font.fontName()
-                fontSize = font.pointSize()
+            for run in line["runs"]:
+                fillColor = colorFromData(run["fill"])
+                strokeColor = colorFromData(run["stroke"])
+                strokeWidth = run["strokeWidth"]
+                if strokeWidth is None:
+                    strokeWidth = self._state.strokeWidth
+                baselineShift = run["baselineShift"]
+
+                fontName = run["font"]["name"]
+                fontSize = run["font"]["size"]
 
                 spanData = dict(defaultData)
                 fill = self._colorClass(fillColor).svgColor()
@@ -400,8 +483,8 @@ class SVGContext(BaseContext):
                 spanData["font-family"] = fontName
                 spanData["font-size"] = formatNumber(fontSize)
 
-                if openTypeFeatures:
-                    featureTags = getFeatureTagsForFontAttributes(openTypeFeatures)
+                if run["font"]["features"]:
+                    featureTags = getFeatureTagsForFeatures(run["font"]["features"])
                     spanData["style"] = self._svgStyle(**{
                             "font-feature-settings": self._svgStyleOpenTypeFeatures(featureTags)
                         }
@@ -412,17 +495,15 @@ class SVGContext(BaseContext):
 
                 self._save()
 
-                runTxt = txt.substringWithRange_((stringRange.location, stringRange.length))
+                runTxt = run["text"]
                 while runTxt and runTxt[-1] == " ":
                     runTxt = runTxt[:-1]
                 runTxt = runTxt.replace("\n", "")
                 runTxt = runTxt.encode("utf-8")
 
-                runPos = CoreText.CTRunGetPositions(ctRun, (0, 1), None)
                 runX = runY = 0
-                if runPos:
-                    runX = runPos[0].x
-                    runY = runPos[0].y
+                if run["positions"]:
+                    runX, runY = run["positions"][0]
 
                 spanData["x"] = formatNumber(originX + runX)
                 spanData["y"] = formatNumber(self.height - originY - runY + baselineShift)
@@ -476,35 +557,75 @@ class SVGContext(BaseContext):
         return "matrix(%s)" % (",".join([str(s) for s in transform]))
 
     def _svgPath(self, path, transformMatrix=None):
-        path = path.getNSBezierPath()
         if transformMatrix:
             path = path.copy()
-            aT = AppKit.NSAffineTransform.transform()
-            aT.setTransformStruct_(transformMatrix[:])
-            path.transformUsingAffineTransform_(aT)
-        svg = ""
+            path.transform(transformMatrix)
+        # the path data is cached on the bezier path until the path changes
+        return path._cachedValue("svgPathData", self._svgPathData)
+
+    def _svgPathData(self, path):
+        # build the path data with the shortest absolute or relative command for each segment
+        # relative coordinates are computed from the rounded position a svg reader will get
+        # this avoids accumulating rounding errors
+        path = path.getNSBezierPath()
+        data = []
+        previousCommand = None
+        x = y = startX = startY = 0
         for i in range(path.elementCount()):
             instruction, points = path.elementAtIndex_associatedPoints_(i)
             if instruction == AppKit.NSMoveToBezierPathElement:
-                svg += "M%s,%s " % (formatNumber(points[0].x), formatNumber(points[0].y))
-                previousPoint = points[-1]
+                pt = points[0]
+                command, numbers = _svgShortest(("m", _svgNumbers(pt.x - x, pt.y - y)), ("M", _svgNumbers(pt.x, pt.y)))
             elif instruction == AppKit.NSLineToBezierPathElement:
-                x = points[0].x - previousPoint.x
-                y = points[0].y - previousPoint.y
-                svg += "l%s,%s " % (formatNumber(x), formatNumber(y))
-                previousPoint = points[-1]
+                pt = points[0]
+                dx = _svgNumber(pt.x - x)
+                dy = _svgNumber(pt.y - y)
+                if dy == "0":
+                    command, numbers = _svgShortest(("h", [dx]), ("H", [_svgNumber(pt.x)]))
+                elif dx == "0":
+                    command, numbers = _svgShortest(("v", [dy]), ("V", [_svgNumber(pt.y)]))
+                else:
+                    command, numbers = _svgShortest(("l", [dx, dy]), ("L", _svgNumbers(pt.x, pt.y)))
             elif instruction == AppKit.NSCurveToBezierPathElement:
-                offx1 = points[0].x - previousPoint.x
-                offy1 = points[0].y - previousPoint.y
-                offx2 = points[1].x - previousPoint.x
-                offy2 = points[1].y - previousPoint.y
-                x = points[2].x - previousPoint.x
-                y = points[2].y - previousPoint.y
-                svg += "c%s,%s,%s,%s,%s,%s " % (formatNumber(offx1), formatNumber(offy1), formatNumber(offx2), formatNumber(offy2), formatNumber(x), formatNumber(y))
-                previousPoint = points[-1]
+                pt1, pt2, pt3 = points
+                relative = _svgNumbers(pt1.x - x, pt1.y - y, pt2.x - x, pt2.y - y, pt3.x - x, pt3.y - y)
+                absolute = _svgNumbers(pt1.x, pt1.y, pt2.x, pt2.y, pt3.x, pt3.y)
+                command, numbers = _svgShortest(("c", relative), ("C", absolute))
             elif instruction == AppKit.NSClosePathBezierPathElement:
-                svg += "Z "
-        return svg
+                command, numbers = "Z", []
+            else:
+                continue
+            text = _svgJoinNumbers(numbers)
+            # a repeated command can be omitted, except a move which would become a line
+            if command == previousCommand and command not in "MmZ":
+                if text[0] != "-":
+                    data.append(" ")
+            else:
+                if data:
+                    data.append(" ")
+                data.append(command)
+            data.append(text)
+            previousCommand = command
+            # update the current position
+            if command == "Z":
+                x, y = startX, startY
+            elif command in "MLC":
+                x = float(numbers[-2])
+                y = float(numbers[-1])
+            elif command in "mlc":
+                x += float(numbers[-2])
+                y += float(numbers[-1])
+            elif command == "H":
+                x = float(numbers[0])
+            elif command == "h":
+                x += float(numbers[0])
+            elif command == "V":
+                y = float(numbers[0])
+            elif command == "v":
+                y += float(numbers[0])
+            if command in "Mm":
+                startX, startY = x, y
+        return "".join(data)
 
     def _svgBeginClipPath(self):
         if self._state.clipPathID:
@@ -0,0 +1,933 @@
+"""
+A bezier path storing its segment types and coordinates in numpy arrays.
+
+`ArrayBezierPath` has the same api as `BezierPath` (pen and point pen protocol,
+transformations, bounds, contours, boolean operations), but all geometry is computed
+with numpy on the arrays, without AppKit. Text is laid out and drawn with fontTools
+by `headlessText`. Image tracing requires AppKit and is only available on `BezierPath`.
+
+`transformPaths`, `boundsForPaths` and `controlPointBoundsForPaths` work on many paths
+at once, with a single pass over the combined point data. Those also accept `BezierPath` objects,
+the points of those are read once from the cached path data and kept in sync when transformed.
+
+The module only depends on numpy and fontTools: it can be used headless by adding this
+folder to `sys.path` and importing `arrayBezierPath` directly.
+"""
+
+import math
+
+import numpy
+
+from fontTools.pens.basePen import BasePen
+
+from bezierContour import BezierContour, contourSlices, copyContour
+
+
+# segment types, the same order as the NSBezierPath element types
+MOVETO = 0
+LINETO = 1
+CURVETO = 2
+CLOSEPATH = 3
+
+# amount of points for each segment type
+_pointCounts = numpy.array([1, 1, 3, 0], dtype=numpy.intp)
+
+# kappa for a quarter circle
+_KAPPA = 0.5522847498
+
+# max distance between a flattened curve and the curve used for point inside tests
+_FLATTENTOLERANCE = 0.05
+_MAXFLATTENSTEPS = 100
+
+
+def _transformPoints(points, transformMatrix):
+    # transform an array of points with a transform matrix (xx, xy, yx, yy, x, y)
+    xx, xy, yx, yy, dx, dy = transformMatrix
+    matrix = numpy.array([[xx, xy], [yx, yy]], dtype=float)
+    return points.dot(matrix) + (dx, dy)
+
+
+def _arcCurves(center, radius, startAngle, sweep):
+    # return a list of bezier curves for an arc, angles are in radians
+    cx, cy = center
+    count = max(1, int(math.ceil(abs(sweep) / (math.pi * .5) - 1e-9)))
+    step = sweep / count
+    k = 4 / 3. * math.tan(step / 4)
+    curves = []
+    angle = startAngle
+    for i in range(count):
+        cos1 = math.cos(angle)
+        sin1 = math.sin(angle)
+        angle += step
+        cos2 = math.cos(angle)
+        sin2 = math.sin(angle)
+        pt1 = cx + radius * (cos1 - k * sin1), cy + radius * (sin1 + k * cos1)
+        pt2 = cx + radius * (cos2 + k * sin2), cy + radius * (sin2 - k * cos2)
+        pt3 = cx + radius * cos2, cy + radius * sin2
+        curves.append((pt1, pt2, pt3))
+    return curves
+
+
+def _cubicExtrema(p0, p1, p2, p3):
+    # return the values of the extrema between 0 and 1 of a one dimensional array of cubic curves
+    # and the index of the curve of each extreme
+    a = p3 - 3 * p2 + 3 * p1 - p0
+    b = 2 * (p2 - 2 * p1 + p0)
+    c = p1 - p0
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        linear = numpy.abs(a) < 1e-12
+        discriminant = b * b - 4 * a * c
+        root = numpy.sqrt(numpy.where(discriminant >= 0, discriminant, numpy.nan))
+        t1 = numpy.where(linear, -c / b, (-b + root) / (2 * a))
+        t2 = numpy.where(linear, numpy.nan, (-b - root) / (2 * a))
+        t = numpy.concatenate([t1, t2])
+        valid = numpy.isfinite(t) & (t > 0) & (t < 1)
+    t = t[valid]
+    curveIndexes = numpy.concatenate([numpy.arange(len(p0))] * 2)[valid]
+    p0, p1, p2, p3 = [p[curveIndexes] for p in (p0, p1, p2, p3)]
+    mt = 1 - t
+    return mt * mt * mt * p0 + 3 * mt * mt * t * p1 + 3 * mt * t * t * p2 + t * t * t * p3, curveIndexes
+
+
+def _groupReduce(values, groups, groupCount, ufunc, initial):
+    # reduce values sorted by group into an array with a value for each group
+    result = numpy.full(groupCount, initial, dtype=float)
+    if len(values):
+        starts = numpy.flatnonzero(numpy.concatenate([[True], groups[1:] != groups[:-1]]))
+        result[groups[starts]] = ufunc.reduceat(values, starts)
+    return result
+
+
+def _bounds(segmentTypes, coordinates, segmentGroups, groupCount):
+    # return arrays with xMin, yMin, xMax, yMax for each group of segments
+    # the segments of each group must be contiguous, groups without points get infinite bounds
+    counts = _pointCounts[segmentTypes]
+    ends = numpy.cumsum(counts)
+    hasPoints = counts > 0
+    onCurve = coordinates[ends[hasPoints] - 1]
+    onCurveGroups = segmentGroups[hasPoints]
+    curves = numpy.flatnonzero(segmentTypes == CURVETO)
+    curveStarts = (ends - counts)[curves]
+    curves = curves[curveStarts > 0]
+    curveStarts = curveStarts[curveStarts > 0]
+    result = []
+    for ufunc, initial in ((numpy.minimum, numpy.inf), (numpy.maximum, -numpy.inf)):
+        for axis in (0, 1):
+            values = _groupReduce(onCurve[:, axis], onCurveGroups, groupCount, ufunc, initial)
+            if len(curves):
+                p0, p1, p2, p3 = [coordinates[curveStarts + offset, axis] for offset in (-1, 0, 1, 2)]
+                extrema, curveIndexes = _cubicExtrema(p0, p1, p2, p3)
+                order = numpy.argsort(curveIndexes, kind="mergesort")
+                extremaGroups = segmentGroups[curves][curveIndexes][order]
+                values = ufunc(values, _groupReduce(extrema[order], extremaGroups, groupCount, ufunc, initial))
+            result.append(values)
+    return result
+
+
+def _isNSBezierPath(path):
+    # a drawBot BezierPath backed by a NSBezierPath
+    return not isinstance(path, ArrayBezierPath) and hasattr(path, "getNSBezierPath") and hasattr(path, "_getPathData")
+
+
+def _arraysForBezierPath(bezierPath):
+    # return segment types and coordinates arrays from the cached path data of a BezierPath
+    points, segmentStarts, contours = bezierPath._getPathData()
+    counts = numpy.diff(numpy.array(segmentStarts, dtype=numpy.intp))
+    segmentTypes = numpy.where(counts == 3, CURVETO, LINETO).astype(numpy.uint8)
+    coordinates = numpy.array(points, dtype=float).reshape(-1, 2)
+    return segmentTypes, coordinates
+
+
+def _getPathArrays(path):
+    if isinstance(path, ArrayBezierPath):
+        return path._getArrays()
+    return path._cachedValue("pathArrays", _arraysForBezierPath)
+
+
+def _concatenateArrays(paths):
+    # return the combined segment types and coordinates of array bezier paths and BezierPaths
+    # with the amount of segments and points of each path
+    arrays = [_getPathArrays(path) for path in paths]
+    # list comprehensions leak their loop variables in python 2, use names different from the results
+    segmentCounts = numpy.array([len(types) for types, _ in arrays], dtype=numpy.intp)
+    pointCounts = numpy.array([len(coords) for _, coords in arrays], dtype=numpy.intp)
+    segmentTypes = numpy.concatenate([types for types, _ in arrays] + [numpy.zeros(0, dtype=numpy.uint8)])
+    coordinates = numpy.concatenate([coords for _, coords in arrays] + [numpy.zeros((0, 2), dtype=float)])
+    return segmentTypes, coordinates, segmentCounts, pointCounts
+
+
+class ArrayBezierPath(BasePen):
+
+    """
+    A bezier path object backed by numpy arrays.
+    """
+
+    contourClass = BezierContour
+
+    def __init__(self, glyphSet=None):
+        self._segmentTypes = numpy.zeros(0, dtype=numpy.uint8)
+        self._coordinates = numpy.zeros((0, 2), dtype=float)
+        # appended segments are collected in lists and added to the arrays when needed
+        self._pendingSegmentTypes = []
+        self._pendingCoordinates = []
+        self._lastMovePoint = None
+        self._cache = {}
+        BasePen.__init__(self, glyphSet)
+
+    def __repr__(self):
+        return "<ArrayBezierPath>"
+
+    # storage
+
+    def _getArrays(self):
+        if self._pendingSegmentTypes:
+            self._segmentTypes = numpy.concatenate([self._segmentTypes, numpy.array(self._pendingSegmentTypes, dtype=numpy.uint8)])
+            if self._pendingCoordinates:
+                self._coordinates = numpy.concatenate([self._coordinates, numpy.array(self._pendingCoordinates, dtype=float)])
+            self._pendingSegmentTypes = []
+            self._pendingCoordinates = []
+        return self._segmentTypes, self._coordinates
+
+    def _setArrays(self, segmentTypes, coordinates):
+        self._segmentTypes = segmentTypes
+        self._coordinates = coordinates
+        self._pendingSegmentTypes = []
+        self._pendingCoordinates = []
+        self._lastMovePoint = None
+        if len(segmentTypes) and segmentTypes[-1] == CLOSEPATH:
+            moves = numpy.flatnonzero(segmentTypes == MOVETO)
+            if len(moves):
+                offset = _pointCounts[segmentTypes[:moves[-1]]].sum()
+                self._lastMovePoint = tuple(coordinates[offset])
+        self._pathChanged()
+
+    def _lastSegmentType(self):
+        if self._pendingSegmentTypes:
+            return self._pendingSegmentTypes[-1]
+        if len(self._segmentTypes):
+            return self._segmentTypes[-1]
+        return None
+
+    def _addSegment(self, segmentType, points):
+        if segmentType != MOVETO and self._lastSegmentType() == CLOSEPATH and self._lastMovePoint is not None:
+            # like a NSBezierPath, start a new contour at the start of the previous closed contour
+            self._addSegment(MOVETO, [self._lastMovePoint])
+        if segmentType == MOVETO:
+            self._lastMovePoint = tuple(points[0])
+        self._pendingSegmentTypes.append(segmentType)
+        self._pendingCoordinates.extend(points)
+        self._pathChanged()
+
+    def _currentPoint(self):
+        segmentTypes, coordinates = self._getArrays()
+        if not len(segmentTypes):
+            return None
+        if segmentTypes[-1] == CLOSEPATH:
+            return self._lastMovePoint
+        return tuple(coordinates[-1])
+
+    # cache support
+
+    def _pathChanged(self):
+        # clear all cached representations of the path
+        if self._cache:
+            self._cache = {}
+
+    def _cachedValue(self, key, factory):
+        # return a cached representation of the path, `factory` is called with the path when missing
+        if key not in self._cache:
+            self._cache[key] = factory(self)
+        return self._cache[key]
+
+    # pen support
+
+    def _moveTo(self, pt):
+        """
+        Move to a point `x`, `y`.
+        """
+        self._addSegment(MOVETO, [pt])
+
+    def _lineTo(self, pt):
+        """
+        Line to a point `x`, `y`.
+        """
+        self._addSegment(LINETO, [pt])
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        """
+        Curve to a point `x3`, `y3`.
+        With given bezier handles `x1`, `y1` and `x2`, `y2`.
+        """
+        self._addSegment(CURVETO, [pt1, pt2, pt3])
+
+    def closePath(self):
+        """
+        Close the path.
+        """
+        if self._lastSegmentType() not in (None, CLOSEPATH):
+            self._addSegment(CLOSEPATH, [])
+
+    def beginPath(self, identifier=None):
+        """
+        Begin path.
+        """
+        from ufoLib.pointPen import PointToSegmentPen
+        self._pointToSegmentPen = PointToSegmentPen(self)
+        self._pointToSegmentPen.beginPath()
+
+    def addPoint(self, *args, **kwargs):
+        """
+        Add a point to the path.
+        """
+        self._pointToSegmentPen.addPoint(*args, **kwargs)
+
+    def endPath(self):
+        """
+        End the path.
+
+        When the bezier path is used as a pen, the path will be open.
+
+        When the bezier path is used as a point pen, the path will process all the points added with `addPoints`.
+        """
+        if hasattr(self, "_pointToSegmentPen"):
+            # its been uses in a point pen world
+            self._pointToSegmentPen.endPath()
+            del self._pointToSegmentPen
+
+    def drawToPen(self, pen):
+        """
+        Draw the bezier path into a pen
+        """
+        contours = self.contours
+        for contour in contours:
+            contour.drawToPen(pen)
+
+    def drawToPointPen(self, pointPen):
+        """
+        Draw the bezier path into a point pen.
+        """
+        contours = self.contours
+        for contour in contours:
+            contour.drawToPointPen(pointPen)
+
+    def arc(self, center, radius, startAngle, endAngle, clockwise):
+        """
+        Arc with `center` and a given `radius`, from `startAngle` to `endAngle`, going clockwise if `clockwise` is True and counter clockwise if `clockwise` is False.
+        """
+        sweep = endAngle - startAngle
+        if clockwise:
+            while sweep > 0:
+                sweep -= 360
+            sweep = max(sweep, -360)
+        else:
+            while sweep < 0:
+                sweep += 360
+            sweep = min(sweep, 360)
+        startAngle = math.radians(startAngle)
+        cx, cy = center
+        start = cx + radius * math.cos(startAngle), cy + radius * math.sin(startAngle)
+        if self._currentPoint() is None:
+            self.moveTo(start)
+        else:
+            self.lineTo(start)
+        if sweep:
+            for pt1, pt2, pt3 in _arcCurves(center, radius, startAngle, math.radians(sweep)):
+                self.curveTo(pt1, pt2, pt3)
+
+    def arcTo(self, pt1, pt2, radius):
+        """
+        Arc from one point to an other point with a given `radius`.
+        """
+        pt0 = numpy.array(self._currentPoint(), dtype=float)
+        pt1 = numpy.array(pt1, dtype=float)
+        pt2 = numpy.array(pt2, dtype=float)
+        v1 = pt0 - pt1
+        v2 = pt2 - pt1
+        length1 = math.hypot(*v1)
+        length2 = math.hypot(*v2)
+        if radius <= 0 or not length1 or not length2:
+            self.lineTo(tuple(pt1))
+            return
+        v1 /= length1
+        v2 /= length2
+        cosAngle = max(-1, min(1, v1.dot(v2)))
+        angle = math.acos(cosAngle)
+        if angle < 1e-9 or math.pi - angle < 1e-9:
+            # tangents are parallel
+            self.lineTo(tuple(pt1))
+            return
+        distance = radius / math.tan(angle * .5)
+        tangent1 = pt1 + v1 * distance
+        tangent2 = pt1 + v2 * distance
+        bisector = v1 + v2
+        bisector /= math.hypot(*bisector)
+        center = pt1 + bisector * (radius / math.sin(angle * .5))
+        startAngle = math.atan2(*(tangent1 - center)[::-1])
+        endAngle = math.atan2(*(tangent2 - center)[::-1])
+        sweep = (endAngle - startAngle + math.pi) % (2 * math.pi) - math.pi
+        self.lineTo(tuple(tangent1))
+        for curvePt1, curvePt2, curvePt3 in _arcCurves(center, radius, startAngle, sweep):
+            self.curveTo(curvePt1, curvePt2, curvePt3)
+
+    def rect(self, x, y, w, h):
+        """
+        Add a rectangle at possition `x`, `y` with a size of `w`, `h`
+        """
+        self.moveTo((x, y))
+        self.lineTo((x + w, y))
+        self.lineTo((x + w, y + h))
+        self.lineTo((x, y + h))
+        self.closePath()
+
+    def oval(self, x, y, w, h):
+        """
+        Add a oval at possition `x`, `y` with a size of `w`, `h`
+        """
+        rx = w * .5
+        ry = h * .5
+        cx = x + rx
+        cy = y + ry
+        kx = rx * _KAPPA
+        ky = ry * _KAPPA
+        self.moveTo((cx + rx, cy))
+        self.curveTo((cx + rx, cy + ky), (cx + kx, cy + ry), (cx, cy + ry))
+        self.curveTo((cx - kx, cy + ry), (cx - rx, cy + ky), (cx - rx, cy))
+        self.curveTo((cx - rx, cy - ky), (cx - kx, cy - ry), (cx, cy - ry))
+        self.curveTo((cx + kx, cy - ry), (cx + rx, cy - ky), (cx + rx, cy))
+        self.closePath()
+
+    def textBox(self, txt, box, font, fontSize=10, align=None):
+        """
+        Draws a `txt` with a `font` file path and `fontSize` in a `box` in the bezier path.
+        The text is laid out with fontTools, see `headlessText.layoutText`.
+
+        Optionally an alignment can be set.
+        Possible `align` values are: `"left"`, `"center"`, `"right"` and `"justified"`.
+
+        The default alignment is `left`.
+
+        Returns the text that did not fit in the box.
+        """
+        from headlessText import layoutText, drawTextLayout
+        layout = layoutText([(txt, dict(font=font, fontSize=fontSize))], box, align)
+        drawTextLayout(layout, self)
+        location, length = layout["visibleRange"]
+        return txt[location + length:]
+
+    def getNSBezierPath(self):
+        """
+        Return a new nsBezierPath, this requires AppKit.
+        """
+        import AppKit
+        path = AppKit.NSBezierPath.bezierPath()
+        segmentTypes, coordinates = self._getArrays()
+        points = coordinates.tolist()
+        index = 0
+        for segmentType in segmentTypes.tolist():
+            if segmentType == MOVETO:
+                path.moveToPoint_(points[index])
+            elif segmentType == LINETO:
+                path.lineToPoint_(points[index])
+            elif segmentType == CURVETO:
+                path.curveToPoint_controlPoint1_controlPoint2_(points[index + 2], points[index], points[index + 1])
+            elif segmentType == CLOSEPATH:
+                path.closePath()
+            index += _pointCounts[segmentType]
+        return path
+
+    def setNSBezierPath(self, path):
+        """
+        Set a nsBezierPath, this requires AppKit.
+        """
+        import AppKit
+        instructionMap = {
+            AppKit.NSMoveToBezierPathElement: MOVETO,
+            AppKit.NSLineToBezierPathElement: LINETO,
+            AppKit.NSCurveToBezierPathElement: CURVETO,
+            AppKit.NSClosePathBezierPathElement: CLOSEPATH,
+        }
+        segmentTypes = []
+        coordinates = []
+        for i in range(path.elementCount()):
+            instruction, points = path.elementAtIndex_associatedPoints_(i)
+            segmentTypes.append(instructionMap[instruction])
+            coordinates.extend([(p.x, p.y) for p in points])
+        self._setArrays(numpy.array(segmentTypes, dtype=numpy.uint8), numpy.array(coordinates, dtype=float).reshape(-1, 2))
+
+    def pointInside(self, point):
+        """
+        Check if a point `x`, `y` is inside a path.
+
+        Curves are flattened with a small tolerance, the path is filled with the non zero winding rule.
+        """
+        x, y = point
+        edgeStarts, edgeEnds = self._cachedValue("flattenedEdges", _flattenedEdges)
+        if not len(edgeStarts):
+            return False
+        x0 = edgeStarts[:, 0]
+        y0 = edgeStarts[:, 1]
+        x1 = edgeEnds[:, 0]
+        y1 = edgeEnds[:, 1]
+        cross = (x1 - x0) * (y - y0) - (x - x0) * (y1 - y0)
+        upwards = (y0 <= y) & (y1 > y) & (cross > 0)
+        downwards = (y0 > y) & (y1 <= y) & (cross < 0)
+        return int(upwards.sum()) - int(downwards.sum()) != 0
+
+    def bounds(self):
+        """
+        Return the bounding box of the path.
+        """
+        segmentTypes, coordinates = self._getArrays()
+        if not len(segmentTypes):
+            return None
+        xMin, yMin, xMax, yMax = _bounds(segmentTypes, coordinates, numpy.zeros(len(segmentTypes), dtype=numpy.intp), 1)
+        return float(xMin[0]), float(yMin[0]), float(xMax[0]), float(yMax[0])
+
+    def controlPointBounds(self):
+        """
+        Return the bounding box of the path including the offcurve points.
+        """
+        segmentTypes, coordinates = self._getArrays()
+        if not len(coordinates):
+            return 0., 0., 0., 0.
+        xMin, yMin = coordinates.min(axis=0)
+        xMax, yMax = coordinates.max(axis=0)
+        return float(xMin), float(yMin), float(xMax), float(yMax)
+
+    def optimizePath(self):
+        segmentTypes, coordinates = self._getArrays()
+        if len(segmentTypes) and segmentTypes[-1] == MOVETO:
+            self._setArrays(segmentTypes[:-1], coordinates[:-1])
+
+    def copy(self):
+        """
+        Copy the bezier path.
+        """
+        new = self.__class__()
+        segmentTypes, coordinates = self._getArrays()
+        new._setArrays(segmentTypes.copy(), coordinates.copy())
+        new._lastMovePoint = self._lastMovePoint
+        new._cache = dict(self._cache)
+        return new
+
+    def reverse(self):
+        """
+        Reverse the path direction
+        """
+        reversedPath = self.__class__()
+        for contour in self.contours:
+            onCurvePoints = [segment[-1] for segment in contour]
+            reversedPath.moveTo(onCurvePoints[-1])
+            for index in range(len(contour) - 1, 0, -1):
+                segment = contour[index]
+                if len(segment) == 1:
+                    reversedPath.lineTo(onCurvePoints[index - 1])
+                else:
+                    reversedPath.curveTo(segment[1], segment[0], onCurvePoints[index - 1])
+            if not contour.open:
+                reversedPath.closePath()
+        self._setArrays(*reversedPath._getArrays())
+
+    def appendPath(self, otherPath):
+        """
+        Append a path.
+        """
+        if isinstance(otherPath, ArrayBezierPath):
+            segmentTypes, coordinates = self._getArrays()
+            otherSegmentTypes, otherCoordinates = otherPath._getArrays()
+            self._setArrays(numpy.concatenate([segmentTypes, otherSegmentTypes]), numpy.concatenate([coordinates, otherCoordinates]))
+        else:
+            otherPath.drawToPen(self)
+
+    def __add__(self, otherPath):
+        new = self.copy()
+        new.appendPath(otherPath)
+        return new
+
+    def __iadd__(self, other):
+        self.appendPath(other)
+        return self
+
+    # transformations
+
+    def translate(self, x=0, y=0):
+        """
+        Translate the path with a given offset.
+        """
+        self.transform((1, 0, 0, 1, x, y))
+
+    def rotate(self, angle):
+        """
+        Rotate the path around the origin point with a given angle in degrees.
+        """
+        angle = math.radians(angle)
+        c = math.cos(angle)
+        s = math.sin(angle)
+        self.transform((c, s, -s, c, 0, 0))
+
+    def scale(self, x=1, y=None):
+        """
+        Scale the path with a given `x` (horizontal scale) and `y` (vertical scale).
+
+        If only 1 argument is provided a proportional scale is applied.
+        """
+        if y is None:
+            y = x
+        self.transform((x, 0, 0, y, 0, 0))
+
+    def skew(self, angle1, angle2=0):
+        """
+        Skew the path with given `angle1` and `angle2`.
+
+        If only one argument is provided a proportional skew is applied.
+        """
+        angle1 = math.radians(angle1)
+        angle2 = math.radians(angle2)
+        self.transform((1, math.tan(angle2), math.tan(angle1), 1, 0, 0))
+
+    def transform(self, transformMatrix):
+        """
+        Transform a path with a transform matrix (xy, xx, yy, yx, x, y).
+        """
+        segmentTypes, coordinates = self._getArrays()
+        self._setTransformedCoordinates(_transformPoints(coordinates, transformMatrix), transformMatrix)
+
+    def _setTransformedCoordinates(self, coordinates, transformMatrix):
+        self._coordinates = coordinates
+        if self._lastMovePoint is not None:
+            x, y = self._lastMovePoint
+            xx, xy, yx, yy, dx, dy = transformMatrix
+            self._lastMovePoint = xx * x + yx * y + dx, xy * x + yy * y + dy
+        self._pathChanged()
+
+    # boolean operations
+
+    def _contoursForBooleanOperations(self):
+        # contours are very temporaly objects
+        # redirect drawToPointPen to drawPoints
+        contours = self.contours
+        for contour in contours:
+            contour.drawPoints = contour.drawToPointPen
+        return contours
+
+    def union(self, other):
+        """
+        Return the union between two bezier paths.
+        """
+        import booleanOperations
+        contours = self._contoursForBooleanOperations() + other._contoursForBooleanOperations()
+        result = self.__class__()
+        booleanOperations.union(contours, result)
+        return result
+
+    def removeOverlap(self):
+        """
+        Remove all overlaps in a bezier path.
+        """
+        import booleanOperations
+        contours = self._contoursForBooleanOperations()
+        result = self.__class__()
+        booleanOperations.union(contours, result)
+        self._setArrays(*result._getArrays())
+        return self
+
+    def difference(self, other):
+        """
+        Return the difference between two bezier paths.
+        """
+        import booleanOperations
+        subjectContours = self._contoursForBooleanOperations()
+        clipContours = other._contoursForBooleanOperations()
+        result = self.__class__()
+        booleanOperations.difference(subjectContours, clipContours, result)
+        return result
+
+    def intersection(self, other):
+        """
+        Return the intersection between two bezier paths.
+        """
+        import booleanOperations
+        subjectContours = self._contoursForBooleanOperations()
+        clipContours = other._contoursForBooleanOperations()
+        result = self.__class__()
+        booleanOperations.intersection(subjectContours, clipContours, result)
+        return result
+
+    def xor(self, other):
+        """
+        Return the xor between two bezier paths.
+        """
+        import booleanOperations
+        subjectContours = self._contoursForBooleanOperations()
+        clipContours = other._contoursForBooleanOperations()
+        result = self.__class__()
+        booleanOperations.xor(subjectContours, clipContours, result)
+        return result
+
+    def __mod__(self, other):
+        return self.difference(other)
+
+    __rmod__ = __mod__
+
+    def __imod__(self, other):
+        result = self.difference(other)
+        self._setArrays(*result._getArrays())
+        return self
+
+    def __or__(self, other):
+        return self.union(other)
+
+    __ror__ = __or__
+
+    def __ior__(self, other):
+        result = self.union(other)
+        self._setArrays(*result._getArrays())
+        return self
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    __rand__ = __and__
+
+    def __iand__(self, other):
+        result = self.intersection(other)
+        self._setArrays(*result._getArrays())
+        return self
+
+    def __xor__(self, other):
+        return self.xor(other)
+
+    __rxor__ = __xor__
+
+    def __ixor__(self, other):
+        result = self.xor(other)
+        self._setArrays(*result._getArrays())
+        return self
+
+    def _getPathData(self):
+        # points as tuples, the index of the first point of each segment and the contours as slices of those points
+        return self._cachedValue("pathData", _pathDataForArrayBezierPath)
+
+    def _points(self, onCurve=True, offCurve=True):
+        if not onCurve and not offCurve:
+            return []
+        if onCurve and offCurve:
+            return list(self._getPathData()[0])
+        segmentTypes, coordinates = self._getArrays()
+        counts = _pointCounts[segmentTypes]
+        isOnCurve = numpy.zeros(len(coordinates), dtype=bool)
+        isOnCurve[numpy.cumsum(counts)[counts > 0] - 1] = True
+        if onCurve:
+            coordinates = coordinates[isOnCurve]
+        else:
+            coordinates = coordinates[~isOnCurve]
+        return [tuple(point) for point in coordinates.tolist()]
+
+    def _get_points(self):
+        return self._points()
+
+    points = property(_get_points, doc="Return a list of all points.")
+
+    def _get_onCurvePoints(self):
+        return list(self._cachedValue("onCurvePoints", lambda path: path._points(offCurve=False)))
+
+    onCurvePoints = property(_get_onCurvePoints, doc="Return a list of all on curve points.")
+
+    def _get_offCurvePoints(self):
+        return list(self._cachedValue("offCurvePoints", lambda path: path._points(onCurve=False)))
+
+    offCurvePoints = property(_get_offCurvePoints, doc="Return a list of all off curve points.")
+
+    def _get_contours(self):
+        # the contour slices are cached, return copies so changing a contour does not change the path data
+        return [copyContour(contour, self.contourClass) for contour in self._getPathData()[2]]
+
+    contours = property(_get_contours, doc="Return a list of contours with all point coordinates sorted in segments. A contour object has an `open` attribute.")
+
+    def __len__(self):
+        return len(self._getPathData()[2])
+
+    def __getitem__(self, index):
+        contours = self._getPathData()[2]
+        if isinstance(index, slice):
+            return [copyContour(contour, self.contourClass) for contour in contours[index]]
+        return copyContour(contours[index], self.contourClass)
+
+    def __iter__(self):
+        contours = self.contours
+        count = len(contours)
+        index = 0
+        while index < count:
+            contour = contours[index]
+            yield contour
+            index += 1
+
+
+def _pathDataForArrayBezierPath(path):
+    segmentTypes, coordinates = path._getArrays()
+    points = tuple(tuple(point) for point in coordinates.tolist())
+    counts = _pointCounts[segmentTypes]
+    hasPoints = counts > 0
+    segmentStarts = ((numpy.cumsum(counts) - counts)[hasPoints]).tolist()
+    segmentStarts.append(len(points))
+    # the index of the segment of each move and the amount of segments before each close
+    segmentIndexes = numpy.cumsum(hasPoints) - hasPoints
+    moves = numpy.flatnonzero(segmentTypes == MOVETO)
+    firstSegments = segmentIndexes[moves].tolist()
+    lastSegments = firstSegments[1:] + [int(hasPoints.sum())]
+    contourIndexes = numpy.cumsum(segmentTypes == MOVETO) - 1
+    closed = set(contourIndexes[segmentTypes == CLOSEPATH].tolist())
+    contourRanges = [(first, last, index not in closed) for index, (first, last) in enumerate(zip(firstSegments, lastSegments))]
+    return points, segmentStarts, contourSlices(points, segmentStarts, contourRanges)
+
+
+def _flattenedEdges(path):
+    # return the start and end points of all edges of the path, with curves flattened into lines
+    # every contour is closed
+    segmentTypes, coordinates = path._getArrays()
+    counts = _pointCounts[segmentTypes]
+    ends = numpy.cumsum(counts)
+    starts = ends - counts
+    contourIndexes = numpy.cumsum(segmentTypes == MOVETO) - 1
+    # vertices of moves and lines
+    lineSegments = numpy.flatnonzero(((segmentTypes == MOVETO) | (segmentTypes == LINETO)) & (contourIndexes >= 0))
+    vertices = [coordinates[starts[lineSegments]]]
+    vertexSegments = [lineSegments]
+    vertexSteps = [numpy.ones(len(lineSegments))]
+    # vertices of flattened curves
+    curveSegments = numpy.flatnonzero((segmentTypes == CURVETO) & (starts > 0) & (contourIndexes >= 0))
+    if len(curveSegments):
+        curveStarts = starts[curveSegments]
+        p0 = coordinates[curveStarts - 1]
+        p1 = coordinates[curveStarts]
+        p2 = coordinates[curveStarts + 1]
+        p3 = coordinates[curveStarts + 2]
+        # the amount of steps needed for the tolerance, based on the second differences of the control points
+        deviation = numpy.maximum(numpy.hypot(*(p0 - 2 * p1 + p2).T), numpy.hypot(*(p1 - 2 * p2 + p3).T))
+        steps = numpy.ceil(numpy.sqrt(.75 * deviation / _FLATTENTOLERANCE))
+        steps = numpy.clip(steps, 1, _MAXFLATTENSTEPS).astype(numpy.intp)
+        curveIndexes = numpy.repeat(numpy.arange(len(curveSegments)), steps)
+        stepOffsets = numpy.repeat(numpy.cumsum(steps) - steps, steps)
+        t = (numpy.arange(len(curveIndexes)) - stepOffsets + 1) / steps[curveIndexes].astype(float)
+        t = t[:, None]
+        mt = 1 - t
+        curveVertices = mt * mt * mt * p0[curveIndexes] + 3 * mt * mt * t * p1[curveIndexes] + 3 * mt * t * t * p2[curveIndexes] + t * t * t * p3[curveIndexes]
+        vertices.append(curveVertices)
+        vertexSegments.append(curveSegments[curveIndexes])
+        vertexSteps.append(t[:, 0])
+    vertices = numpy.concatenate(vertices)
+    vertexSegments = numpy.concatenate(vertexSegments)
+    vertexSteps = numpy.concatenate(vertexSteps)
+    if not len(vertices):
+        empty = numpy.zeros((0, 2), dtype=float)
+        return empty, empty
+    order = numpy.lexsort((vertexSteps, vertexSegments))
+    vertices = vertices[order]
+    vertexContours = contourIndexes[vertexSegments[order]]
+    # connect each vertex with the next one in the same contour, the last one with the first one
+    contourStarts = numpy.concatenate([[0], numpy.flatnonzero(numpy.diff(vertexContours)) + 1])
+    contourNumbers = numpy.cumsum(numpy.concatenate([[0], numpy.diff(vertexContours) != 0]))
+    nextIndexes = numpy.arange(1, len(vertices) + 1)
+    isLast = numpy.concatenate([vertexContours[1:] != vertexContours[:-1], [True]])
+    nextIndexes[isLast] = contourStarts[contourNumbers[isLast]]
+    return vertices, vertices[nextIndexes]
+
+
+# collections of paths
+
+
+def transformPaths(paths, transformMatrix):
+    """
+    Transform all `paths` with a transform matrix (xy, xx, yy, yx, x, y).
+
+    The points of all array bezier paths are transformed together.
+    A `BezierPath` is transformed by its NSBezierPath with a single shared transform,
+    its cached point data is transformed in the same pass as the array bezier paths,
+    so `boundsForPaths` afterwards does not read the NSBezierPath again.
+    """
+    arrayPaths = []
+    bezierPaths = []
+    otherPaths = []
+    for path in paths:
+        if isinstance(path, ArrayBezierPath):
+            arrayPaths.append(path)
+        elif _isNSBezierPath(path):
+            bezierPaths.append(path)
+        else:
+            otherPaths.append(path)
+    if bezierPaths:
+        import AppKit
+        aT = AppKit.NSAffineTransform.transform()
+        aT.setTransformStruct_(tuple(transformMatrix))
+        cachedPaths = []
+        for path in bezierPaths:
+            arrays = path._getCachedValue("pathArrays")
+            path.getNSBezierPath().transformUsingAffineTransform_(aT)
+            path._pathChanged()
+            if arrays is not None:
+                cachedPaths.append((path, arrays))
+    else:
+        cachedPaths = []
+    for path in otherPaths:
+        path.transform(transformMatrix)
+    if arrayPaths or cachedPaths:
+        allPaths = arrayPaths + [path for path, arrays in cachedPaths]
+        arrays = [path._getArrays() for path in arrayPaths] + [arrays for path, arrays in cachedPaths]
+        pointCounts = [len(coords) for _, coords in arrays]
+        coordinates = numpy.concatenate([coords for _, coords in arrays] + [numpy.zeros((0, 2), dtype=float)])
+        coordinates = _transformPoints(coordinates, transformMatrix)
+        for path, (types, _), pathCoordinates in zip(allPaths, arrays, numpy.split(coordinates, numpy.cumsum(pointCounts)[:-1])):
+            if isinstance(path, ArrayBezierPath):
+                path._setTransformedCoordinates(pathCoordinates, transformMatrix)
+            else:
+                path._setCachedValue("pathArrays", (types, pathCoordinates))
+
+
+def boundsForPaths(paths):
+    """
+    Return a list with the bounding box of each path, the same as `path.bounds()`.
+
+    The bounds of all array bezier paths and BezierPaths are computed together,
+    the points of a BezierPath are read once and cached until the path changes.
+    """
+    paths = list(paths)
+    result = [None] * len(paths)
+    arrayIndexes = []
+    for index, path in enumerate(paths):
+        if isinstance(path, ArrayBezierPath) or _isNSBezierPath(path):
+            arrayIndexes.append(index)
+        else:
+            result[index] = path.bounds()
+    if arrayIndexes:
+        segmentTypes, coordinates, segmentCounts, pointCounts = _concatenateArrays([paths[index] for index in arrayIndexes])
+        segmentGroups = numpy.repeat(numpy.arange(len(arrayIndexes)), segmentCounts)
+        bounds = numpy.array(_bounds(segmentTypes, coordinates, segmentGroups, len(arrayIndexes))).T.tolist()
+        for index, segmentCount, box in zip(arrayIndexes, segmentCounts.tolist(), bounds):
+            if segmentCount:
+                result[index] = tuple(box)
+    return result
+
+
+def controlPointBoundsForPaths(paths):
+    """
+    Return a list with the bounding box including the offcurve points of each path, the same as `path.controlPointBounds()`.
+
+    The bounds of all array bezier paths and BezierPaths are computed together,
+    the points of a BezierPath are read once and cached until the path changes.
+    """
+    paths = list(paths)
+    result = [None] * len(paths)
+    arrayIndexes = []
+    for index, path in enumerate(paths):
+        if isinstance(path, ArrayBezierPath) or _isNSBezierPath(path):
+            arrayIndexes.append(index)
+        else:
+            result[index] = path.controlPointBounds()
+    if arrayIndexes:
+        segmentTypes, coordinates, segmentCounts, pointCounts = _concatenateArrays([paths[index] for index in arrayIndexes])
+        pointGroups = numpy.repeat(numpy.arange(len(arrayIndexes)), pointCounts)
+        groupCount = len(arrayIndexes)
+        bounds = [_groupReduce(coordinates[:, axis], pointGroups, groupCount, ufunc, 0) for ufunc, axis in ((numpy.minimum, 0), (numpy.minimum, 1), (numpy.maximum, 0), (numpy.maximum, 1))]
+        for index, box in zip(arrayIndexes, numpy.array(bounds).T.tolist()):
+            result[index] = tuple(box)
+    return result
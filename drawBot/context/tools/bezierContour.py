@@ -0,0 +1,137 @@
+class _BezierContourMixin(object):
+
+    def _get_clockwise(self):
+        from fontTools.pens.areaPen import AreaPen
+        pen = AreaPen()
+        pen.endPath = pen.closePath
+        self.drawToPen(pen)
+        return pen.value < 0
+
+    clockwise = property(_get_clockwise, doc="A boolean representing if the contour has a clockwise direction.")
+
+    def drawToPointPen(self, pointPen):
+        pointPen.beginPath()
+        for i, segment in enumerate(self):
+            if len(segment) == 1:
+                segmentType = "line"
+                if i == 0 and self.open:
+                    segmentType = "move"
+                pointPen.addPoint(segment[0], segmentType=segmentType)
+            else:
+                pointPen.addPoint(segment[0])
+                pointPen.addPoint(segment[1])
+                pointPen.addPoint(segment[2], segmentType="curve")
+        pointPen.endPath()
+
+    def drawToPen(self, pen):
+        for i, segment in enumerate(self):
+            if i == 0:
+                pen.moveTo(*segment)
+            elif len(segment) == 1:
+                pen.lineTo(*segment)
+            else:
+                pen.curveTo(*segment)
+        if self.open:
+            pen.endPath()
+        else:
+            pen.closePath()
+
+    def _get_points(self):
+        return [point for segment in self for point in segment]
+
+    points = property(_get_points, doc="Return a list of all the points making up this contour, regardless of whether they are on curve or off curve.")
+
+
+class BezierContour(_BezierContourMixin, list):
+
+    """
+    A Bezier contour object.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(BezierContour, self).__init__(*args, **kwargs)
+        self.open = True
+
+    def __repr__(self):
+        return "<BezierContour>"
+
+
+class BezierContourSlice(_BezierContourMixin):
+
+    """
+    A read only Bezier contour object, a slice of the points shared by all contours of a path.
+    """
+
+    def __init__(self, points, segmentStarts, firstSegment, lastSegment, open=True):
+        # segment `i` of the path has the points `points[segmentStarts[i]:segmentStarts[i + 1]]`
+        self._pathPoints = points
+        self._segmentStarts = segmentStarts
+        self._firstSegment = firstSegment
+        self._lastSegment = lastSegment
+        self.open = open
+
+    def __repr__(self):
+        return "<BezierContour>"
+
+    def copy(self):
+        """
+        Return a new contour slice sharing the same points.
+        """
+        return self.__class__(self._pathPoints, self._segmentStarts, self._firstSegment, self._lastSegment, self.open)
+
+    def __len__(self):
+        return self._lastSegment - self._firstSegment
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("contour index out of range")
+        index += self._firstSegment
+        return list(self._pathPoints[self._segmentStarts[index]:self._segmentStarts[index + 1]])
+
+    def __iter__(self):
+        points = self._pathPoints
+        segmentStarts = self._segmentStarts
+        for index in range(self._firstSegment, self._lastSegment):
+            yield list(points[segmentStarts[index]:segmentStarts[index + 1]])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _get_points(self):
+        return list(self._pathPoints[self._segmentStarts[self._firstSegment]:self._segmentStarts[self._lastSegment]])
+
+    points = property(_get_points, doc="Return a list of all the points making up this contour, regardless of whether they are on curve or off curve.")
+
+
+def contourSlices(points, segmentStarts, contourRanges):
+    """
+    Return a list of `BezierContourSlice` objects sharing `points`.
+
+    `segmentStarts` is a list with the index of the first point of each segment, followed by the amount of points.
+    `contourRanges` is a list of `(firstSegment, lastSegment, open)` tuples.
+    """
+    contours = [BezierContourSlice(points, segmentStarts, firstSegment, lastSegment, isOpen) for firstSegment, lastSegment, isOpen in contourRanges]
+    if len(contours) >= 2 and len(contours[-1]) == 1 and contours[-1][0] == contours[-2][0]:
+        contours.pop()
+    return contours
+
+
+def copyContour(contour, contourClass=BezierContour):
+    """
+    Return a copy of a contour slice, the `open` attribute of the copy can be changed without changing the slice.
+
+    When `contourClass` is not `BezierContour` a `contourClass` object with the segments of the contour is returned.
+    """
+    if contourClass is BezierContour:
+        return contour.copy()
+    result = contourClass()
+    result.extend(contour)
+    result.open = contour.open
+    return result
@@ -0,0 +1,86 @@
+import AppKit
+
+
+def _redrawBitmap(bitmap):
+    # draw a bitmap in a non planar 8 bit rgba bitmap
+    w, h = bitmap.pixelsWide(), bitmap.pixelsHigh()
+    rgbaBitmap = AppKit.NSBitmapImageRep.alloc().initWithBitmapDataPlanes_pixelsWide_pixelsHigh_bitsPerSample_samplesPerPixel_hasAlpha_isPlanar_colorSpaceName_bitmapFormat_bytesPerRow_bitsPerPixel_(
+        None, w, h, 8, 4, True, False, AppKit.NSCalibratedRGBColorSpace, 0, 0, 0)
+    AppKit.NSGraphicsContext.saveGraphicsState()
+    AppKit.NSGraphicsContext.setCurrentContext_(AppKit.NSGraphicsContext.graphicsContextWithBitmapImageRep_(rgbaBitmap))
+    bitmap.drawInRect_(((0, 0), (w, h)))
+    AppKit.NSGraphicsContext.restoreGraphicsState()
+    return rgbaBitmap
+
+
+def bitmapPixelArray(bitmap):
+    """
+    Return the pixels of a NSBitmapImageRep as a numpy float32 array with a shape of `(height, width, 4)`.
+    The first row is the top row of the bitmap, each pixel has `r, g, b, alpha` values from 0 to 1,
+    in the calibrated rgb color space and not premultiplied, the same values as `colorAtX_y_` returns.
+    """
+    import numpy
+    converted = bitmap.bitmapImageRepByConvertingToColorSpace_renderingIntent_(AppKit.NSColorSpace.genericRGBColorSpace(), AppKit.NSColorRenderingIntentDefault)
+    if converted is not None:
+        bitmap = converted
+    bitmapFormat = bitmap.bitmapFormat()
+    bitsPerSample = bitmap.bitsPerSample()
+    samplesPerPixel = bitmap.samplesPerPixel()
+    isFloat = bool(bitmapFormat & AppKit.NSFloatingPointSamplesBitmapFormat)
+    # padded pixels, like rgb in 32 bits, are redrawn as well
+    if bitmap.isPlanar() or samplesPerPixel not in (3, 4) or (bitsPerSample, isFloat) not in ((8, False), (16, False), (32, True)) or bitmap.bitsPerPixel() != samplesPerPixel * bitsPerSample:
+        bitmap = _redrawBitmap(bitmap)
+        bitmapFormat = bitmap.bitmapFormat()
+        bitsPerSample = bitmap.bitsPerSample()
+        samplesPerPixel = bitmap.samplesPerPixel()
+        isFloat = False
+    w, h = bitmap.pixelsWide(), bitmap.pixelsHigh()
+    bytesPerRow = bitmap.bytesPerRow()
+    if isFloat:
+        dtype, maxValue = "f4", 1.
+    elif bitsPerSample == 16:
+        dtype, maxValue = "u2", 65535.
+    else:
+        dtype, maxValue = "u1", 255.
+    # samples are in host byte order unless the bitmap format says otherwise
+    if bitmapFormat & (AppKit.NS16BitBigEndianBitmapFormat | AppKit.NS32BitBigEndianBitmapFormat):
+        dtype = ">" + dtype
+    elif bitmapFormat & (AppKit.NS16BitLittleEndianBitmapFormat | AppKit.NS32BitLittleEndianBitmapFormat):
+        dtype = "<" + dtype
+    else:
+        dtype = "=" + dtype
+    # read all rows straight from the bitmap buffer, rows can be padded
+    rows = numpy.frombuffer(bitmap.bitmapData(), dtype=numpy.uint8, count=bytesPerRow * h).reshape(h, bytesPerRow)
+    rows = numpy.ascontiguousarray(rows[:, :w * samplesPerPixel * bitsPerSample // 8])
+    samples = rows.view(numpy.dtype(dtype)).reshape(h, w, samplesPerPixel) / numpy.float32(maxValue)
+    # float32 keeps the array at four times the memory of an 8 bit bitmap
+    pixels = numpy.ones((h, w, 4), dtype=numpy.float32)
+    if samplesPerPixel == 3:
+        pixels[..., :3] = samples
+        return pixels
+    if bitmapFormat & AppKit.NSAlphaFirstBitmapFormat:
+        pixels[..., :3] = samples[..., 1:]
+        pixels[..., 3] = samples[..., 0]
+    else:
+        pixels[..., :] = samples
+    if not bitmapFormat & AppKit.NSAlphaNonpremultipliedBitmapFormat:
+        alpha = pixels[..., 3:]
+        numpy.divide(pixels[..., :3], alpha, out=pixels[..., :3], where=alpha > 0)
+    return pixels
+
+
+def gatherPixels(pixels, points):
+    """
+    Return the pixels at a list of `(x, y)` points as a numpy array with a shape of `(len(points), 4)`.
+    The `y` is counted from the bottom, points outside the bitmap get `nan` values.
+    """
+    import numpy
+    h, w = pixels.shape[:2]
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    # truncate like the integer conversion of single pixel lookups
+    x = numpy.trunc(points[:, 0])
+    y = numpy.trunc(points[:, 1])
+    inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    colors = numpy.full((len(points), 4), numpy.nan)
+    colors[inside] = pixels[h - 1 - y[inside].astype(numpy.intp), x[inside].astype(numpy.intp)]
+    return colors
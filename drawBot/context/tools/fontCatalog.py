@@ -0,0 +1,381 @@
+"""
+A catalog of font files with names, character coverage and variation axes.
+
+Font folders and the font files available to CoreText are scanned once, each font file is read once
+with fontTools. The catalog is stored in a json index keyed by font file path and modification time:
+a new process only reads the font files that changed since the last scan.
+
+The character coverage of a font is stored as a flat list of inclusive code point ranges:
+`[start, end, start, end, ...]`.
+
+The module only depends on fontTools, CoreText is used when available.
+"""
+
+import os
+import sys
+import json
+import bisect
+
+from lruCache import LRUCache
+
+
+_fontFileExtensions = set([".ttf", ".otf", ".ttc", ".otc", ".dfont"])
+
+_indexVersion = 1
+
+
+def _defaultFontFolders():
+    if sys.platform == "darwin":
+        folders = ["/System/Library/Fonts", "/Library/Fonts", "~/Library/Fonts"]
+    else:
+        folders = ["/usr/share/fonts", "/usr/local/share/fonts", "~/.fonts", "~/.local/share/fonts"]
+    return [os.path.expanduser(folder) for folder in folders]
+
+
+def _defaultIndexPath():
+    if sys.platform == "darwin":
+        folder = "~/Library/Caches/com.drawbot"
+    else:
+        folder = "~/.cache/drawBot"
+    return os.path.join(os.path.expanduser(folder), "fontCatalog.json")
+
+
+def _availableFontFiles():
+    # the font files CoreText knows about, including fonts outside the font folders
+    try:
+        import CoreText
+    except ImportError:
+        return []
+    urls = CoreText.CTFontManagerCopyAvailableFontURLs() or []
+    return [url.path() for url in urls if url.isFileURL()]
+
+
+def _codePointRanges(codePoints):
+    # return a flat list of inclusive ranges for a collection of code points
+    ranges = []
+    for codePoint in sorted(codePoints):
+        if ranges and ranges[-1] == codePoint - 1:
+            ranges[-1] = codePoint
+        else:
+            ranges.extend([codePoint, codePoint])
+    return ranges
+
+
+def _codePoints(characters):
+    # return the code points of a text, combining surrogate pairs of narrow python builds
+    codePoints = []
+    index = 0
+    length = len(characters)
+    while index < length:
+        codePoint = ord(characters[index])
+        if 0xD800 <= codePoint < 0xDC00 and index + 1 < length and 0xDC00 <= ord(characters[index + 1]) < 0xE000:
+            codePoint = 0x10000 + ((codePoint - 0xD800) << 10) + (ord(characters[index + 1]) - 0xDC00)
+            index += 1
+        codePoints.append(codePoint)
+        index += 1
+    return codePoints
+
+
+def _getName(nameTable, nameID):
+    name = nameTable.getName(nameID, 1, 0) or nameTable.getName(nameID, 3, 1)
+    if name is None:
+        return None
+    return name.toUnicode()
+
+
+def _readFont(font, path, fontNumber):
+    nameTable = font["name"]
+    variationAxes = []
+    if "fvar" in font:
+        for axis in font["fvar"].axes:
+            variationAxes.append(dict(
+                tag=axis.axisTag,
+                name=_getName(nameTable, axis.axisNameID) or axis.axisTag,
+                minValue=axis.minValue,
+                defaultValue=axis.defaultValue,
+                maxValue=axis.maxValue,
+            ))
+    return dict(
+        path=path,
+        fontNumber=fontNumber,
+        postscriptName=_getName(nameTable, 6),
+        familyName=_getName(nameTable, 16) or _getName(nameTable, 1),
+        styleName=_getName(nameTable, 17) or _getName(nameTable, 2),
+        fullName=_getName(nameTable, 4),
+        coverage=_codePointRanges((font.getBestCmap() or dict()).keys()),
+        variationAxes=variationAxes,
+    )
+
+
+def readFontName(path, fontNumber=0):
+    """
+    Return the postscript name of a font in a font file, only the name table is read.
+
+    Raises an `IOError` when the file does not exist and a fontTools `TTLibError` when it is not a valid font.
+    """
+    from fontTools.ttLib import TTFont
+    with open(path, "rb") as f:
+        header = f.read(4)
+    if header == b"ttcf":
+        font = TTFont(path, lazy=True, fontNumber=fontNumber)
+    elif fontNumber:
+        return None
+    else:
+        font = TTFont(path, lazy=True)
+    try:
+        return _getName(font["name"], 6)
+    finally:
+        font.close()
+
+
+def readFontFile(path):
+    """
+    Return a list of font info dicts for all fonts in a font file.
+
+    Raises an `IOError` when the file does not exist and a fontTools `TTLibError` when it is not a valid font.
+    """
+    from fontTools.ttLib import TTFont, TTCollection
+    with open(path, "rb") as f:
+        header = f.read(4)
+    if header == b"ttcf":
+        collection = TTCollection(path, lazy=True)
+        try:
+            return [_readFont(font, path, fontNumber) for fontNumber, font in enumerate(collection.fonts)]
+        finally:
+            collection.close()
+    font = TTFont(path, lazy=True)
+    try:
+        return [_readFont(font, path, 0)]
+    finally:
+        font.close()
+
+
+class FontCatalog(object):
+
+    """
+    A catalog of all fonts in font folders and all font files available to CoreText.
+
+    The catalog is read from and written to a json index at `indexPath`, set it to None to keep the catalog in memory only.
+    All fonts are scanned once on the first query, call `update()` to scan again for changed files.
+
+    Font files installed by a script are looked up with `fontNameForPath`, those are kept in memory only
+    and read on the next query.
+    """
+
+    def __init__(self, indexPath=None, fontFolders=None):
+        self.indexPath = indexPath
+        if fontFolders is None:
+            fontFolders = _defaultFontFolders()
+        self.fontFolders = fontFolders
+        self._files = None
+        self._scanned = False
+        self._coverage = dict()
+        self._queryCache = LRUCache(maxSize=1024)
+        # font files added by fontNameForPath, not stored in the index
+        self._temporaryPaths = set()
+        self._temporaryFiles = dict()
+        self._fontNames = LRUCache(maxSize=256)
+
+    # public api
+
+    def update(self):
+        """
+        Scan the font folders and available font files, only changed font files are read.
+        """
+        files = self._loadFiles()
+        self._scanned = True
+        paths = set(self._scanFontFiles())
+        # keep files added with `addFontFile` as long as those exist
+        paths.update(path for path, entry in files.items() if entry.get("added") and os.path.exists(path))
+        changed = False
+        for path in list(files):
+            if path not in paths:
+                self._removeFile(path)
+                changed = True
+        for path in paths:
+            changed |= self._updateFile(path)
+        if changed:
+            self._writeIndex()
+
+    def addFontFile(self, path):
+        """
+        Add a font file to the catalog, or read it again when it changed.
+
+        Raises an `IOError` when the file does not exist and a fontTools `TTLibError` when it is not a valid font.
+        """
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            raise IOError("No such file: '%s'" % path)
+        self._loadFiles()
+        if self._updateFile(path, added=True, ignoreErrors=False):
+            self._writeIndex()
+
+    def fonts(self):
+        """
+        Return a list of font info dicts for all fonts in the catalog.
+        Each dict has a `path`, `fontNumber`, `postscriptName`, `familyName`, `styleName`, `fullName`,
+        a `coverage` list of code point ranges and a list of `variationAxes`.
+        """
+        return [dict(font) for entry in self._getEntries() for font in entry["fonts"]]
+
+    def fontNameForPath(self, path, fontNumber=0):
+        """
+        Return the postscript name of a font in a font file.
+
+        Only the name table of the font is read. The font file is added to the catalog in memory,
+        the other font data is read on the next query.
+
+        Raises an `IOError` when the file does not exist and a fontTools `TTLibError` when it is not a valid font.
+        """
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            raise IOError("No such file: '%s'" % path)
+        key = path, os.path.getmtime(path), fontNumber
+        fontName = self._fontNames.get(key)
+        if fontName is None:
+            fontName = self._fontNames[key] = readFontName(path, fontNumber)
+        if path not in self._temporaryPaths:
+            self._temporaryPaths.add(path)
+            self._queryCache.clear()
+        return fontName
+
+    def fontsSupportingCharacters(self, characters):
+        """
+        Return a sorted list of postscript names of all fonts with a glyph for each of the `characters`.
+        """
+        codePoints = frozenset(_codePoints(characters))
+        result = self._queryCache.get(codePoints)
+        if result is None:
+            names = set()
+            for entry in self._getEntries():
+                for font in entry["fonts"]:
+                    if font["postscriptName"] and self._supportsCodePoints(font, codePoints):
+                        names.add(font["postscriptName"])
+            result = self._queryCache[codePoints] = sorted(names)
+        return list(result)
+
+    def clear(self):
+        """
+        Forget all fonts, the next query scans all fonts again.
+        """
+        self._files = None
+        self._scanned = False
+        self._coverage.clear()
+        self._queryCache.clear()
+        self._temporaryPaths.clear()
+        self._temporaryFiles.clear()
+        self._fontNames.clear()
+
+    # internal
+
+    def _loadFiles(self):
+        if self._files is None:
+            self._files = self._readIndex()
+        return self._files
+
+    def _getFiles(self):
+        if not self._scanned:
+            self.update()
+        return self._files
+
+    def _getEntries(self):
+        # return the entries of all font files, including font files added by fontNameForPath
+        files = self._getFiles()
+        for path in self._temporaryPaths:
+            if path not in files:
+                self._updateFile(path, files=self._temporaryFiles)
+        entries = list(files.values())
+        entries.extend(entry for path, entry in self._temporaryFiles.items() if path not in files)
+        return entries
+
+    def _scanFontFiles(self):
+        for folder in self.fontFolders:
+            for root, dirNames, fileNames in os.walk(folder):
+                for fileName in fileNames:
+                    if os.path.splitext(fileName)[1].lower() in _fontFileExtensions:
+                        yield os.path.join(root, fileName)
+        for path in _availableFontFiles():
+            path = os.path.abspath(path)
+            # fonts installed by a script are registered with CoreText as well, keep those out of the index
+            if path not in self._temporaryPaths:
+                yield path
+
+    def _updateFile(self, path, added=False, ignoreErrors=True, files=None):
+        # read a font file when it is new or changed, return a bool indicating the catalog changed
+        from fontTools.ttLib import TTLibError
+        if files is None:
+            files = self._files
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            if not ignoreErrors:
+                raise
+            return False
+        entry = files.get(path)
+        if entry is not None and entry["mtime"] == mtime:
+            if added and not entry.get("added"):
+                entry["added"] = True
+                return True
+            return False
+        try:
+            fonts = readFontFile(path)
+        except (IOError, TTLibError, KeyError, AssertionError):
+            if not ignoreErrors:
+                raise
+            # unreadable font files are remembered without fonts
+            fonts = []
+        self._removeFile(path, files)
+        files[path] = dict(mtime=mtime, fonts=fonts, added=added or bool(entry and entry.get("added")))
+        return True
+
+    def _removeFile(self, path, files=None):
+        if files is None:
+            files = self._files
+        entry = files.pop(path, None)
+        if entry is not None:
+            for font in entry["fonts"]:
+                self._coverage.pop((path, font["fontNumber"]), None)
+        self._queryCache.clear()
+
+    def _supportsCodePoints(self, font, codePoints):
+        key = font["path"], font["fontNumber"]
+        coverage = self._coverage.get(key)
+        if coverage is None:
+            coverage = self._coverage[key] = font["coverage"][::2], font["coverage"][1::2]
+        starts, ends = coverage
+        for codePoint in codePoints:
+            index = bisect.bisect_right(starts, codePoint) - 1
+            if index < 0 or ends[index] < codePoint:
+                return False
+        return True
+
+    def _readIndex(self):
+        if self.indexPath is None or not os.path.exists(self.indexPath):
+            return dict()
+        try:
+            with open(self.indexPath, "r") as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            # ignore unreadable or corrupt files, those will be overwritten
+            return dict()
+        if index.get("version") != _indexVersion:
+            return dict()
+        return index["files"]
+
+    def _writeIndex(self):
+        if self.indexPath is None:
+            return
+        tempPath = self.indexPath + ".tmp"
+        try:
+            folder = os.path.dirname(self.indexPath)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(tempPath, "w") as f:
+                json.dump(dict(version=_indexVersion, files=self._files), f)
+            os.rename(tempPath, self.indexPath)
+        except (IOError, OSError):
+            # the catalog works without an index on disk
+            pass
+
+
+fontCatalog = FontCatalog(indexPath=_defaultIndexPath())
@@ -0,0 +1,181 @@
+import AppKit
+import CoreText
+
+import os
+import json
+import atexit
+from collections import OrderedDict
+
+from openType import getFeatureTagsForFontName
+from variation import getVariationAxesForFontName
+
+
+def _fontFilePath(font):
+    url = CoreText.CTFontCopyAttribute(font, CoreText.kCTFontURLAttribute)
+    if url is None:
+        return None
+    return url.path()
+
+
+def _fontNamesForPath(path):
+    # return the postscript names of all fonts in a font file
+    url = AppKit.NSURL.fileURLWithPath_(path)
+    descriptors = CoreText.CTFontManagerCreateFontDescriptorsFromURL(url)
+    if descriptors is None:
+        return set()
+    return set(CoreText.CTFontDescriptorCopyAttribute(descriptor, CoreText.kCTFontNameAttribute) for descriptor in descriptors)
+
+
+class FontRegistry(object):
+
+    """
+    A per process cache of the capabilities of fonts: OpenType feature tags, variation axes and glyph count.
+
+    Fonts are looked up by font name, the postscript name and font file path of each font are stored.
+    Installing or uninstalling a font file only invalidates the fonts of that file and fonts with the same postscript names.
+
+    Optionally the registry can be stored in a json file, keyed by font file path and modification time,
+    so a new process starts with all font capabilities known already.
+    New fonts are written to the json file at exit or when calling `save()`.
+    """
+
+    def __init__(self, persistentPath=None):
+        self._fonts = dict()
+        self._persistent = None
+        self._persistentChanged = False
+        self._persistentPath = None
+        self.persistentPath = persistentPath
+        atexit.register(self.save)
+
+    def _get_persistentPath(self):
+        return self._persistentPath
+
+    def _set_persistentPath(self, path):
+        self.save()
+        self._persistentPath = path
+        self._persistent = None
+
+    persistentPath = property(_get_persistentPath, _set_persistentPath, doc="A path to a json file to store the font capabilities, or None.")
+
+    # public api
+
+    def featureTags(self, fontName):
+        """
+        Return a list of OpenType feature tags for a font name.
+        """
+        return list(self._getFontData(fontName)["featureTags"])
+
+    def variationAxes(self, fontName):
+        """
+        Return an ordered dict of variation axes for a font name.
+        """
+        axes = self._getFontData(fontName)["variationAxes"]
+        return OrderedDict((tag, dict(data)) for tag, data in axes.items())
+
+    def glyphCount(self, fontName):
+        """
+        Return the amount of glyphs of a font name.
+        """
+        return self._getFontData(fontName)["glyphCount"]
+
+    def invalidateFontPath(self, path):
+        """
+        Forget all fonts in a font file and all fonts with the same postscript names.
+        Call this when a font file is installed or uninstalled.
+        """
+        path = os.path.abspath(path)
+        fontNames = _fontNamesForPath(path)
+        for key, data in list(self._fonts.items()):
+            if data["path"] == path or data["postscriptName"] in fontNames or key in fontNames:
+                del self._fonts[key]
+
+    def clear(self):
+        """
+        Forget all fonts.
+        """
+        self._fonts.clear()
+
+    def save(self):
+        """
+        Write new fonts to the json file at `persistentPath`.
+        The registry works without the json file, failures to write it are ignored.
+        """
+        if not self._persistentChanged or self._persistentPath is None:
+            return
+        self._persistentChanged = False
+        tempPath = self._persistentPath + ".tmp"
+        try:
+            folder = os.path.dirname(self._persistentPath)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(tempPath, "w") as f:
+                json.dump(self._persistent, f)
+            os.rename(tempPath, self._persistentPath)
+        except (IOError, OSError):
+            pass
+
+    # internal
+
+    def _getFontData(self, fontName):
+        data = self._fonts.get(fontName)
+        if data is None:
+            data = self._fonts[fontName] = self._loadFontData(fontName)
+        return data
+
+    def _loadFontData(self, fontName):
+        font = CoreText.CTFontCreateWithName(fontName, 12, None)
+        postscriptName = CoreText.CTFontCopyPostScriptName(font)
+        path = _fontFilePath(font)
+        persistentKey = None
+        if path is not None and self._persistentPath is not None:
+            try:
+                persistentKey = "%s|%s|%s" % (path, os.path.getmtime(path), postscriptName)
+            except OSError:
+                pass
+        if persistentKey is not None:
+            data = self._readPersistent().get(persistentKey)
+            if data is not None:
+                return dict(
+                    postscriptName=postscriptName,
+                    path=path,
+                    featureTags=data["featureTags"],
+                    variationAxes=OrderedDict(data["variationAxes"]),
+                    glyphCount=data["glyphCount"],
+                )
+        data = dict(
+            postscriptName=postscriptName,
+            path=path,
+            featureTags=getFeatureTagsForFontName(fontName),
+            variationAxes=getVariationAxesForFontName(fontName),
+            glyphCount=CoreText.CTFontGetGlyphCount(font),
+        )
+        if persistentKey is not None:
+            self._setPersistent(persistentKey, data)
+        return data
+
+    def _readPersistent(self):
+        if self._persistent is None:
+            self._persistent = dict()
+            if os.path.exists(self._persistentPath):
+                try:
+                    with open(self._persistentPath, "r") as f:
+                        self._persistent = json.load(f)
+                except (IOError, ValueError):
+                    # ignore unreadable or corrupt files, those will be overwritten
+                    pass
+        return self._persistent
+
+    def _setPersistent(self, key, data):
+        persistent = self._readPersistent()
+        persistent[key] = dict(
+            featureTags=[unicode(tag) for tag in data["featureTags"]],
+            variationAxes=[
+                (unicode(tag), dict(name=unicode(axis["name"]), minValue=float(axis["minValue"]), maxValue=float(axis["maxValue"]), defaultValue=float(axis["defaultValue"])))
+                for tag, axis in data["variationAxes"].items()
+            ],
+            glyphCount=int(data["glyphCount"]),
+        )
+        self._persistentChanged = True
+
+
+fontRegistry = FontRegistry()
@@ -0,0 +1,457 @@
+"""
+Text layout and glyph outlines with fontTools, without CoreText.
+
+`layoutText` lays out runs of text in a box: glyphs are mapped with the `cmap`, advances come from
+`hmtx`, pairs are kerned with the `kern` feature of the `GPOS` table or with the `kern` table,
+lines are broken at spaces, hyphens and line breaks, and aligned with optional tracking.
+The result is a dict in the same structure as the text layout data of `textLayoutData`,
+with glyph ids, positions and a font dict with the font file path.
+
+`drawTextLayout` draws the glyph outlines of a text layout from the `glyf` or `CFF` table into a pen,
+like an `ArrayBezierPath`.
+
+There is no complex shaping: no substitutions, no mark positioning, no bidi.
+Lines are close to, but not always the same as, the lines of CoreText.
+
+The module only depends on fontTools: it can be used headless by adding this
+folder to `sys.path` and importing `headlessText` directly.
+"""
+
+import os
+import re
+
+from fontTools.ttLib import TTFont
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.transformPen import TransformPen
+
+from lruCache import LRUCache
+
+
+_hardBreaks = set(u"\n\r\u2028\u2029")
+_spaces = set(u" \t\u00A0")
+_breakAfter = set(u"-\u2010\u2013\u2014")
+
+_surrogatesRE = re.compile(u"[\ud800-\udbff]")
+
+_alignValues = ("left", "center", "right", "justified")
+
+
+def _xAdvance(valueRecord):
+    if valueRecord is None:
+        return 0
+    return getattr(valueRecord, "XAdvance", 0) or 0
+
+
+class _PairKerning(object):
+
+    # kerning of glyph pairs in font units, from the GPOS kern feature or the kern table
+
+    def __init__(self, font):
+        self._pairs = dict()
+        self._lookups = []
+        if "GPOS" in font and font["GPOS"].table.FeatureList is not None:
+            self._readGPOS(font["GPOS"].table)
+        elif "kern" in font:
+            for subtable in font["kern"].kernTables:
+                if getattr(subtable, "format", None) == 0 and getattr(subtable, "coverage", 1) & 1:
+                    self._pairs.update(subtable.kernTable)
+
+    def _readGPOS(self, table):
+        lookupIndexes = set()
+        for featureRecord in table.FeatureList.FeatureRecord:
+            if featureRecord.FeatureTag == "kern":
+                lookupIndexes.update(featureRecord.Feature.LookupListIndex)
+        for lookupIndex in sorted(lookupIndexes):
+            lookup = table.LookupList.Lookup[lookupIndex]
+            subtables = []
+            for subtable in lookup.SubTable:
+                if lookup.LookupType == 9:
+                    if subtable.ExtensionLookupType != 2:
+                        continue
+                    subtable = subtable.ExtSubTable
+                elif lookup.LookupType != 2:
+                    continue
+                if subtable.Format == 1:
+                    pairs = dict()
+                    for firstGlyph, pairSet in zip(subtable.Coverage.glyphs, subtable.PairSet):
+                        pairs[firstGlyph] = dict((record.SecondGlyph, _xAdvance(record.Value1)) for record in pairSet.PairValueRecord)
+                    subtables.append((1, pairs))
+                elif subtable.Format == 2:
+                    subtables.append((2, (set(subtable.Coverage.glyphs), subtable.ClassDef1.classDefs, subtable.ClassDef2.classDefs, subtable.Class1Record)))
+            if subtables:
+                self._lookups.append(subtables)
+
+    def __call__(self, first, second):
+        value = self._pairs.get((first, second), 0)
+        for subtables in self._lookups:
+            # the first subtable with the pair applies
+            for subtableFormat, data in subtables:
+                if subtableFormat == 1:
+                    seconds = data.get(first)
+                    if seconds is not None and second in seconds:
+                        value += seconds[second]
+                        break
+                else:
+                    coverage, classDef1, classDef2, class1Records = data
+                    if first in coverage:
+                        class2Records = class1Records[classDef1.get(first, 0)].Class2Record
+                        value += _xAdvance(class2Records[classDef2.get(second, 0)].Value1)
+                        break
+        return value
+
+
+class HeadlessFont(object):
+
+    """
+    The parsed tables of a font file needed for text layout and glyph outlines.
+    Use `getHeadlessFont` to get a cached font.
+    """
+
+    def __init__(self, path, fontNumber=0):
+        self.path = os.path.abspath(path)
+        self.fontNumber = fontNumber
+        font = TTFont(self.path, fontNumber=fontNumber, lazy=True)
+        self.postscriptName = font["name"].getDebugName(6) or os.path.splitext(os.path.basename(path))[0]
+        self.unitsPerEm = float(font["head"].unitsPerEm)
+        hhea = font["hhea"]
+        self.ascender = hhea.ascent
+        self.descender = hhea.descent
+        self.lineGap = hhea.lineGap
+        self.glyphOrder = font.getGlyphOrder()
+        self._glyphIDs = dict((glyphName, glyphID) for glyphID, glyphName in enumerate(self.glyphOrder))
+        self._cmap = font.getBestCmap() or dict()
+        metrics = font["hmtx"].metrics
+        self._advances = [metrics[glyphName][0] for glyphName in self.glyphOrder]
+        self.kerning = _PairKerning(font)
+        self._kerningCache = dict()
+        self._font = font
+        self._glyphSet = None
+        self._outlines = dict()
+
+    def __repr__(self):
+        return "<HeadlessFont %s>" % self.postscriptName
+
+    def glyphID(self, codePoint):
+        """
+        Return the glyph id for a unicode code point, 0 (.notdef) when the font has no glyph.
+        """
+        glyphName = self._cmap.get(codePoint)
+        if glyphName is None:
+            return 0
+        return self._glyphIDs.get(glyphName, 0)
+
+    def advance(self, glyphID):
+        """
+        Return the advance width of a glyph in font units.
+        """
+        return self._advances[glyphID]
+
+    def kern(self, firstGlyphID, secondGlyphID):
+        """
+        Return the kerning between two glyphs in font units.
+        """
+        pair = firstGlyphID, secondGlyphID
+        value = self._kerningCache.get(pair)
+        if value is None:
+            value = self._kerningCache[pair] = self.kerning(self.glyphOrder[firstGlyphID], self.glyphOrder[secondGlyphID])
+        return value
+
+    def drawGlyph(self, glyphID, pen, transformation=(1, 0, 0, 1, 0, 0)):
+        """
+        Draw the outline of a glyph in a pen, optionally with a transformation.
+        """
+        outline = self._outlines.get(glyphID)
+        if outline is None:
+            if self._glyphSet is None:
+                self._glyphSet = self._font.getGlyphSet()
+            outline = RecordingPen()
+            self._glyphSet[self.glyphOrder[glyphID]].draw(outline)
+            self._outlines[glyphID] = outline
+        if outline.value:
+            outline.replay(TransformPen(pen, transformation))
+
+
+_fontCache = LRUCache(maxSize=32)
+
+
+def getHeadlessFont(path, fontNumber=0):
+    """
+    Return a `HeadlessFont` for a font file path, cached until the file is modified.
+    """
+    path = os.path.abspath(path)
+    key = path, fontNumber, os.path.getmtime(path)
+    font = _fontCache.get(key)
+    if font is None:
+        font = _fontCache[key] = HeadlessFont(path, fontNumber)
+    return font
+
+
+def clearFontCache():
+    _fontCache.clear()
+
+
+def _characters(text):
+    # yield the index, character and code point of each character, combining surrogate pairs
+    if not _surrogatesRE.search(text):
+        for index, character in enumerate(text):
+            yield index, character, ord(character)
+        return
+    index = 0
+    textLength = len(text)
+    while index < textLength:
+        codePoint = ord(text[index])
+        if 0xD800 <= codePoint < 0xDC00 and index + 1 < textLength and 0xDC00 <= ord(text[index + 1]) < 0xE000:
+            yield index, text[index:index + 2], 0x10000 + ((codePoint - 0xD800) << 10) + (ord(text[index + 1]) - 0xDC00)
+            index += 2
+        else:
+            yield index, text[index], codePoint
+            index += 1
+
+
+def _colorData(color):
+    if color is None:
+        return None
+    color = tuple(float(value) for value in color)
+    if len(color) == 1:
+        color = color * 3
+    if len(color) == 3:
+        color += 1.0,
+    return "genericRGB", color
+
+
+class _Glyph(object):
+
+    __slots__ = ["location", "length", "character", "glyphID", "advance", "run"]
+
+    def __init__(self, location, length, character, glyphID, advance, run):
+        self.location = location
+        self.length = length
+        self.character = character
+        self.glyphID = glyphID
+        self.advance = advance
+        self.run = run
+
+
+class _Run(object):
+
+    # a text run with its font and the font metrics in points
+
+    def __init__(self, text, attributes):
+        self.text = text
+        self.font = getHeadlessFont(attributes["font"], attributes.get("fontNumber", 0))
+        self.fontSize = float(attributes.get("fontSize", 10))
+        self.scale = self.fontSize / self.font.unitsPerEm
+        self.tracking = float(attributes.get("tracking") or 0)
+        self.lineHeight = attributes.get("lineHeight")
+        self.ascent = self.font.ascender * self.scale
+        self.descent = -self.font.descender * self.scale
+        self.leading = self.font.lineGap * self.scale
+        self.fill = _colorData(attributes.get("fill", (0, 0, 0)))
+        self.stroke = _colorData(attributes.get("stroke"))
+        strokeWidth = attributes.get("strokeWidth")
+        self.strokeWidth = float(strokeWidth) if strokeWidth is not None else None
+        self.baselineShift = float(attributes.get("baselineShift") or 0)
+        self.fontData = dict(
+            name=self.font.postscriptName,
+            size=self.fontSize,
+            path=self.font.path,
+            fontNumber=self.font.fontNumber,
+            variations=[],
+            features=[],
+        )
+
+
+def _shape(runs):
+    # return a list of glyphs for all runs, one glyph for each character
+    glyphs = []
+    location = 0
+    for run in runs:
+        font = run.font
+        scale = run.scale
+        # the glyph id and advance for each character in the run
+        characters = dict()
+        previous = None
+        for index, character, codePoint in _characters(run.text):
+            info = characters.get(character)
+            if info is None:
+                glyphID = font.glyphID(codePoint)
+                info = characters[character] = glyphID, font.advance(glyphID) * scale + run.tracking
+            glyphID, advance = info
+            glyph = _Glyph(location + index, len(character), character, glyphID, advance, run)
+            if previous is not None:
+                previous.advance += font.kern(previous.glyphID, glyphID) * scale
+            previous = glyph
+            glyphs.append(glyph)
+        location += len(run.text)
+    return glyphs
+
+
+def _breakLines(glyphs, width):
+    # return a list of (start, end, hardBreak) glyph index tuples
+    lines = []
+    glyphCount = len(glyphs)
+    start = 0
+    while start < glyphCount:
+        lineWidth = 0
+        lastBreak = None
+        end = None
+        hardBreak = False
+        index = start
+        while index < glyphCount:
+            glyph = glyphs[index]
+            character = glyph.character
+            if character in _hardBreaks:
+                end = index + 1
+                # a \r\n pair is one line break
+                if character == u"\r" and end < glyphCount and glyphs[end].character == u"\n":
+                    end += 1
+                hardBreak = True
+                break
+            if character in _spaces:
+                # spaces at the end of a line hang outside the box
+                lineWidth += glyph.advance
+                lastBreak = index + 1
+            else:
+                if lineWidth + glyph.advance > width and index > start:
+                    end = lastBreak if lastBreak is not None else index
+                    break
+                lineWidth += glyph.advance
+                if character in _breakAfter:
+                    lastBreak = index + 1
+            index += 1
+        if end is None:
+            end = glyphCount
+        lines.append((start, end, hardBreak))
+        start = end
+    return lines
+
+
+def layoutText(runs, box, align=None):
+    """
+    Lay out text in a box.
+
+    `runs` is a list of `(text, attributes)` tuples, with attributes:
+
+    * `font`: a font file path (required)
+    * `fontNumber`: the font number in a font collection
+    * `fontSize`: the font size, the default is 10
+    * `tracking`: the spacing between characters
+    * `lineHeight`: the distance between lines
+    * `fill`: a `(r, g, b)` or `(r, g, b, alpha)` color, the default is black
+    * `stroke`: a `(r, g, b)` or `(r, g, b, alpha)` color
+    * `strokeWidth`: the stroke width
+    * `baselineShift`: the baseline shift
+
+    `box` is a tuple `(x, y, w, h)`.
+    Possible `align` values are: `"left"`, `"center"`, `"right"` and `"justified"`, the default is `left`.
+
+    Returns a dict in the same structure as the text layout data of `textLayoutData`.
+    """
+    if align is None:
+        align = "left"
+    if align not in _alignValues:
+        raise ValueError("align must be %s" % (", ".join(_alignValues)))
+    x, y, w, h = box
+    runs = [_Run(text, attributes) for text, attributes in runs if text]
+    glyphs = _shape(runs)
+    text = u"".join(run.text for run in runs)
+    linesData = []
+    top = h
+    baseline = None
+    visibleEnd = 0
+    for start, end, hardBreak in _breakLines(glyphs, w):
+        lineGlyphs = glyphs[start:end]
+        lineRuns = set(glyph.run for glyph in lineGlyphs)
+        ascent = max(run.ascent for run in lineRuns)
+        descent = max(run.descent for run in lineRuns)
+        leading = max(run.leading for run in lineRuns)
+        lineHeights = [run.lineHeight for run in lineRuns if run.lineHeight is not None]
+        if baseline is None:
+            baseline = top - ascent
+        elif lineHeights:
+            baseline -= max(lineHeights)
+        else:
+            baseline -= previousDescent + previousLeading + ascent
+        if baseline - descent < -0.001:
+            # the line does not fit in the box
+            break
+        previousDescent = descent
+        previousLeading = leading
+        # the visible glyphs without hanging spaces and the line break
+        visibleGlyphs = [glyph for glyph in lineGlyphs if glyph.character not in _hardBreaks]
+        while visibleGlyphs and visibleGlyphs[-1].character in _spaces:
+            visibleGlyphs.pop()
+        lineWidth = sum(glyph.advance for glyph in visibleGlyphs)
+        spacing = 0
+        if align == "justified" and not hardBreak and end < len(glyphs):
+            spaceCount = sum(1 for glyph in visibleGlyphs if glyph.character in _spaces)
+            if spaceCount:
+                spacing = (w - lineWidth) / spaceCount
+                lineWidth = w
+        if align == "center":
+            originX = (w - lineWidth) * .5
+        elif align == "right":
+            originX = w - lineWidth
+        else:
+            originX = 0
+        # group the glyphs in runs
+        runsData = []
+        position = 0
+        currentRun = None
+        for glyph in lineGlyphs:
+            if glyph.character in _hardBreaks:
+                continue
+            if glyph.run is not currentRun:
+                currentRun = glyph.run
+                runData = dict(
+                    range=[glyph.location, 0],
+                    text=u"",
+                    glyphs=[],
+                    positions=[],
+                    font=currentRun.fontData,
+                    fill=currentRun.fill,
+                    stroke=currentRun.stroke,
+                    strokeWidth=currentRun.strokeWidth,
+                    baselineShift=currentRun.baselineShift,
+                )
+                runsData.append(runData)
+            runData["range"][1] += glyph.length
+            runData["glyphs"].append(glyph.glyphID)
+            runData["positions"].append((position, 0.0))
+            position += glyph.advance
+            if spacing and glyph.character in _spaces:
+                position += spacing
+        for runData in runsData:
+            runLocation, runLength = runData["range"] = tuple(runData["range"])
+            runData["text"] = text[runLocation:runLocation + runLength]
+        location = lineGlyphs[0].location
+        lineEnd = lineGlyphs[-1].location + lineGlyphs[-1].length
+        linesData.append(dict(
+            origin=(float(originX), float(baseline)),
+            range=(location, lineEnd - location),
+            imageBounds=(0.0, -descent, float(lineWidth), ascent + descent),
+            runs=runsData,
+        ))
+        visibleEnd = lineEnd
+    return dict(
+        origin=(float(x), float(y)),
+        visibleRange=(0, visibleEnd),
+        lines=linesData,
+    )
+
+
+def drawTextLayout(layout, pen):
+    """
+    Draw the glyph outlines of a text layout in a pen.
+    """
+    x, y = layout["origin"]
+    for line in layout["lines"]:
+        originX, originY = line["origin"]
+        for run in line["runs"]:
+            fontData = run["font"]
+            font = getHeadlessFont(fontData["path"], fontData.get("fontNumber", 0))
+            scale = fontData["size"] / font.unitsPerEm
+            offsetY = y + originY + run["baselineShift"]
+            for glyphID, (glyphX, glyphY) in zip(run["glyphs"], run["positions"]):
+                if glyphID:
+                    font.drawGlyph(glyphID, pen, (scale, 0, 0, scale, x + originX + glyphX, offsetY + glyphY))
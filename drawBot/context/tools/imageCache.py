@@ -0,0 +1,119 @@
+import os
+from collections import OrderedDict
+
+from fontTools.misc.py23 import basestring
+
+
+def _fileModificationTime(path):
+    # the modification time of a local image file, None for urls and image objects
+    if isinstance(path, basestring) and not path.startswith("http"):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+    return None
+
+
+class ImageCache(object):
+
+    """
+    A least recently used cache for decoded images, bounded by the memory of the images.
+
+    Each item has a byte count based on its pixel dimensions, when all items together hold more than `maxBytes`
+    the least recently used items are dropped. The item asked for last is always kept.
+    Items of a local image file are read again when the modification time of the file changed.
+
+    The amount of hits, misses, evictions and invalidations is counted.
+    """
+
+    def __init__(self, maxBytes=512 * 1024 * 1024):
+        self._items = OrderedDict()
+        self.bytes = 0
+        self.maxBytes = maxBytes
+        self.resetStats()
+
+    def __repr__(self):
+        return "<%s size=%s bytes=%s maxBytes=%s>" % (self.__class__.__name__, len(self), self.bytes, self.maxBytes)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def _get_maxBytes(self):
+        return self._maxBytes
+
+    def _set_maxBytes(self, value):
+        self._maxBytes = value
+        self._evict()
+
+    maxBytes = property(_get_maxBytes, _set_maxBytes, doc="The max amount of memory held by all images in the cache.")
+
+    def get(self, key, path, factory):
+        """
+        Return the image for `key`.
+        When the image is not cached or the file at `path` changed, `factory` is called
+        and must return an `(image, byteCount)` tuple.
+        """
+        modificationTime = _fileModificationTime(path)
+        item = self._items.pop(key, None)
+        if item is not None:
+            if item[0] == modificationTime:
+                self._items[key] = item
+                self.hits += 1
+                return item[1]
+            self.bytes -= item[2]
+            self.invalidations += 1
+        self.misses += 1
+        image, byteCount = factory()
+        self._items[key] = modificationTime, image, byteCount
+        self.bytes += byteCount
+        self._evict()
+        return image
+
+    def _evict(self):
+        while self.bytes > self._maxBytes and len(self._items) > 1:
+            key, (modificationTime, image, byteCount) = self._items.popitem(last=False)
+            self.bytes -= byteCount
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all images, the statistics are kept.
+        """
+        self._items.clear()
+        self.bytes = 0
+
+    def resetStats(self):
+        """
+        Reset the hit, miss, eviction and invalidation counts.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        """
+        Return a dict with the `size`, `bytes`, `maxBytes`, `hits`, `misses`, `evictions` and `invalidations` of the cache.
+        """
+        return dict(
+            size=len(self),
+            bytes=self.bytes,
+            maxBytes=self.maxBytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+        )
+
+
+def bitmapByteCount(bitmap):
+    """
+    Return the memory of the pixels of a NSBitmapImageRep.
+    """
+    return bitmap.bytesPerRow() * bitmap.pixelsHigh()
+
+
+imageCache = ImageCache()
@@ -1,4 +1,5 @@
 import AppKit
+import Quartz
 from math import radians
 import os
 
@@ -6,6 +7,25 @@ from drawBot.misc import DrawBotError, optimizePath
 from fontTools.misc.py23 import basestring
 
 
+_arrayFormats = {
+    "uint8": Quartz.kCIFormatRGBA8,
+    "float32": Quartz.kCIFormatRGBAf,
+}
+
+_ciContext = None
+
+
+def _getCIContext():
+    global _ciContext
+    if _ciContext is None:
+        _ciContext = Quartz.CIContext.contextWithOptions_(None)
+    return _ciContext
+
+
+def _getArrayColorSpace():
+    return AppKit.NSColorSpace.sRGBColorSpace().CGColorSpace()
+
+
 class ImageObject(object):
 
     """
@@ -18,17 +38,21 @@ class ImageObject(object):
     .. _Core Image Filter Reference: https://developer.apple.com/library/mac/documentation/GraphicsImaging/Reference/CoreImageFilterReference/index.html
     """
 
+    # the max amount of memory held by the rendered intermediate results of the filters of an image object
+    _filterResultsMaxBytes = 256 * 1024 * 1024
+
     def __init__(self, path=None):
         self._filters = []
+        # the result of each prefix of the filter chain, a list of (ciImage, byteCount) tuples or None
+        self._filterResults = []
         if path is not None:
             self.open(path)
 
     def __del__(self):
         del self._filters
+        del self._filterResults
         if hasattr(self, "_source"):
             del self._source
-        if hasattr(self, "_cachedImage"):
-            del self._cachedImage
 
     def size(self):
         """
@@ -49,6 +73,7 @@ class ImageObject(object):
         Clear all filters.
         """
         self._filters = []
+        self._filterResults = []
 
     def open(self, path):
         """
@@ -70,16 +95,64 @@ class ImageObject(object):
         ciImage = AppKit.CIImage.imageWithData_(im.TIFFRepresentation())
         self._merge(ciImage, doCrop=True)
 
+    def toArray(self, dtype="uint8"):
+        """
+        Return the pixels of the image as a numpy array with a shape of `(height, width, 4)`.
+        The first row is the top row of the image, each pixel has premultiplied `r, g, b, alpha` values.
+
+        Optionally a `dtype` can be provided, either `"uint8"` with values from 0 to 255 (the default)
+        or `"float32"` with values from 0 to 1.
+
+        The image is rendered directly into the memory of the array. This requires numpy.
+        """
+        import numpy
+        dtype = numpy.dtype(dtype).name
+        if dtype not in _arrayFormats:
+            raise DrawBotError("dtype must be 'uint8' or 'float32'")
+        ciImage = self._ciImage()
+        (x, y), (w, h) = ciImage.extent()
+        if Quartz.CGRectIsInfinite(ciImage.extent()):
+            raise DrawBotError("Image has an infinite extent, crop the image first.")
+        w, h = int(round(w)), int(round(h))
+        array = numpy.zeros((h, w, 4), dtype=dtype)
+        _getCIContext().render_toBitmap_rowBytes_bounds_format_colorSpace_(ciImage, array, array.strides[0], ((x, y), (w, h)), _arrayFormats[dtype], _getArrayColorSpace())
+        # core image writes the bottom row first
+        return array[::-1]
+
+    def fromArray(self, array):
+        """
+        Set the image data from a numpy array with a shape of `(height, width, 4)`.
+        The first row is the top row of the image, each pixel has premultiplied `r, g, b, alpha` values.
+
+        The array can have a `uint8` dtype with values from 0 to 255 or a `float32` dtype with values from 0 to 1.
+        An array returned by `toArray` is used without rearranging the rows.
+
+        This requires numpy.
+        """
+        import numpy
+        array = numpy.asarray(array)
+        if array.dtype.name not in _arrayFormats:
+            raise DrawBotError("array dtype must be 'uint8' or 'float32'")
+        if array.ndim != 3 or array.shape[2] != 4:
+            raise DrawBotError("array must have a shape of (height, width, 4)")
+        h, w = array.shape[:2]
+        # core image reads the bottom row first, flipping an array from `toArray` makes it contiguous again without a copy
+        bitmap = numpy.ascontiguousarray(array[::-1])
+        # the image is evaluated lazily and needs to own its data
+        data = AppKit.NSData.dataWithBytes_length_(bitmap, bitmap.nbytes)
+        ciImage = AppKit.CIImage.imageWithBitmapData_bytesPerRow_size_format_colorSpace_(data, bitmap.strides[0], (w, h), _arrayFormats[array.dtype.name], _getArrayColorSpace())
+        self._merge(ciImage, doCrop=True)
+
     def copy(self):
         """
         Return a copy.
         """
         new = self.__class__()
         new._filters = list(self._filters)
+        # core images are immutable, the copy shares the filter results
+        new._filterResults = list(self._filterResults)
         if hasattr(self, "_source"):
-            new._source = self._source.copy()
-        if hasattr(self, "_cachedImage"):
-            new._cachedImage = self._cachedImage.copy()
+            new._source = self._source
         return new
 
     def lockFocus(self):
@@ -111,15 +184,14 @@ class ImageObject(object):
         self.imageDrawingTool._reset(_drawBotDrawingTool)
         # reset the main drawing tool with a saved state of the tool
         _drawBotDrawingTool._reset(self._originalTool)
-        # get the pdf data
-        data = self.imageDrawingTool.pdfImage()
+        # draw directly into a bitmap
+        from drawBot.context.rasterContext import RasterContext
+        context = RasterContext()
+        self.imageDrawingTool._drawInContext(context)
         # get the last page
-        pageCount = data.pageCount()
-        page = data.pageAtIndex_(pageCount-1)
-        # create an image
-        im = AppKit.NSImage.alloc().initWithData_(page.dataRepresentation())
+        cgImage = context.pageImages()[-1]
         # create an CIImage object
-        ciImage = AppKit.CIImage.imageWithData_(im.TIFFRepresentation())
+        ciImage = AppKit.CIImage.imageWithCGImage_(cgImage)
         # merge it with the already set data, if there already an image
         self._merge(ciImage)
 
@@ -134,9 +206,7 @@ class ImageObject(object):
         """
         Return the CIImage object.
         """
-        if not hasattr(self, "_cachedImage"):
-            self._applyFilters()
-        return self._cachedImage
+        return self._applyFilters()
 
     def _nsImage(self):
         """
@@ -159,50 +229,83 @@ class ImageObject(object):
                 (x, y), (w, h) = self._ciImage().extent()
                 imObject.crop(rectangle=(x, y, w, h))
             ciImage = imObject._ciImage()
-            if hasattr(self, "_cachedImage"):
-                del self._cachedImage
         self._source = ciImage
+        self._filterResults = []
 
     def _addFilter(self, filterDict):
         """
         Add an filter.
         """
         self._filters.append(filterDict)
-        if hasattr(self, "_cachedImage"):
-            del self._cachedImage
 
     def _applyFilters(self):
         """
-        Apply all filters on the source image.
-        Keep the _source image intact and store the result in a _cachedImage attribute.
-        """
-        if hasattr(self, "_source"):
-            self._cachedImage = self._source.copy()
-        for filterDict in self._filters:
-            filterName = filterDict.get("name")
-            ciFilter = AppKit.CIFilter.filterWithName_(filterName)
-            ciFilter.setDefaults()
-
-            for key, value in filterDict.get("attributes", {}).items():
-                ciFilter.setValue_forKey_(value, key)
-
-            if filterDict.get("isGenerator", False):
-                w, h = filterDict["size"]
-                dummy = AppKit.NSImage.alloc().initWithSize_((w, h))
-                generator = ciFilter.valueForKey_("outputImage")
-                dummy.lockFocus()
-                ctx = AppKit.NSGraphicsContext.currentContext()
-                ctx.setShouldAntialias_(False)
-                ctx.setImageInterpolation_(AppKit.NSImageInterpolationNone)
-                generator.drawAtPoint_fromRect_operation_fraction_((0, 0), ((0, 0), (w, h)), AppKit.NSCompositeCopy, 1)
-                dummy.unlockFocus()
-                self._cachedImage = AppKit.CIImage.imageWithData_(dummy.TIFFRepresentation())
-                del dummy
-            elif hasattr(self, "_cachedImage"):
-                ciFilter.setValue_forKey_(self._cachedImage, "inputImage")
-                self._cachedImage = ciFilter.valueForKey_("outputImage")
-        if not hasattr(self, "_cachedImage"):
+        Apply all filters on the source image and return the result.
+        Keep the _source image intact and store the result of each prefix of the filter chain,
+        only the filters added after the last stored result are applied.
+        """
+        results = self._filterResults
+        del results[len(self._filters):]
+        results.extend([None] * (len(self._filters) - len(results)))
+        # start at the last stored result
+        start = len(results)
+        while start and results[start - 1] is None:
+            start -= 1
+        if start:
+            ciImage = results[start - 1][0]
+        else:
+            ciImage = getattr(self, "_source", None)
+        for index in range(start, len(self._filters)):
+            ciImage, byteCount = self._applyFilter(self._filters[index], ciImage)
+            results[index] = ciImage, byteCount
+        self._limitFilterResults()
+        if ciImage is None:
             raise DrawBotError("Image does not contain any data. Draw into the image object first or set image data from a path.")
+        return ciImage
+
+    def _limitFilterResults(self):
+        """
+        Drop the oldest rendered intermediate results when those hold more memory than allowed.
+        The result of the full chain is always kept.
+        """
+        results = self._filterResults
+        totalBytes = sum(result[1] for result in results[:-1] if result is not None)
+        index = 0
+        while totalBytes > self._filterResultsMaxBytes and index < len(results) - 1:
+            if results[index] is not None and results[index][1]:
+                totalBytes -= results[index][1]
+                results[index] = None
+            index += 1
+
+    def _applyFilter(self, filterDict, ciImage):
+        """
+        Apply a single filter on a CIImage, return the result and the amount of memory held by the result.
+        Core Image results are recipes, only images rendered by generators hold pixels.
+        """
+        filterName = filterDict.get("name")
+        ciFilter = AppKit.CIFilter.filterWithName_(filterName)
+        ciFilter.setDefaults()
+
+        for key, value in filterDict.get("attributes", {}).items():
+            ciFilter.setValue_forKey_(value, key)
+
+        if filterDict.get("isGenerator", False):
+            w, h = filterDict["size"]
+            dummy = AppKit.NSImage.alloc().initWithSize_((w, h))
+            generator = ciFilter.valueForKey_("outputImage")
+            dummy.lockFocus()
+            ctx = AppKit.NSGraphicsContext.currentContext()
+            ctx.setShouldAntialias_(False)
+            ctx.setImageInterpolation_(AppKit.NSImageInterpolationNone)
+            generator.drawAtPoint_fromRect_operation_fraction_((0, 0), ((0, 0), (w, h)), AppKit.NSCompositeCopy, 1)
+            dummy.unlockFocus()
+            ciImage = AppKit.CIImage.imageWithData_(dummy.TIFFRepresentation())
+            del dummy
+            return ciImage, int(w * h * 4)
+        elif ciImage is not None:
+            ciFilter.setValue_forKey_(ciImage, "inputImage")
+            ciImage = ciFilter.valueForKey_("outputImage")
+        return ciImage, 0
 
     # filters
 
@@ -0,0 +1,107 @@
+import AppKit
+import Quartz
+
+import gifTools
+from imageCache import imageCache
+
+from drawBot.misc import DrawBotError, isPDF, isGIF
+
+
+def getImageSource(path, pageNumber=None):
+    """
+    Return an `(isPDF, image)` tuple for an image path, url or NSImage,
+    the image is a CGPDFPage for a pdf and a CGImage for all other images.
+
+    Decoded images are shared by all contexts in the process. Those are cached by path or url and page number,
+    an image of a local file is decoded again when the modification time of the file changed.
+    A NSImage is not cached: image objects make a new NSImage each time they are drawn.
+    """
+    if isinstance(path, AppKit.NSImage):
+        (_isPDF, image), byteCount = _loadImageSource(path, pageNumber)
+        return _isPDF, image
+    return imageCache.get(("imageSource", path, pageNumber), path, lambda: _loadImageSource(path, pageNumber))
+
+
+def _cgImageItem(image):
+    # return the item for the image cache with the memory of the decoded image
+    byteCount = 0
+    if image is not None:
+        byteCount = Quartz.CGImageGetBytesPerRow(image) * Quartz.CGImageGetHeight(image)
+    return (False, image), byteCount
+
+
+def _cgImageFromSource(source):
+    if source is None or Quartz.CGImageSourceGetType(source) is None:
+        return None
+    return Quartz.CGImageSourceCreateImageAtIndex(source, 0, None)
+
+
+def _hasOrientation(source):
+    # return a bool indicating the image must be rotated or flipped by its exif orientation
+    if source is None or Quartz.CGImageSourceGetType(source) is None:
+        return False
+    properties = Quartz.CGImageSourceCopyPropertiesAtIndex(source, 0, None)
+    if properties is None:
+        return False
+    return properties.get(Quartz.kCGImagePropertyOrientation, 1) != 1
+
+
+def _cgImageFromNSImage(image):
+    data = image.TIFFRepresentation()
+    if data is None:
+        return None
+    return _cgImageFromSource(Quartz.CGImageSourceCreateWithData(data, {}))
+
+
+def _loadImageSource(path, pageNumber):
+    if isinstance(path, AppKit.NSImage):
+        image = _cgImageFromNSImage(path)
+        if image is None:
+            raise DrawBotError("No image found at %s" % path)
+        return _cgImageItem(image)
+    if path.startswith("http"):
+        url = AppKit.NSURL.URLWithString_(path)
+    else:
+        url = AppKit.NSURL.fileURLWithPath_(path)
+    _isPDF, _ = isPDF(url)
+    _isGIF, _ = isGIF(url)
+    if _isPDF:
+        pdf = Quartz.CGPDFDocumentCreateWithURL(url)
+        if pdf is None:
+            raise DrawBotError("No pdf found at %s" % path)
+        if pageNumber is None:
+            pageNumber = Quartz.CGPDFDocumentGetNumberOfPages(pdf)
+        page = Quartz.CGPDFDocumentGetPage(pdf, pageNumber)
+        # a pdf page is not decoded, count the pixels of the page at 72 dpi
+        (_, _), (w, h) = Quartz.CGPDFPageGetBoxRect(page, Quartz.kCGPDFMediaBox)
+        return (_isPDF, page), int(w * h * 4)
+    if _isGIF:
+        # gif frames can be partial, use the full frames exploded by gifsicle
+        if pageNumber is None:
+            pageNumber = gifTools.gifFrameCount(url)
+        image = _cgImageFromNSImage(gifTools.gifFrameAtIndex(url, pageNumber - 1))
+        if image is None:
+            raise DrawBotError("No image found at frame %s in %s" % (pageNumber, path))
+        return _cgImageItem(image)
+    # decode the image file directly
+    data = None
+    if path.startswith("http"):
+        data = AppKit.NSData.dataWithContentsOfURL_(url)
+        source = Quartz.CGImageSourceCreateWithData(data, None) if data is not None else None
+    else:
+        source = Quartz.CGImageSourceCreateWithURL(url, None)
+    image = None
+    if not _hasOrientation(source):
+        image = _cgImageFromSource(source)
+    if image is None:
+        # formats not supported by image io, like eps, are read by NSImage
+        # as are rotated images, NSImage applies the orientation like `imageSize` does
+        if data is not None:
+            nsImage = AppKit.NSImage.alloc().initWithData_(data)
+        else:
+            nsImage = AppKit.NSImage.alloc().initByReferencingURL_(url)
+        if nsImage is not None and nsImage.isValid():
+            image = _cgImageFromNSImage(nsImage)
+    if image is None:
+        raise DrawBotError("No image found at %s" % path)
+    return _cgImageItem(image)
@@ -0,0 +1,147 @@
+import CoreText
+import Quartz
+
+from collections import namedtuple
+
+
+# the string range, origin and typographic bounds of a line in a frame
+TypesetLine = namedtuple("TypesetLine", ["location", "length", "x", "y", "width", "ascent", "descent", "leading"])
+
+
+def _almostEqual(value1, value2, tolerance=1e-6):
+    return abs(value1 - value2) < tolerance
+
+
+def frameLines(attrString, path, stringRange=(0, 0)):
+    """
+    Typeset `stringRange` of `attrString` in `path`.
+
+    Returns a list of `TypesetLine` objects and the end of the visible string range.
+    """
+    setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
+    frame = CoreText.CTFramesetterCreateFrame(setter, stringRange, path, None)
+    ctLines = CoreText.CTFrameGetLines(frame)
+    origins = CoreText.CTFrameGetLineOrigins(frame, (0, len(ctLines)), None)
+    lines = []
+    for ctLine, origin in zip(ctLines, origins):
+        rng = CoreText.CTLineGetStringRange(ctLine)
+        width, ascent, descent, leading = CoreText.CTLineGetTypographicBounds(ctLine, None, None, None)
+        lines.append(TypesetLine(rng.location, rng.length, origin.x, origin.y, width, ascent, descent, leading))
+    visibleRange = CoreText.CTFrameGetVisibleStringRange(frame)
+    return lines, visibleRange.location + visibleRange.length
+
+
+class IncrementalTypesetter(object):
+
+    """
+    The lines of a mutable attributed string typeset in a path, as a frame setter would.
+
+    Lines are typeset lazily in small chunks. After the text of a line is edited, only the lines
+    from the edited line onward are dropped and typeset again when they are requested.
+
+    In a rectangular path a line break only depends on the text from the start of the line. A chunk starts
+    with the last known line as anchor, typeset at the top of a rectangle sharing the bottom of the path.
+    The top is moved until the anchor ends up with its original range and origin,
+    from there all following lines get the same ranges and origins as in a full frame.
+    For any other path all lines are typeset at once.
+    """
+
+    # the initial amount of characters typeset in a chunk, measured in anchor lines
+    chunkLines = 4
+
+    def __init__(self, attrString, path):
+        self.attributedString = attrString
+        self.path = path
+        isRect, rect = Quartz.CGPathIsRect(path, None)
+        self._rect = rect if isRect else None
+        self._lines = []
+        self._complete = False
+
+    def hasLine(self, index):
+        """
+        Return a bool indicating the line at `index` fits in the path.
+        """
+        while index >= len(self._lines) and not self._complete:
+            self._typesetChunk()
+        return index < len(self._lines)
+
+    def lineRange(self, index):
+        """
+        Return the string range of a line as a `(location, length)` tuple.
+        """
+        self.hasLine(index)
+        line = self._lines[index]
+        return line.location, line.length
+
+    def lineWidth(self, index):
+        """
+        Return the typographic width of a line.
+        """
+        self.hasLine(index)
+        return self._lines[index].width
+
+    def edited(self, index):
+        """
+        Drop all lines from line `index` onward, after the text of that line is edited.
+        """
+        del self._lines[index:]
+        self._complete = False
+
+    def _typesetChunk(self):
+        if self._rect is None:
+            self._lines, visibleEnd = frameLines(self.attributedString, self.path)
+            self._complete = True
+            return
+        textLength = self.attributedString.length()
+        if self._lines:
+            anchor = self._lines[-1]
+            start = anchor.location
+            chunkLength = max(anchor.length, 16) * self.chunkLines
+        else:
+            anchor = None
+            start = 0
+            chunkLength = 64 * self.chunkLines
+        while True:
+            length = min(chunkLength, textLength - start)
+            result = self._typesetFromAnchor(anchor, (start, length))
+            if result is None:
+                # the anchor moved, typeset everything
+                self._lines, visibleEnd = frameLines(self.attributedString, self.path)
+                self._complete = True
+                return
+            lines, visibleEnd = result
+            if anchor is not None:
+                lines = lines[1:]
+            if visibleEnd < start + length or start + length >= textLength:
+                # the path is full or all text is typeset
+                self._lines.extend(lines)
+                self._complete = True
+                return
+            # the last line could be cut by the end of the chunk
+            lines = lines[:-1]
+            if lines:
+                self._lines.extend(lines)
+                return
+            chunkLength *= 2
+
+    def _typesetFromAnchor(self, anchor, stringRange):
+        if anchor is None:
+            return frameLines(self.attributedString, self.path, stringRange)
+        # move the top of the rectangle until the anchor line is at its original origin
+        x, y = self._rect.origin
+        w = self._rect.size.width
+        top = anchor.y + anchor.ascent
+        for attempt in range(2):
+            path = Quartz.CGPathCreateMutable()
+            Quartz.CGPathAddRect(path, None, Quartz.CGRectMake(x, y, w, top))
+            lines, visibleEnd = frameLines(self.attributedString, path, stringRange)
+            if not lines:
+                return None
+            first = lines[0]
+            if first.location != anchor.location or first.length != anchor.length or not _almostEqual(first.x, anchor.x):
+                return None
+            offset = anchor.y - first.y
+            if _almostEqual(offset, 0):
+                return [line._replace(y=line.y + offset) for line in lines], visibleEnd
+            top += offset
+        return None
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+
+    """
+    A dict like cache holding at most `maxSize` items, the least recently used item is dropped first.
+
+    The amount of hits and misses is counted.
+    """
+
+    def __init__(self, maxSize=128):
+        self.maxSize = maxSize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<%s size=%s maxSize=%s hits=%s misses=%s>" % (self.__class__.__name__, len(self), self.maxSize, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """
+        Return the value for `key` and mark it as recently used, or `default` when missing.
+        """
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Set a `value` for `key`, dropping the least recently used items when the cache is full.
+        """
+        self._items.pop(key, None)
+        self._items[key] = value
+        while len(self._items) > max(self.maxSize, 0):
+            self._items.popitem(last=False)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def clear(self):
+        """
+        Remove all items, the hit and miss counts are kept.
+        """
+        self._items.clear()
+
+    def resetStats(self):
+        """
+        Reset the hit and miss counts.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Return a dict with the `size`, `maxSize`, `hits` and `misses` of the cache.
+        """
+        return dict(size=len(self), maxSize=self.maxSize, hits=self.hits, misses=self.misses)
@@ -485,6 +485,16 @@ def getFeatureTagsForFontAttributes(attributes):
     return featureTags
 
 
+def getFeatureTagsForFeatures(features):
+    # features is a list of (featureType, featureSelector) tuples
+    featureTags = list()
+    for feature in features:
+        tag = reversedFeatureMap.get(tuple(feature))
+        if tag:
+            featureTags.append(tag)
+    return featureTags
+
+
 def getFeatureTagsForDescriptions(featureDescriptions):
     featureTags = list()
     for featureDescription in featureDescriptions:
@@ -0,0 +1,197 @@
+"""
+Convert a laid out text frame into plain python data: dicts, lists, tuples, strings and numbers.
+The data can be pickled, stored as json, sent to other processes and compared.
+
+{
+    "origin": (x, y),
+    "visibleRange": (location, length),
+    "lines": [
+        {
+            "origin": (x, y),
+            "range": (location, length),
+            "imageBounds": (x, y, w, h),
+            "runs": [
+                {
+                    "range": (location, length),
+                    "text": u"...",
+                    "glyphs": [glyphID, ...],
+                    "positions": [(x, y), ...],
+                    "font": {"name": ..., "size": ..., "path": ..., "variations": [(axis, value), ...], "features": [(type, selector), ...]},
+                    "fill": (colorSpaceName, (component, ...)) or None,
+                    "stroke": (colorSpaceName, (component, ...)) or None,
+                    "strokeWidth": float or None,
+                    "baselineShift": float,
+                },
+            ]
+        },
+    ]
+}
+"""
+
+import AppKit
+import CoreText
+
+from lruCache import LRUCache
+
+
+_colorSpaces = [
+    ("genericRGB", AppKit.NSColorSpace.genericRGBColorSpace),
+    ("sRGB", AppKit.NSColorSpace.sRGBColorSpace),
+    ("adobeRGB1998", AppKit.NSColorSpace.adobeRGB1998ColorSpace),
+    ("deviceRGB", AppKit.NSColorSpace.deviceRGBColorSpace),
+    ("genericGray", AppKit.NSColorSpace.genericGrayColorSpace),
+    ("genericGamma22Gray", AppKit.NSColorSpace.genericGamma22GrayColorSpace),
+    ("deviceGray", AppKit.NSColorSpace.deviceGrayColorSpace),
+    ("genericCMYK", AppKit.NSColorSpace.genericCMYKColorSpace),
+    ("deviceCMYK", AppKit.NSColorSpace.deviceCMYKColorSpace),
+]
+
+_colorSpaceMap = dict(_colorSpaces)
+
+
+def _colorSpaceName(colorSpace):
+    for name, colorSpaceFactory in _colorSpaces:
+        if colorSpace == colorSpaceFactory():
+            return name
+    return None
+
+
+def colorToData(color):
+    """
+    Return a `(colorSpaceName, components)` tuple for a NSColor.
+    Colors in an unknown color space are converted to generic RGB.
+    """
+    if color is None:
+        return None
+    try:
+        colorSpaceName = _colorSpaceName(color.colorSpace())
+    except ValueError:
+        # not a component based color
+        colorSpaceName = None
+    if colorSpaceName is None:
+        colorSpaceName = "genericRGB"
+        color = color.colorUsingColorSpace_(AppKit.NSColorSpace.genericRGBColorSpace())
+    model = color.colorSpace().colorSpaceModel()
+    if model == AppKit.NSCMYKColorSpaceModel:
+        components = color.cyanComponent(), color.magentaComponent(), color.yellowComponent(), color.blackComponent()
+    elif model == AppKit.NSGrayColorSpaceModel:
+        components = color.whiteComponent(),
+    else:
+        components = color.redComponent(), color.greenComponent(), color.blueComponent()
+    components += color.alphaComponent(),
+    return colorSpaceName, tuple(float(component) for component in components)
+
+
+def colorFromData(data):
+    """
+    Return a NSColor from a `(colorSpaceName, components)` tuple.
+    """
+    if data is None:
+        return None
+    colorSpaceName, components = data
+    return AppKit.NSColor.colorWithColorSpace_components_count_(_colorSpaceMap[colorSpaceName](), components, len(components))
+
+
+def fontToData(font):
+    """
+    Return a dict describing a NSFont, with the font file path, variation axes values and OpenType features.
+    """
+    fontAttributes = font.fontDescriptor().fontAttributes()
+    variations = fontAttributes.get(CoreText.NSFontVariationAttribute) or dict()
+    features = fontAttributes.get(CoreText.NSFontFeatureSettingsAttribute) or []
+    url = CoreText.CTFontCopyAttribute(font, CoreText.kCTFontURLAttribute)
+    return dict(
+        name=unicode(font.fontName()),
+        size=float(font.pointSize()),
+        path=unicode(url.path()) if url is not None else None,
+        variations=sorted((int(axis), float(value)) for axis, value in variations.items()),
+        features=[(int(feature[CoreText.NSFontFeatureTypeIdentifierKey]), int(feature[CoreText.NSFontFeatureSelectorIdentifierKey])) for feature in features],
+    )
+
+
+_fontCache = LRUCache(maxSize=128)
+
+
+def fontFromData(data):
+    """
+    Return a NSFont from a font dict.
+    """
+    key = data["name"], data["size"], tuple(tuple(item) for item in data["variations"]), tuple(tuple(item) for item in data["features"])
+    font = _fontCache.get(key)
+    if font is None:
+        attributes = {AppKit.NSFontNameAttribute: data["name"]}
+        if data["variations"]:
+            attributes[CoreText.NSFontVariationAttribute] = dict(data["variations"])
+        if data["features"]:
+            attributes[CoreText.NSFontFeatureSettingsAttribute] = [{
+                    CoreText.NSFontFeatureTypeIdentifierKey: featureType,
+                    CoreText.NSFontFeatureSelectorIdentifierKey: featureSelector
+                } for featureType, featureSelector in data["features"]]
+        descriptor = AppKit.NSFontDescriptor.fontDescriptorWithFontAttributes_(attributes)
+        if data["path"] and not _isFontName(descriptor, data["name"]):
+            # hidden system fonts or fonts which are not installed can only be found by their file
+            descriptor = _fontDescriptorFromPath(data["path"], data["name"], attributes) or descriptor
+        font = _fontCache[key] = AppKit.NSFont.fontWithDescriptor_size_(descriptor, data["size"])
+    return font
+
+
+def _isFontName(descriptor, fontName):
+    font = AppKit.NSFont.fontWithDescriptor_size_(descriptor, 12)
+    return font is not None and font.fontName() == fontName
+
+
+def _fontDescriptorFromPath(path, fontName, attributes):
+    url = AppKit.NSURL.fileURLWithPath_(path)
+    descriptors = CoreText.CTFontManagerCreateFontDescriptorsFromURL(url) or []
+    for descriptor in descriptors:
+        if CoreText.CTFontDescriptorCopyAttribute(descriptor, CoreText.kCTFontNameAttribute) == fontName:
+            return CoreText.CTFontDescriptorCreateCopyWithAttributes(descriptor, attributes)
+    return None
+
+
+def clearFontCache():
+    _fontCache.clear()
+
+
+def runToData(ctRun, text):
+    """
+    Return a dict with glyphs, positions, font, colors and baseline shift of a CTRun.
+    """
+    attributes = CoreText.CTRunGetAttributes(ctRun)
+    glyphCount = CoreText.CTRunGetGlyphCount(ctRun)
+    stringRange = CoreText.CTRunGetStringRange(ctRun)
+    strokeWidth = attributes.get(AppKit.NSStrokeWidthAttributeName)
+    return dict(
+        range=(stringRange.location, stringRange.length),
+        text=unicode(text.substringWithRange_((stringRange.location, stringRange.length))),
+        glyphs=[int(glyph) for glyph in CoreText.CTRunGetGlyphs(ctRun, (0, glyphCount), None)],
+        positions=[(float(x), float(y)) for x, y in CoreText.CTRunGetPositions(ctRun, (0, glyphCount), None)],
+        font=fontToData(attributes.get(AppKit.NSFontAttributeName)),
+        fill=colorToData(attributes.get(AppKit.NSForegroundColorAttributeName)),
+        stroke=colorToData(attributes.get(AppKit.NSStrokeColorAttributeName)),
+        strokeWidth=float(strokeWidth) if strokeWidth is not None else None,
+        baselineShift=float(attributes.get(AppKit.NSBaselineOffsetAttributeName, 0)),
+    )
+
+
+def frameToData(attributedString, lines, origins, origin, visibleRange):
+    """
+    Return a dict with all lines and runs of a laid out text frame.
+    """
+    text = attributedString.string()
+    linesData = []
+    for ctLine, lineOrigin in zip(lines, origins):
+        lineRange = CoreText.CTLineGetStringRange(ctLine)
+        (bx, by), (bw, bh) = CoreText.CTLineGetImageBounds(ctLine, None)
+        linesData.append(dict(
+            origin=(float(lineOrigin.x), float(lineOrigin.y)),
+            range=(lineRange.location, lineRange.length),
+            imageBounds=(float(bx), float(by), float(bw), float(bh)),
+            runs=[runToData(ctRun, text) for ctRun in CoreText.CTLineGetGlyphRuns(ctLine)],
+        ))
+    x, y = origin
+    return dict(
+        origin=(float(x), float(y)),
+        visibleRange=(visibleRange.location, visibleRange.length),
+        lines=linesData,
+    )
@@ -6,6 +6,7 @@ import Quartz
 
 import math
 import os
+import copy
 import random
 
 from .context import getContextForFileExt
@@ -14,6 +15,11 @@ from .context.dummyContext import DummyContext
 
 from .context.tools.imageObject import ImageObject
 from .context.tools import gifTools
+from .context.tools.fontCatalog import fontCatalog
+from .context.tools.bitmapPixels import bitmapPixelArray, gatherPixels
+from .context.tools.imageCache import imageCache, bitmapByteCount
+
+from .compactInstructions import CompactInstructionSet
 
 from .misc import DrawBotError, warnings, VariableController, optimizePath, isPDF, isEPS, isGIF
 
@@ -37,7 +43,6 @@ def _deprecatedWarningWrapInTuple(txt):
     warnings.warn("deprecated syntax, wrap x and y values in a tuple: '%s'" % txt)
 
 
-_chachedPixelColorBitmaps = {}
 
 
 _paperSizes = {
@@ -68,6 +73,9 @@ for key, (w, h) in list(_paperSizes.items()):
 
 class DrawBotDrawingTool(object):
 
+    # the container used to record the instructions of a single page
+    _instructionSetClass = list
+
     def __init__(self):
         self._reset()
         self._isSinglePage = False
@@ -92,11 +100,21 @@ class DrawBotDrawingTool(object):
         namespace.update(_getmodulecontents(random, ["random", "randint", "choice"]))
         namespace.update(_getmodulecontents(math))
 
+    def _useCompactInstructions(self, value=True):
+        """
+        Record all following pages in a compact, array backed instruction set.
+        This reduces the memory footprint of drawings with a large amount of drawing instructions.
+        """
+        if value:
+            self._instructionSetClass = CompactInstructionSet
+        else:
+            self._instructionSetClass = list
+
     def _addInstruction(self, callback, *args, **kwargs):
         if callback == "newPage":
-            self._instructionsStack.append([])
+            self._instructionsStack.append(self._instructionSetClass())
         if not self._instructionsStack:
-            self._instructionsStack.append([])
+            self._instructionsStack.append(self._instructionSetClass())
         if self._requiresNewFirstPage and not self._hasPage:
             self._hasPage = True
             self._instructionsStack[-1].insert(0, ("newPage", [self.width(), self.height()], {}))
@@ -112,6 +130,7 @@ class DrawBotDrawingTool(object):
 
     def _reset(self, other=None):
         if other is not None:
+            self._instructionSetClass = other._instructionSetClass
             self._instructionsStack = list(other._instructionsStack)
             self._dummyContext = other._dummyContext
             self._width = other._width
@@ -131,6 +150,7 @@ class DrawBotDrawingTool(object):
 
     def _copy(self):
         new = self.__class__()
+        new._instructionSetClass = self._instructionSetClass
         new._instructionsStack = list(self._instructionsStack)
         new._dummyContext = self._dummyContext
         new._width = self._width
@@ -363,14 +383,17 @@ class DrawBotDrawingTool(object):
                     break
         return tuple(DrawBotPage(instructionSet) for instructionSet in instructions)
 
-    def saveImage(self, paths, multipage=None):
+    def saveImage(self, paths, multipage=None, parallel=False):
         """
         Save or export the canvas to a specified format.
         The argument `paths` can either be a single path or a list of paths.
 
+        Optionally `parallel` can be set to `True` to export a list of paths concurrently,
+        each path is exported in a separate process.
+
         The file extension is important because it will determine the format in which the image will be exported.
 
-        All supported file extensions: `pdf`, `svg`, `png`, `jpg`, `jpeg`, `tiff`, `tif`, `gif`, `bmp` and `mov`.
+        All supported file extensions: `pdf`, `svg`, `svgz`, `png`, `jpg`, `jpeg`, `tiff`, `tif`, `gif`, `bmp` and `mov`.
 
         * A `pdf` can be multipage. If `multipage` is `False` only the current page is saved.
         * A `mov` will use each page as a frame.
@@ -394,6 +417,7 @@ class DrawBotDrawingTool(object):
         """
         if isinstance(paths, basestring):
             paths = [paths]
+        jobs = []
         for rawPath in paths:
             path = optimizePath(rawPath)
             dirName = os.path.dirname(path)
@@ -406,6 +430,13 @@ class DrawBotDrawingTool(object):
             context = getContextForFileExt(ext)
             if context is None:
                 raise DrawBotError("Could not find a supported context for: '%s'" % ext)
+            jobs.append((path, ext, context))
+        if parallel and len(jobs) > 1:
+            from .parallelExport import saveImages
+            saveImages(self._instructionsStack, self._tempInstalledFonts.keys(), [(path, ext) for path, ext, _ in jobs], multipage)
+            return
+        for path, ext, context in jobs:
+            context.prepareSaveImage(path, multipage)
             self._drawInContext(context)
             context.saveImage(path, multipage)
 
@@ -1764,6 +1795,80 @@ class DrawBotDrawingTool(object):
         self._addInstruction("textBox", txt, box, align)
         return self._dummyContext.clippedText(txt, box, align)
 
+    def textFlow(self, txt, boxes, align=None):
+        """
+        Draw a text flowing through a sequence of boxes, the text continues in the next box where the previous box is full.
+
+        A box could be a `(x, y, w, h)` or a bezierPath object. The `boxes` can also be a generator,
+        a next box is only requested when there is text left, so the generator can add a new page for each box.
+        The flow stops when all text is drawn, when there are no boxes left or when a box does not fit any text.
+
+        All boxes are laid out in one go, which is a lot faster for long texts than calling `textBox`
+        with the overflow of the previous box for each box. Each box continues the layout of the previous box:
+        a paragraph flowing into the next box is not indented again and justified lines stay justified.
+        With `hyphenation` enabled each box is laid out separately, the same as `textBox` with the overflow of the previous box.
+
+        Optionally an alignment can be set.
+        Possible `align` values are: `"left"`, `"center"`, `"right"` and `"justified"`.
+
+        Returns a list with a `(location, length)` tuple of the drawn part of the text for each box.
+
+        .. downloadcode:: textFlow.py
+
+            t = "DrawBot is a powerful, free application for MacOSX that invites you to write simple Python scripts to generate two-dimensional graphics. " * 100
+
+            def pages():
+                # add a new page for each box
+                while True:
+                    newPage(500, 500)
+                    yield (10, 10, 480, 480)
+
+            fontSize(30)
+            ranges = textFlow(t, pages())
+            print(len(ranges))
+        """
+        if PY2 and isinstance(txt, basestring):
+            try:
+                txt = txt.decode("utf-8")
+            except UnicodeEncodeError:
+                pass
+        if align is None:
+            align = "left"
+        elif align not in self._dummyContext._textAlignMap.keys():
+            raise DrawBotError("align must be %s" % (", ".join(self._dummyContext._textAlignMap.keys())))
+        boxes = iter(boxes)
+        ranges = []
+        if self._dummyContext._state.hyphenation:
+            # hyphenation depends on the width of each box, lay out each box separately
+            location = 0
+            while location < len(txt):
+                try:
+                    box = next(boxes)
+                except StopIteration:
+                    break
+                overflow = self.textBox(txt[location:], box, align)
+                length = len(txt) - location - len(overflow)
+                ranges.append((location, length))
+                if not length:
+                    break
+                location += length
+            return ranges
+        flow = self._dummyContext.textFlow(txt, align)
+        while not flow.isDone():
+            try:
+                box = next(boxes)
+            except StopIteration:
+                break
+            path, origin = self._dummyContext._getPathForFrameSetter(box)
+            location, length = flow.layoutFrame(path)
+            ranges.append((location, length))
+            if not length:
+                break
+            self._requiresNewFirstPage = True
+            # draw the frame of the full text starting at location, exactly as it is laid out here
+            self._addInstruction("textBox", txt, box, align, location=location)
+        return ranges
+
     def textbox(self, txt, x, y, w, h, align=None):
         _deprecatedWarningLowercase("textBox('%s', (%s, %s, %s, %s), align=%s)" % (txt, x, y, y, w, align))
         return self.textBox(txt, (x, y, w, h), align)
@@ -1784,13 +1889,43 @@ class DrawBotDrawingTool(object):
                 txt = txt.decode("utf-8")
             except UnicodeEncodeError:
                 pass
-        path, (x, y) = self._dummyContext._getPathForFrameSetter(box)
-        attrString = self._dummyContext.attributedString(txt)
-        setter = CoreText.CTFramesetterCreateWithAttributedString(attrString)
-        box = CoreText.CTFramesetterCreateFrame(setter, (0, 0), path, None)
-        ctLines = CoreText.CTFrameGetLines(box)
-        origins = CoreText.CTFrameGetLineOrigins(box, (0, len(ctLines)), None)
-        return [(x + o.x, y + o.y) for o in origins]
+        if align is None:
+            align = "left"
+        elif align not in self._dummyContext._textAlignMap.keys():
+            raise DrawBotError("align must be %s" % (", ".join(self._dummyContext._textAlignMap.keys())))
+        layout = self._dummyContext._getTextLayout(txt, box, align)
+        x, y = layout.origin
+        return [(x + o.x, y + o.y) for o in layout.origins]
+
+    def textBoxLayout(self, txt, box, align=None):
+        """
+        Returns the layout of a `text` in a `box` as plain python data,
+        without drawing the text.
+
+        A `box` could be a `(x, y, w, h)` or a bezierPath object.
+
+        Optionally an alignment can be set.
+        Possible `align` values are: `"left"`, `"center"`, `"right"` and `"justified"`.
+
+        The layout is a dict with the `origin` of the box, the `visibleRange` of the text and a list of `lines`.
+        Each line has an `origin`, a string `range`, the `imageBounds` and a list of `runs`.
+        Each run has a string `range`, the `text`, a list of `glyphs` ids with their `positions`,
+        a `font` dict, `fill` and `stroke` colors, the `strokeWidth` and the `baselineShift`.
+
+        The layout only contains lists, dicts, tuples, strings and numbers:
+        it can be pickled, stored as json or compared with another layout.
+        """
+        if PY2 and isinstance(txt, basestring):
+            try:
+                txt = txt.decode("utf-8")
+            except UnicodeEncodeError:
+                pass
+        if align is None:
+            align = "left"
+        elif align not in self._dummyContext._textAlignMap.keys():
+            raise DrawBotError("align must be %s" % (", ".join(self._dummyContext._textAlignMap.keys())))
+        layout = self._dummyContext._getTextLayout(txt, box, align)
+        return copy.deepcopy(layout.data)
 
     _formattedStringClass = FormattedString
 
@@ -1952,10 +2087,86 @@ class DrawBotDrawingTool(object):
                         text("W", (x, y))
         """
         x, y = xy
+        bitmap = self._getPixelColorBitmap(path)
+        color = bitmap.colorAtX_y_(x, bitmap.pixelsHigh() - y - 1)
+        if color is None:
+            return None
+        color = color.colorUsingColorSpaceName_("NSCalibratedRGBColorSpace")
+        return color.redComponent(), color.greenComponent(), color.blueComponent(), color.alphaComponent()
+
+    def imagePixelColors(self, path, points):
+        """
+        Return the colors of an image at a list of `(x, y)` points, like `imagePixelColor` but for many points at once.
+
+        Returns a numpy array with a row of `r, g, b, a` values for each point.
+        Points outside the image get `nan` values. This requires numpy.
+
+        .. downloadcode:: pixelColors.py
+
+            # path to the image
+            path = u"http://f.cl.ly/items/1T3x1y372J371p0v1F2Z/drawBot.jpg"
+            # get the colors of some points
+            colors = imagePixelColors(path, [(10, 10), (20, 20), (30, 30)])
+            print(colors)
+        """
+        return gatherPixels(self._getPixelColorArray(path), points)
+
+    def imagePixelColorGrid(self, path, step=1):
+        """
+        Return the colors of an image at every `step` pixels in both directions, starting at `0, 0`.
+
+        Returns a numpy array with a shape of `(rows, columns, 4)`,
+        `colors[j, i]` has the `r, g, b, a` values at `x = i * step` and `y = j * step`
+        with the same coordinates as `imagePixelColor`. This requires numpy.
+
+        .. downloadcode:: pixelColorGrid.py
+
+            # path to the image
+            path = u"http://f.cl.ly/items/1T3x1y372J371p0v1F2Z/drawBot.jpg"
+            # setup a variable for the font size as for the steps
+            s = 15
+            # shift it up a bit
+            translate(100, 100)
+            # set a font with a size
+            font("Helvetica-Bold")
+            fontSize(s)
+            # get the colors of the image at each step
+            colors = imagePixelColorGrid(path, s)
+            rows, columns = colors.shape[:2]
+            for j in range(rows):
+                for i in range(columns):
+                    r, g, b, a = colors[j, i]
+                    # set the color
+                    fill(r, g, b, a)
+                    # draw some text
+                    text("W", (i * s, j * s))
+        """
+        if step < 1:
+            raise DrawBotError("step must be 1 or more")
+        pixels = self._getPixelColorArray(path)
+        h, w = pixels.shape[:2]
+        # rows of the bitmap start at the top
+        return pixels[h - 1::-step, ::step].copy()
+
+    def imageCacheStats(self):
+        """
+        Return a dict with statistics of the cache of decoded images used by `imagePixelColor` and pdf output:
+        `size` (the amount of images), `bytes`, `maxBytes`, `hits`, `misses`, `evictions` and `invalidations`.
+        """
+        return imageCache.stats()
+
+    def imageCacheMaxBytes(self, maxBytes):
+        """
+        Set the max amount of memory held by the cache of decoded images.
+        When the cache holds more, the least recently used images are dropped. The default is 512MB.
+        """
+        imageCache.maxBytes = maxBytes
+
+    def _getPixelColorBitmap(self, path):
         if isinstance(path, basestring):
             path = optimizePath(path)
-        bitmap = _chachedPixelColorBitmaps.get(path)
-        if bitmap is None:
+
+        def loadBitmap():
             if isinstance(path, self._imageClass):
                 source = path._nsImage()
             elif isinstance(path, AppKit.NSImage):
@@ -1968,13 +2179,19 @@ class DrawBotDrawingTool(object):
                 source = AppKit.NSImage.alloc().initByReferencingURL_(url)
 
             bitmap = AppKit.NSBitmapImageRep.imageRepWithData_(source.TIFFRepresentation())
-            _chachedPixelColorBitmaps[path] = bitmap
+            return bitmap, bitmapByteCount(bitmap)
 
-        color = bitmap.colorAtX_y_(x, bitmap.pixelsHigh() - y - 1)
-        if color is None:
-            return None
-        color = color.colorUsingColorSpaceName_("NSCalibratedRGBColorSpace")
-        return color.redComponent(), color.greenComponent(), color.blueComponent(), color.alphaComponent()
+        return imageCache.get(("pixelColorBitmap", path), path, loadBitmap)
+
+    def _getPixelColorArray(self, path):
+        if isinstance(path, basestring):
+            path = optimizePath(path)
+
+        def loadPixels():
+            pixels = bitmapPixelArray(self._getPixelColorBitmap(path))
+            return pixels, pixels.nbytes
+
+        return imageCache.get(("pixelColorArray", path), path, loadPixels)
 
     def numberOfPages(self, path):
         path = optimizePath(path)
@@ -2091,6 +2308,31 @@ class DrawBotDrawingTool(object):
             raise DrawBotError("Calculating textSize can only have one constrain, either width or height must be None")
         return self._dummyContext.textSize(txt, align, width, height)
 
+    def textSizes(self, texts, align=None, width=None, height=None):
+        """
+        Returns a list of sizes of a list of texts with the current settings,
+        like `font`, `fontSize` and `lineHeight`, each size is a tuple (width, height).
+
+        This is the same as calling `textSize` for each text but much faster
+        when measuring many texts, like labels.
+
+        Optionally a `width` constrain or `height` constrain can be provided
+        to calculate the lenght or width of each text with the given constrain.
+        """
+        if width is not None and height is not None:
+            raise DrawBotError("Calculating textSizes can only have one constrain, either width or height must be None")
+        if PY2:
+            decoded = []
+            for txt in texts:
+                if isinstance(txt, basestring):
+                    try:
+                        txt = txt.decode("utf-8")
+                    except UnicodeEncodeError:
+                        pass
+                decoded.append(txt)
+            texts = decoded
+        return self._dummyContext.textSizes(texts, align, width, height)
+
     def textsize(self, txt, align=None):
         _deprecatedWarningLowercase("textSize(%s, %s)" % (txt, align))
         return self.textSize(txt, align)
@@ -2102,16 +2344,19 @@ class DrawBotDrawingTool(object):
         Optionally a string with `supportsCharacters` can be provided,
         the list of available installed fonts will be filterd by
         support of these characters,
+
+        The character support of all fonts is stored in a font catalog on disk,
+        after the first call only new or changed font files are read.
         """
+        installedFonts = [str(f) for f in AppKit.NSFontManager.sharedFontManager().availableFonts()]
         if supportsCharacters is not None:
             if len(supportsCharacters) == 0:
                 raise DrawBotError("supportsCharacters must contain at least one character")
-            characterSet = AppKit.NSCharacterSet.characterSetWithCharactersInString_(supportsCharacters)
-            fontAttributes = {CoreText.NSFontCharacterSetAttribute: characterSet}
-            fontDescriptor = CoreText.CTFontDescriptorCreateWithAttributes(fontAttributes)
-            descriptions = fontDescriptor.matchingFontDescriptorsWithMandatoryKeys_(None)
-            return [str(description[CoreText.NSFontNameAttribute]) for description in descriptions]
-        return [str(f) for f in AppKit.NSFontManager.sharedFontManager().availableFonts()]
+            if PY2 and isinstance(supportsCharacters, str):
+                supportsCharacters = supportsCharacters.decode("utf-8")
+            installed = set(installedFonts)
+            return [str(fontName) for fontName in fontCatalog.fontsSupportingCharacters(supportsCharacters) if fontName in installed]
+        return installedFonts
 
     def installedfonts(self):
         _deprecatedWarningLowercase("installedFonts()")
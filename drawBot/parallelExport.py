@@ -0,0 +1,157 @@
+"""
+Export a drawing to multiple file formats concurrently.
+
+The instruction stack is serialized once to a temporary folder and each output path
+is replayed and saved by a separate python process:
+
+* `fonts.pickle`: the temporary installed font paths
+* `objects.archive`: all Cocoa objects (NSImage, NSBezierPath, NSAttributedString, ...) as a keyed archive
+* `instructions.pickle`: the instruction stack, referring to objects in the archive by index
+
+Each worker reports its own traceback, failures are collected per path.
+"""
+
+import AppKit
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from drawBot.misc import DrawBotError
+
+
+_fontsFileName = "fonts.pickle"
+_objectsFileName = "objects.archive"
+_instructionsFileName = "instructions.pickle"
+
+
+def serializeInstructions(instructionsStack, fontPaths, destFolder):
+    """
+    Serialize an instruction stack and a list of font paths into `destFolder`.
+    """
+    objects = []
+    objectIndexes = {}
+
+    def persistentID(obj):
+        if isinstance(obj, AppKit.NSObject):
+            key = id(obj)
+            if key not in objectIndexes:
+                objectIndexes[key] = len(objects)
+                objects.append(obj)
+            return str(objectIndexes[key])
+        return None
+
+    # convert all instruction sets to plain lists
+    instructionsStack = [list(instructionSet) for instructionSet in instructionsStack]
+
+    with open(os.path.join(destFolder, _fontsFileName), "wb") as f:
+        pickle.dump(list(fontPaths), f, 2)
+
+    with open(os.path.join(destFolder, _instructionsFileName), "wb") as f:
+        pickler = pickle.Pickler(f, 2)
+        pickler.persistent_id = persistentID
+        pickler.dump(instructionsStack)
+
+    data = AppKit.NSKeyedArchiver.archivedDataWithRootObject_(objects)
+    data.writeToFile_atomically_(os.path.join(destFolder, _objectsFileName), True)
+
+
+def deserializeInstructions(sourceFolder, installFont=None):
+    """
+    Read an instruction stack from `sourceFolder`.
+    Optionally an `installFont` callback is called with each font path,
+    before any font dependend object is unarchived.
+    """
+    with open(os.path.join(sourceFolder, _fontsFileName), "rb") as f:
+        fontPaths = pickle.load(f)
+    if installFont is not None:
+        for fontPath in fontPaths:
+            installFont(fontPath)
+
+    data = AppKit.NSData.dataWithContentsOfFile_(os.path.join(sourceFolder, _objectsFileName))
+    objects = AppKit.NSKeyedUnarchiver.unarchiveObjectWithData_(data)
+
+    def persistentLoad(objectID):
+        return objects[int(objectID)]
+
+    with open(os.path.join(sourceFolder, _instructionsFileName), "rb") as f:
+        unpickler = pickle.Unpickler(f)
+        unpickler.persistent_load = persistentLoad
+        instructionsStack = unpickler.load()
+    return instructionsStack, fontPaths
+
+
+def _workerEnviron():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([path for path in sys.path if path])
+    return env
+
+
+def _runWorker(job):
+    sourceFolder, path, ext, multipage = job
+    cmds = [sys.executable, "-m", "drawBot.parallelExport", sourceFolder, path, ext, repr(multipage)]
+    popen = subprocess.Popen(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=_workerEnviron())
+    stdout, stderr = popen.communicate()
+    if popen.returncode != 0:
+        return path, stderr.decode("utf-8", "replace").strip()
+    return path, None
+
+
+def saveImages(instructionsStack, fontPaths, jobs, multipage, maxWorkers=None):
+    """
+    Save a instruction stack to several `(path, ext)` jobs concurrently.
+
+    Raises a `DrawBotError` with the error of each failed path.
+    """
+    if maxWorkers is None:
+        maxWorkers = multiprocessing.cpu_count()
+    maxWorkers = max(1, min(maxWorkers, len(jobs)))
+    # contexts only test multipage for None and truth, the worker accepts None, True and False
+    if multipage is not None:
+        multipage = bool(multipage)
+    sourceFolder = tempfile.mkdtemp()
+    try:
+        serializeInstructions(instructionsStack, fontPaths, sourceFolder)
+        pool = ThreadPool(maxWorkers)
+        try:
+            results = pool.map(_runWorker, [(sourceFolder, path, ext, multipage) for path, ext in jobs])
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(sourceFolder)
+    errors = [(path, error) for path, error in results if error is not None]
+    if errors:
+        message = "\n".join(["'%s': %s" % (path, error) for path, error in errors])
+        raise DrawBotError("Could not export:\n%s" % message)
+
+
+def _main(sourceFolder, path, ext, multipage):
+    from drawBot.context import getContextForFileExt
+    from drawBot.drawBotDrawingTools import DrawBotDrawingTool
+    drawingTool = DrawBotDrawingTool()
+    instructionsStack, fontPaths = deserializeInstructions(sourceFolder, installFont=drawingTool._dummyContext.installFont)
+    drawingTool._instructionsStack = instructionsStack
+    context = getContextForFileExt(ext)
+    context.prepareSaveImage(path, multipage)
+    drawingTool._drawInContext(context)
+    context.saveImage(path, multipage)
+    for fontPath in fontPaths:
+        drawingTool._dummyContext.uninstallFont(fontPath)
+
+
+_multipageArguments = {"None": None, "True": True, "False": False}
+
+
+if __name__ == "__main__":
+    _sourceFolder, _path, _ext, _multipage = sys.argv[1:]
+    _main(_sourceFolder, _path, _ext, _multipageArguments[_multipage])